@@ -1,17 +1,32 @@
 """
 异常考勤报告生成
-筛选缺卡、旷工、严重迟到等异常记录
+筛选缺卡、旷工、严重迟到等异常记录，以及连续旷工、频繁迟到等按员工日期序列判断的异常
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
+from column_ops import factorize_as_str, isin_as_str
+from excel_loader import DEFAULT_ENGINE, ENGINES, load_excel, parse_sheet_arg
+from lazy_imports import np, pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from sequence_ops import sequence_order, streak_mask, window_mask
+from writers import write_frame
+
+# 序列条件按（工号, 日期）排序后判断
+SEQUENCE_KEYS = ["工号", "日期"]
 
-from detect_header import detect_header_row
+# 休息日不参与序列条件：既不计入，也不打断连续段
+REST_DAY = {
+    "columns": ["班次", "上班 1 打卡结果"],
+    "values": ["休息", "无需打卡(休息)"],
+}
 
 # 默认异常条件
+# 单日条件：values（值匹配）或 condition / threshold（数值比较）
 DEFAULT_ABNORMAL_CONDITIONS = {
     "缺卡": {
         "columns": ["上班 1 打卡结果", "下班 1 打卡结果"],
@@ -39,39 +54,298 @@ DEFAULT_ABNORMAL_CONDITIONS = {
     },
 }
 
+# 序列异常条件，不在默认报告中：通过 -t 指定类型，或指定 --streak-days / --late-window 时加入报告
+# 在单日条件的基础上，streak 为同一工号连续若干个工作日成立，
+# window / min_count 为任意连续 window 个工作日内至少 min_count 天成立，skip 为不参与序列的行
+SEQUENCE_ABNORMAL_CONDITIONS = {
+    "连续旷工": {
+        "columns": ["旷工天数"],
+        "condition": "gt",
+        "threshold": 0,
+        "streak": 3,
+        "skip": REST_DAY,
+    },
+    "频繁迟到": {
+        "columns": ["迟到次数", "严重迟到次数"],
+        "condition": "gt",
+        "threshold": 0,
+        "window": 10,
+        "min_count": 5,
+        "skip": REST_DAY,
+    },
+}
+
+# 全部异常类型（-t 可选的类型）
+ABNORMAL_CONDITIONS = {**DEFAULT_ABNORMAL_CONDITIONS, **SEQUENCE_ABNORMAL_CONDITIONS}
 
-def filter_abnormal(
+
+def add_sequence_arguments(parser) -> None:
+    """为命令行添加序列条件参数 --streak-days / --late-window"""
+    streak = SEQUENCE_ABNORMAL_CONDITIONS["连续旷工"]
+    late = SEQUENCE_ABNORMAL_CONDITIONS["频繁迟到"]
+    parser.add_argument(
+        "--streak-days",
+        type=int,
+        help=f"报告连续旷工：最少工作日数（-t 指定连续旷工时默认 {streak['streak']}）",
+    )
+    parser.add_argument(
+        "--late-window",
+        nargs=2,
+        type=int,
+        metavar=("DAYS", "COUNT"),
+        help=(
+            "报告频繁迟到：任意连续 DAYS 个工作日内至少迟到 COUNT 天"
+            f"（-t 指定频繁迟到时默认 {late['window']} {late['min_count']}）"
+        ),
+    )
+
+
+def sequence_conditions(
+    streak_days: int | None = None,
+    late_window: tuple[int, int] | None = None,
+) -> dict[str, dict]:
+    """
+    返回加入了指定序列条件的异常条件配置（不修改默认配置）
+    
+    只有指定了参数的序列类型会加入配置，未指定类型时的报告随之包含该类型；
+    都不指定时与默认配置相同
+    
+    Args:
+        streak_days: 连续旷工的最少天数，为 None 时不加入连续旷工
+        late_window: 频繁迟到的 (窗口天数, 最少迟到天数)，为 None 时不加入频繁迟到
+    """
+    conditions = dict(DEFAULT_ABNORMAL_CONDITIONS)
+    if streak_days is not None:
+        if streak_days < 1:
+            raise ValueError(f"连续天数必须大于 0: {streak_days}")
+        conditions["连续旷工"] = {**SEQUENCE_ABNORMAL_CONDITIONS["连续旷工"], "streak": streak_days}
+    if late_window is not None:
+        window, min_count = late_window
+        if not 1 <= min_count <= window:
+            raise ValueError(f"最少迟到天数必须在 1 到窗口天数 {window} 之间: {min_count}")
+        conditions["频繁迟到"] = {
+            **SEQUENCE_ABNORMAL_CONDITIONS["频繁迟到"],
+            "window": window,
+            "min_count": min_count,
+        }
+    return conditions
+
+
+class ColumnCoercer:
+    """
+    按列缓存类型转换结果，同一列被多个异常条件引用时只转换一次
+    """
+    
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._numeric = {}
+        self._factorized = {}
+        self._sequence = None
+    
+    def numeric(self, column: str) -> np.ndarray:
+        """列的数值形式（无法转换的值为 NaN）"""
+        if column not in self._numeric:
+            values = pd.to_numeric(self.df[column], errors="coerce")
+            self._numeric[column] = np.asarray(values, dtype=np.float64)
+        return self._numeric[column]
+    
+    def isin(self, column: str, values: list[str]) -> np.ndarray:
+        """列值转为字符串后是否属于 values"""
+        if column not in self._factorized:
+            self._factorized[column] = factorize_as_str(self.df[column])
+        return isin_as_str(self.df[column], values, factorized=self._factorized[column])
+    
+    def sequence(self) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        按（工号, 日期）排序的行号与工号编码，多个序列条件共用一次排序
+        
+        工号缺失或日期无法解析的行不参与序列条件，排序时提示其行数；
+        缺少工号或日期列时返回 None
+        """
+        if self._sequence is None:
+            if any(c not in self.df.columns for c in SEQUENCE_KEYS):
+                return None
+            self._sequence = sequence_order(self.df[SEQUENCE_KEYS[0]], self.df[SEQUENCE_KEYS[1]])
+            dropped = len(self.df) - len(self._sequence[0])
+            if dropped:
+                print(f"警告: {dropped} 行的工号缺失或日期无法解析，未参与连续旷工、频繁迟到等序列条件的判断")
+        return self._sequence
+
+
+def condition_mask(
     df: pd.DataFrame,
-    abnormal_type: str,
     config: dict,
-) -> pd.DataFrame:
-    """根据配置筛选异常记录"""
-    columns = config["columns"]
+    coercer: ColumnCoercer | None = None,
+) -> np.ndarray | None:
+    """
+    计算单个异常条件的布尔掩码
+    
+    Args:
+        df: 考勤数据
+        config: 异常条件配置
+        coercer: 列类型转换缓存，为 None 时新建
     
-    # 检查列是否存在
-    existing_cols = [c for c in columns if c in df.columns]
+    Returns:
+        布尔数组；条件引用的列都不存在或配置无效时返回 None
+    """
+    existing_cols = [c for c in config["columns"] if c in df.columns]
     if not existing_cols:
-        return pd.DataFrame()
+        return None
+    if coercer is None:
+        coercer = ColumnCoercer(df)
     
+    mask = np.zeros(len(df), dtype=bool)
     if "values" in config:
         # 值匹配模式
-        mask = pd.Series([False] * len(df))
         for col in existing_cols:
-            mask |= df[col].astype(str).isin(config["values"])
-        return df[mask].copy()
+            mask |= coercer.isin(col, config["values"])
     
     elif "condition" in config:
-        # 数值比较模式
-        mask = pd.Series([False] * len(df))
+        # 数值比较模式（NaN 比较结果为 False）
         threshold = config["threshold"]
         for col in existing_cols:
             if config["condition"] == "gt":
-                mask |= pd.to_numeric(df[col], errors="coerce") > threshold
+                mask |= coercer.numeric(col) > threshold
             elif config["condition"] == "gte":
-                mask |= pd.to_numeric(df[col], errors="coerce") >= threshold
-        return df[mask].copy()
+                mask |= coercer.numeric(col) >= threshold
+    
+    else:
+        return None
     
-    return pd.DataFrame()
+    if "streak" in config or "window" in config:
+        return sequence_mask(mask, config, coercer)
+    return mask
+
+
+def sequence_mask(daily: np.ndarray, config: dict, coercer: ColumnCoercer) -> np.ndarray | None:
+    """
+    序列条件的布尔掩码
+    
+    整表按（工号, 日期）排序一次，在排序后的单日条件上向量化计算连续段长度（streak）
+    或滑动窗口计数（window / min_count），标记属于满足条件的连续段或窗口的记录
+    
+    Args:
+        daily: 单日条件的布尔掩码
+        config: 异常条件配置
+        coercer: 列类型转换缓存（缓存排序结果）
+    
+    Returns:
+        布尔数组；缺少工号或日期列时返回 None
+    """
+    sequence = coercer.sequence()
+    if sequence is None:
+        return None
+    order, groups = sequence
+    
+    skip = condition_mask(coercer.df, config["skip"], coercer) if "skip" in config else None
+    if skip is not None:
+        keep = ~skip[order]
+        order, groups = order[keep], groups[keep]
+    
+    flags = daily[order]
+    if "streak" in config:
+        flagged = streak_mask(flags, groups, config["streak"])
+    else:
+        flagged = window_mask(flags, groups, config["window"], config["min_count"])
+    
+    mask = np.zeros(len(daily), dtype=bool)
+    mask[order[flagged]] = True
+    return mask
+
+
+def filter_abnormal(
+    df: pd.DataFrame,
+    abnormal_type: str,
+    config: dict,
+) -> pd.DataFrame:
+    """根据配置筛选异常记录"""
+    mask = condition_mask(df, config)
+    if mask is None:
+        return pd.DataFrame()
+    return df.take(np.flatnonzero(mask))
+
+
+def classify_abnormal(
+    df: pd.DataFrame,
+    abnormal_types: list[str],
+    conditions: dict[str, dict] | None = None,
+) -> np.ndarray:
+    """
+    一次性计算所有异常类型的多标签布尔矩阵
+    
+    Args:
+        df: 考勤数据
+        abnormal_types: 异常类型列表（必须存在于 conditions 中）
+        conditions: 异常条件配置，为 None 时使用全部异常类型的默认配置
+    
+    Returns:
+        形状为 (行数, 类型数) 的布尔矩阵，第 j 列对应 abnormal_types[j]
+    """
+    if conditions is None:
+        conditions = ABNORMAL_CONDITIONS
+    
+    coercer = ColumnCoercer(df)
+    matrix = np.zeros((len(df), len(abnormal_types)), dtype=bool)
+    for j, abnormal_type in enumerate(abnormal_types):
+        mask = condition_mask(df, conditions[abnormal_type], coercer)
+        if mask is not None:
+            matrix[:, j] = mask
+    return matrix
+
+
+def abnormal_report_df(
+    df: pd.DataFrame,
+    abnormal_types: list[str] | None = None,
+    conditions: dict[str, dict] | None = None,
+) -> tuple[dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    在已读取的考勤数据上筛选异常记录
+    
+    Args:
+        df: 考勤数据
+        abnormal_types: 要筛选的异常类型列表，为 None 时筛选 conditions 中的所有类型；
+            可以指定不在 conditions 中的序列类型，使用其默认参数
+        conditions: 异常条件配置，为 None 时使用默认配置（见 sequence_conditions）
+    
+    Returns:
+        (按异常类型划分的 DataFrame 字典, 合并后的异常记录)
+    """
+    if conditions is None:
+        conditions = DEFAULT_ABNORMAL_CONDITIONS
+    if abnormal_types is None:
+        abnormal_types = list(conditions.keys())
+    conditions = {**SEQUENCE_ABNORMAL_CONDITIONS, **conditions}
+    
+    known_types = []
+    for abnormal_type in abnormal_types:
+        if abnormal_type not in conditions:
+            print(f"警告: 未知的异常类型 '{abnormal_type}'，跳过")
+            continue
+        known_types.append(abnormal_type)
+    
+    # 所有类型在一次遍历中求值，再按行号数组取出各类型的记录
+    matrix = classify_abnormal(df, known_types, conditions)
+    row_indices = [np.flatnonzero(matrix[:, j]) for j in range(len(known_types))]
+    
+    results = {}
+    for abnormal_type, rows in zip(known_types, row_indices):
+        if len(rows) > 0:
+            abnormal_df = df.take(rows)
+            abnormal_df["异常类型"] = abnormal_type
+            results[abnormal_type] = abnormal_df
+        print(f"【{abnormal_type}】: {len(rows)} 条记录")
+    
+    # 合并报告同样由行号数组一次取出，避免循环中反复 concat
+    if results:
+        all_rows = np.concatenate(row_indices)
+        all_abnormal = df.take(all_rows).reset_index(drop=True)
+        all_abnormal["异常类型"] = np.repeat(known_types, [len(rows) for rows in row_indices])
+    else:
+        all_abnormal = pd.DataFrame()
+    
+    print(f"\n异常记录总数: {len(all_abnormal)}")
+    
+    return results, all_abnormal
 
 
 def generate_abnormal_report(
@@ -80,7 +354,11 @@ def generate_abnormal_report(
     abnormal_types: list[str] | None = None,
     output_path: str | None = None,
     auto_detect_header: bool = True,
-    sheet_name: str | int = 0,
+    sheet_name: str | int | list[str | int] = 0,
+    use_cache: bool = False,
+    compact: bool = False,
+    engine: str = DEFAULT_ENGINE,
+    conditions: dict[str, dict] | None = None,
 ) -> dict[str, pd.DataFrame]:
     """
     生成异常考勤报告
@@ -88,10 +366,14 @@ def generate_abnormal_report(
     Args:
         file_path: Excel 文件路径
         header_row: 表头所在行，为 None 时自动检测
-        abnormal_types: 要筛选的异常类型列表，为 None 时筛选所有类型
+        abnormal_types: 要筛选的异常类型列表，为 None 时筛选 conditions 中的所有类型
         output_path: 输出文件路径，为 None 时不保存
         auto_detect_header: 是否自动检测表头行
-        sheet_name: 工作表名称或索引，默认第一个 sheet
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时并行读取多个工作表并拼接
+        use_cache: 是否使用解析结果磁盘缓存
+        compact: 是否将列转换为紧凑类型（分类、可空整数，见 column_ops.compact_frame）
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
+        conditions: 异常条件配置，为 None 时使用默认配置（见 sequence_conditions）
     
     Returns:
         字典，key 为异常类型，value 为对应的 DataFrame
@@ -100,42 +382,25 @@ def generate_abnormal_report(
     if not path.exists():
         raise FileNotFoundError(f"文件不存在: {file_path}")
     
-    # 自动检测表头行
-    if header_row is None and auto_detect_header:
-        header_row = detect_header_row(file_path, sheet_name=sheet_name)
-        print(f"自动检测表头行: {header_row}")
-    elif header_row is None:
+    # 读取数据，未指定表头行时在同一次解析中自动检测
+    if header_row is None and not auto_detect_header:
         header_row = 0
+    df, detected_row = load_excel(
+        file_path,
+        header_row=header_row,
+        sheet_name=sheet_name,
+        use_cache=use_cache,
+        compact=compact,
+        engine=engine,
+    )
+    if header_row is None:
+        print(f"自动检测表头行: {detected_row}")
     
-    df = pd.read_excel(file_path, header=header_row, sheet_name=sheet_name)
-    
-    if abnormal_types is None:
-        abnormal_types = list(DEFAULT_ABNORMAL_CONDITIONS.keys())
-    
-    results = {}
-    all_abnormal = pd.DataFrame()
-    
-    for abnormal_type in abnormal_types:
-        if abnormal_type not in DEFAULT_ABNORMAL_CONDITIONS:
-            print(f"警告: 未知的异常类型 '{abnormal_type}'，跳过")
-            continue
-        
-        config = DEFAULT_ABNORMAL_CONDITIONS[abnormal_type]
-        abnormal_df = filter_abnormal(df, abnormal_type, config)
-        
-        if not abnormal_df.empty:
-            abnormal_df = abnormal_df.copy()
-            abnormal_df["异常类型"] = abnormal_type
-            results[abnormal_type] = abnormal_df
-            all_abnormal = pd.concat([all_abnormal, abnormal_df], ignore_index=True)
-            print(f"【{abnormal_type}】: {len(abnormal_df)} 条记录")
-        else:
-            print(f"【{abnormal_type}】: 0 条记录")
-    
-    print(f"\n异常记录总数: {len(all_abnormal)}")
+    with span(TRANSFORM, rows=len(df)):
+        results, all_abnormal = abnormal_report_df(df, abnormal_types, conditions)
     
     if output_path and not all_abnormal.empty:
-        all_abnormal.to_excel(output_path, index=False)
+        write_frame(all_abnormal, output_path)
         print(f"已保存到: {output_path}")
     
     return results
@@ -145,26 +410,46 @@ def main():
     parser = argparse.ArgumentParser(description="生成异常考勤报告")
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("--header-row", type=int, help="表头所在行（不指定则自动检测）")
-    parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    parser.add_argument(
+        "-s", "--sheet",
+        nargs="+",
+        default=["0"],
+        help="工作表名称或索引（可多个，all 为全部工作表，并行读取后拼接），默认 0",
+    )
     parser.add_argument(
         "-t", "--types",
         nargs="+",
-        choices=list(DEFAULT_ABNORMAL_CONDITIONS.keys()),
+        choices=list(ABNORMAL_CONDITIONS.keys()),
         help="要筛选的异常类型",
     )
+    add_sequence_arguments(parser)
     parser.add_argument("-o", "--output", help="输出文件路径")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument("--compact", action="store_true", help="读取后将列转换为紧凑类型（分类、可空整数），减少内存占用")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
-    sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
+    sheet = parse_sheet_arg(args.sheet)
     
     try:
-        generate_abnormal_report(
-            args.file,
-            header_row=args.header_row,
-            abnormal_types=args.types,
-            output_path=args.output,
-            sheet_name=sheet,
-        )
+        with profile_run(args.profile_output, "abnormal_report", args.profile_format):
+            generate_abnormal_report(
+                args.file,
+                header_row=args.header_row,
+                abnormal_types=args.types,
+                output_path=args.output,
+                sheet_name=sheet,
+                use_cache=not args.no_cache,
+                compact=args.compact,
+                engine=args.engine,
+                conditions=sequence_conditions(args.streak_days, args.late_window),
+            )
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,98 @@
+"""
+统一命令行入口
+按子命令只导入对应的脚本，脚本通过 lazy_imports 引用 pandas / numpy，
+第一次实际使用时才加载，--help 与参数错误无需等待依赖导入；--timing 输出启动与运行耗时。
+安装后可直接以 aliy 命令运行（见 pyproject.toml 的 [project.scripts]）
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import time
+
+# 子命令 -> (脚本模块, 说明)，列出命令时不导入任何脚本
+COMMANDS = {
+    "read_excel_head": ("read_excel_head", "读取 Excel 前 N 行"),
+    "detect_header": ("detect_header", "自动检测表头行"),
+    "validate_columns": ("validate_columns", "校验列名模板"),
+    "analyze_excel_columns": ("analyze_excel_columns", "分析列唯一值 / 列画像"),
+    "filter_excel": ("filter_excel", "按条件剔除行"),
+    "clean_attendance": ("clean_attendance", "考勤数据清洗"),
+    "split_excel": ("split_excel", "按列拆分文件"),
+    "join_excel": ("join_excel", "关联两个 Excel"),
+    "abnormal_report": ("abnormal_report", "异常考勤报告"),
+    "summary_by_employee": ("summary_by_employee", "按工号汇总"),
+    "summary_by_group": ("summary_by_group", "按维度分组汇总"),
+    "pipeline": ("pipeline", "多阶段流水线（一次读取）"),
+    "batch": ("batch", "批量处理多个文件"),
+    "serve": ("serve", "本地常驻 HTTP 服务"),
+    "cache": ("frame_cache", "管理解析结果缓存"),
+    "result_cache": ("result_cache", "管理报表结果缓存"),
+    "generate_attendance": ("generate_attendance", "生成合成考勤数据"),
+    "benchmark": ("benchmark", "性能基准测试"),
+}
+
+# 延迟加载的重量级依赖（各脚本通过 lazy_imports 引用，openpyxl 等只在函数内导入）
+LAZY_MODULES = ["pandas", "numpy"]
+
+
+def loaded_modules(names: list[str] = LAZY_MODULES) -> list[str]:
+    """返回已实际导入的依赖"""
+    return [name for name in names if name in sys.modules]
+
+
+def print_commands() -> None:
+    print("用法: aliy.py [--timing] <命令> [参数...]\n")
+    print("命令:")
+    width = max(len(name) for name in COMMANDS)
+    for name, (_, description) in COMMANDS.items():
+        print(f"  {name:<{width}}  {description}")
+    print("\n查看命令参数: aliy.py <命令> --help")
+
+
+def main(argv: list[str] | None = None) -> int:
+    start = time.perf_counter()
+    args = list(sys.argv[1:] if argv is None else argv)
+    
+    timing = False
+    if args and args[0] == "--timing":
+        timing = True
+        args = args[1:]
+    
+    if not args or args[0] in ("-h", "--help"):
+        print_commands()
+        return 0
+    
+    name = args[0]
+    if name not in COMMANDS:
+        print(f"错误: 未知的命令 '{name}'。可用命令: {', '.join(COMMANDS)}", file=sys.stderr)
+        return 2
+    
+    module = importlib.import_module(COMMANDS[name][0])
+    imported = time.perf_counter()
+    
+    # 子命令的 argparse 以 "aliy.py <命令>" 作为程序名
+    sys.argv = [f"aliy.py {name}"] + args[1:]
+    code = 0
+    try:
+        module.main()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, int) and e.code is not None:
+            print(e.code, file=sys.stderr)
+    finally:
+        if timing:
+            finished = time.perf_counter()
+            loaded = ", ".join(loaded_modules()) or "无"
+            print(
+                f"[timing] 导入命令 {(imported - start) * 1000:.0f} ms，"
+                f"运行 {(finished - imported) * 1000:.0f} ms，"
+                f"合计 {(finished - start) * 1000:.0f} ms（已加载依赖: {loaded}）",
+                file=sys.stderr,
+            )
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
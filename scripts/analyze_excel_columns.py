@@ -1,20 +1,47 @@
 """
 分析 Excel 文件，返回每列的唯一值集合
+画像模式（--profile）一次遍历统计所有列的缺失率、唯一值数与高频值，
+唯一值过多的列改为 HyperLogLog 估算，可分块读取超大工作表
 """
 
+from __future__ import annotations
+
 import argparse
 import json
 import sys
 from pathlib import Path
 
-import pandas as pd
+from column_ops import factorize_as_str
+from excel_loader import (
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_ENGINE,
+    ENGINES,
+    load_excel,
+    parse_sheet_arg,
+    read_excel_chunks,
+)
+from lazy_imports import np, pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from writers import write_frame
+
+# 精确计数的唯一值上限，超过后改为估算
+DEFAULT_EXACT_LIMIT = 10_000
+
+# 每列输出的高频值个数
+DEFAULT_TOP_K = 10
+
+# 文本模式下每列最多显示的唯一值个数
+DEFAULT_MAX_VALUES = 50
 
 
 def analyze_excel_columns(
     file_path: str,
     header_row: int = 0,
     columns: list[str] | None = None,
-    sheet_name: str | int = 0,
+    sheet_name: str | int | list[str | int] = 0,
+    use_cache: bool = False,
+    compact: bool = False,
+    engine: str = DEFAULT_ENGINE,
 ) -> dict[str, set]:
     """
     分析 Excel 文件，返回每列的唯一值集合
@@ -23,7 +50,10 @@ def analyze_excel_columns(
         file_path: Excel 文件路径
         header_row: 表头所在行（从 0 开始），默认第 0 行
         columns: 指定要分析的列名列表，为 None 时分析所有列
-        sheet_name: 工作表名称或索引，默认第一个 sheet
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时并行读取多个工作表并拼接
+        use_cache: 是否使用解析结果磁盘缓存
+        compact: 是否将列转换为紧凑类型（分类、可空整数，见 column_ops.compact_frame）
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
     
     Returns:
         字典，key 为列名，value 为该列的唯一值 set 集合
@@ -32,7 +62,14 @@ def analyze_excel_columns(
     if not path.exists():
         raise FileNotFoundError(f"文件不存在: {file_path}")
     
-    df = pd.read_excel(file_path, header=header_row, sheet_name=sheet_name)
+    df, _ = load_excel(
+        file_path,
+        header_row=header_row,
+        sheet_name=sheet_name,
+        use_cache=use_cache,
+        compact=compact,
+        engine=engine,
+    )
     
     # 确定要分析的列
     if columns:
@@ -44,42 +81,330 @@ def analyze_excel_columns(
         target_columns = df.columns.tolist()
     
     result = {}
-    for col in target_columns:
-        # 转为字符串并去除 NaN，获取唯一值
-        unique_values = df[col].dropna().astype(str).unique()
-        result[col] = set(unique_values)
+    with span(TRANSFORM, rows=len(df)):
+        for col in target_columns:
+            # 只对唯一值转字符串，去除缺失值与未出现的分类
+            codes, labels = factorize_as_str(df[col])
+            result[col] = set(labels[np.unique(codes[codes >= 0])])
     
     return result
 
 
+class HyperLogLog:
+    """
+    HyperLogLog 唯一值估算（2^precision 个寄存器，相对误差约 1.04 / sqrt(2^precision)）
+    
+    寄存器可按位取最大值合并，内存占用固定
+    """
+    
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+    
+    def add(self, labels: pd.Index) -> None:
+        """加入一批字符串值（重复值不影响结果，调用方传入唯一值即可）"""
+        if len(labels) == 0:
+            return
+        hashes = pd.util.hash_array(np.asarray(labels, dtype=object))
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+    
+    def count(self) -> int:
+        """估算唯一值个数"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # 小基数时改用线性计数
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """uint64 数组各元素的二进制位数（逐级二分，结果精确）"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = (values >> np.uint64(shift)) > 0
+        length[high] += shift
+        values[high] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+class _ColumnStats:
+    """单列的累计统计：行数、缺失数与各值计数（超过上限后为截断的近似计数）"""
+    
+    def __init__(self, dtype: str):
+        self.dtype = dtype
+        self.rows = 0
+        self.nulls = 0
+        self.counts = pd.Series(dtype=np.int64)
+        self.sketch = None
+    
+    def update(self, series: pd.Series, exact_limit: int, capacity: int) -> None:
+        codes, labels = factorize_as_str(series)
+        present = codes >= 0
+        counts = np.bincount(codes[present], minlength=len(labels))
+        # 分类列中未出现的分类不计入；不同原值转字符串后可能相同，按字符串合并
+        chunk = pd.Series(counts, index=labels)[counts > 0].groupby(level=0).sum()
+        
+        self.rows += len(codes)
+        self.nulls += len(codes) - int(present.sum())
+        if self.sketch is not None:
+            self.sketch.add(chunk.index)
+        self.counts = self.counts.add(chunk, fill_value=0).astype(np.int64)
+        
+        if self.sketch is None and len(self.counts) > exact_limit:
+            self.sketch = HyperLogLog()
+            self.sketch.add(self.counts.index)
+        if self.sketch is not None and len(self.counts) > capacity:
+            # 只保留计数最高的值，其余值的计数被丢弃（高频值的计数为下界）
+            self.counts = self.counts.nlargest(capacity)
+    
+    def distinct(self) -> int:
+        return self.sketch.count() if self.sketch is not None else len(self.counts)
+    
+    def top(self, top_k: int) -> list[tuple[str, int]]:
+        top = self.counts.sort_values(ascending=False, kind="stable").head(top_k)
+        return [(str(value), int(count)) for value, count in top.items()]
+
+
+class ColumnProfile:
+    """
+    分块累加的列画像
+    
+    一次遍历统计每列的行数、缺失数、唯一值数与高频值。唯一值数不超过 exact_limit 时精确计数；
+    超过后改用 HyperLogLog 估算唯一值数，值计数只保留最高的若干个，
+    打卡地点、修改原因等自由文本列的内存占用不随唯一值数增长
+    
+    用法:
+        profile = ColumnProfile()
+        for chunk in chunks:
+            profile.update(chunk)
+        result = profile.result()
+    """
+    
+    def __init__(
+        self,
+        columns: list[str] | None = None,
+        top_k: int = DEFAULT_TOP_K,
+        exact_limit: int = DEFAULT_EXACT_LIMIT,
+    ):
+        self.columns = columns
+        self.top_k = top_k
+        self.exact_limit = exact_limit
+        # 估算模式下保留的值计数个数，足够覆盖高频值
+        self.capacity = max(top_k * 100, 1000)
+        self._stats = {}
+    
+    def update(self, df: pd.DataFrame) -> None:
+        """累加一个数据块"""
+        if self.columns is None:
+            self.columns = df.columns.tolist()
+        missing = [c for c in self.columns if c not in df.columns]
+        if missing:
+            raise ValueError(f"列名不存在: {missing}")
+        
+        for col in self.columns:
+            if col not in self._stats:
+                self._stats[col] = _ColumnStats(str(df[col].dtype))
+            self._stats[col].update(df[col], self.exact_limit, self.capacity)
+    
+    def records(self) -> list[dict]:
+        """返回各列的画像（高频值为 [(值, 次数), ...] 列表）"""
+        if not self._stats:
+            raise ValueError("没有可分析的数据")
+        
+        records = []
+        for col in self.columns:
+            stats = self._stats[col]
+            records.append({
+                "列名": col,
+                "类型": stats.dtype,
+                "行数": stats.rows,
+                "缺失数": stats.nulls,
+                "缺失率": round(stats.nulls / stats.rows, 4) if stats.rows else 0.0,
+                "唯一值数": stats.distinct(),
+                "估算": stats.sketch is not None,
+                "高频值": stats.top(self.top_k),
+            })
+        return records
+    
+    def result(self) -> pd.DataFrame:
+        """返回画像表，高频值格式化为 "值(次数)" 文本"""
+        records = self.records()
+        for record in records:
+            record["高频值"] = ", ".join(f"{value}({count})" for value, count in record["高频值"])
+        return pd.DataFrame(records)
+
+
+def profile_excel_columns(
+    file_path: str,
+    header_row: int | None = 0,
+    columns: list[str] | None = None,
+    sheet_name: str | int | list[str | int] = 0,
+    use_cache: bool = False,
+    compact: bool = False,
+    top_k: int = DEFAULT_TOP_K,
+    exact_limit: int = DEFAULT_EXACT_LIMIT,
+    chunksize: int | None = None,
+    engine: str = DEFAULT_ENGINE,
+) -> ColumnProfile:
+    """
+    统计每列的缺失率、唯一值数与高频值
+    
+    Args:
+        file_path: Excel 文件路径
+        header_row: 表头所在行（从 0 开始），为 None 时自动检测
+        columns: 指定要分析的列名列表，为 None 时分析所有列
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时并行读取多个工作表并拼接
+        use_cache: 是否使用解析结果磁盘缓存
+        compact: 是否将列转换为紧凑类型（分类、可空整数，见 column_ops.compact_frame）
+        top_k: 每列保留的高频值个数
+        exact_limit: 精确计数的唯一值上限，超过后唯一值数为 HyperLogLog 估算值
+        chunksize: 分块读取的行数，指定时逐块累加（只支持单个工作表，不使用缓存）
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
+    
+    Returns:
+        ColumnProfile，通过 records() / result() 获取结果
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    
+    profile = ColumnProfile(columns, top_k=top_k, exact_limit=exact_limit)
+    if chunksize is not None:
+        chunks, _ = read_excel_chunks(
+            file_path,
+            header_row=header_row,
+            sheet_name=sheet_name,
+            usecols=columns,
+            chunksize=chunksize,
+            engine=engine,
+        )
+        for chunk in chunks:
+            with span(TRANSFORM, rows=len(chunk)):
+                profile.update(chunk)
+        if profile.columns is None:
+            raise ValueError("没有可分析的数据")
+    else:
+        df, _ = load_excel(
+            file_path,
+            header_row=header_row,
+            sheet_name=sheet_name,
+            usecols=columns,
+            use_cache=use_cache,
+            compact=compact,
+            engine=engine,
+        )
+        with span(TRANSFORM, rows=len(df)):
+            profile.update(df)
+    return profile
+
+
+def _print_profile(records: list[dict]) -> None:
+    for record in records:
+        mark = "≈" if record["估算"] else ""
+        print(
+            f"\n【{record['列名']}】{record['类型']}  缺失 {record['缺失数']}/{record['行数']}"
+            f"（{record['缺失率']:.1%}），唯一值 {mark}{record['唯一值数']} 个"
+        )
+        if record["高频值"]:
+            print("  " + ", ".join(f"{value}({count})" for value, count in record["高频值"]))
+
+
 def main():
     parser = argparse.ArgumentParser(description="分析 Excel 文件每列的唯一值")
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("--header-row", type=int, default=0, help="表头所在行，默认 0")
-    parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    parser.add_argument(
+        "-s", "--sheet",
+        nargs="+",
+        default=["0"],
+        help="工作表名称或索引（可多个，all 为全部工作表，并行读取后拼接），默认 0",
+    )
     parser.add_argument("-c", "--columns", nargs="+", help="指定要分析的列名（可多个）")
     parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument("--compact", action="store_true", help="读取后将列转换为紧凑类型（分类、可空整数），减少内存占用")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    parser.add_argument(
+        "--max-values",
+        type=int,
+        default=DEFAULT_MAX_VALUES,
+        help=f"终端输出每列最多显示的唯一值个数，默认 {DEFAULT_MAX_VALUES}（0 为不限制；--json 输出全部唯一值）",
+    )
+    parser.add_argument("--profile", action="store_true", help="画像模式：统计缺失率、唯一值数与高频值")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_K, help=f"画像模式每列的高频值个数，默认 {DEFAULT_TOP_K}")
+    parser.add_argument(
+        "--exact-limit",
+        type=int,
+        default=DEFAULT_EXACT_LIMIT,
+        help=f"画像模式精确计数的唯一值上限，超过后估算，默认 {DEFAULT_EXACT_LIMIT}",
+    )
+    parser.add_argument("--chunksize", type=int, help="画像模式分块读取的行数（用于超大文件，内存占用固定）")
+    parser.add_argument("-o", "--output", help="画像模式的输出文件路径")
+    # --profile 为画像模式，性能剖析使用 --profile-output
+    add_profile_arguments(parser, "--profile-output")
     
     args = parser.parse_args()
-    sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
+    sheet = parse_sheet_arg(args.sheet)
     
     try:
-        result = analyze_excel_columns(
-            args.file,
-            header_row=args.header_row,
-            columns=args.columns,
-            sheet_name=sheet,
-        )
-        
-        if args.json:
-            # 转换 set 为 list 以便 JSON 序列化
-            json_result = {k: sorted(v) for k, v in result.items()}
-            print(json.dumps(json_result, ensure_ascii=False, indent=2))
-        else:
-            for col, values in result.items():
-                print(f"\n【{col}】({len(values)} 个唯一值)")
-                print(f"  {sorted(values)}")
-                
+        with profile_run(args.profile_output, "analyze_excel_columns", args.profile_format):
+            if args.profile:
+                profile = profile_excel_columns(
+                    args.file,
+                    header_row=args.header_row,
+                    columns=args.columns,
+                    sheet_name=sheet,
+                    use_cache=not args.no_cache,
+                    compact=args.compact,
+                    top_k=args.top,
+                    exact_limit=args.exact_limit,
+                    chunksize=args.chunksize,
+                    engine=args.engine,
+                )
+                records = profile.records()
+                if args.json:
+                    print(json.dumps(records, ensure_ascii=False, indent=2))
+                else:
+                    _print_profile(records)
+                if args.output:
+                    write_frame(profile.result(), args.output)
+                    print(f"\n已保存到: {args.output}")
+                return
+            
+            result = analyze_excel_columns(
+                args.file,
+                header_row=args.header_row,
+                columns=args.columns,
+                sheet_name=sheet,
+                use_cache=not args.no_cache,
+                compact=args.compact,
+                engine=args.engine,
+            )
+            
+            if args.json:
+                # 转换 set 为 list 以便 JSON 序列化；JSON 供程序使用，不截断
+                json_result = {k: sorted(v) for k, v in result.items()}
+                print(json.dumps(json_result, ensure_ascii=False, indent=2))
+            else:
+                limit = args.max_values or None
+                for col, values in result.items():
+                    print(f"\n【{col}】({len(values)} 个唯一值)")
+                    shown = sorted(values)[:limit]
+                    suffix = f" ... 另有 {len(values) - len(shown)} 个" if len(shown) < len(values) else ""
+                    print(f"  {shown}{suffix}")
+    
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,366 @@
+"""
+批量处理多个考勤文件
+接受目录或通配符，在进程池中并行处理每个文件（清洗、异常报告、分组汇总、拆分），
+结果按输入顺序流式写入一个合并输出文件，单个文件出错不影响其他文件
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import io
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from abnormal_report import (
+    ABNORMAL_CONDITIONS,
+    abnormal_report_df,
+    add_sequence_arguments,
+    sequence_conditions,
+)
+from clean_attendance import clean_attendance_df, select_rules
+from excel_loader import DEFAULT_ENGINE, ENGINES, load_excel, parse_sheet_arg
+from lazy_imports import pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from split_excel import split_df
+from summary_by_group import summary_by_group_df
+from writers import FrameWriter
+
+# 支持的任务
+TASKS = ["clean", "abnormal", "summary_by_group", "split"]
+
+# 合并输出中标记来源文件的列
+SOURCE_COLUMN = "来源文件"
+
+# 目录中匹配的文件扩展名
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+
+
+def expand_inputs(inputs: list[str]) -> list[str]:
+    """
+    将目录、通配符与文件路径展开为文件列表（按输入顺序，去重）
+    
+    目录只匹配其中的 .xlsx / .xlsm 文件，跳过 Excel 的临时文件（~$ 开头）
+    
+    Args:
+        inputs: 文件路径、目录或通配符列表
+    
+    Returns:
+        文件路径列表
+    """
+    files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matched = sorted(
+                str(p) for p in path.iterdir()
+                if p.suffix.lower() in EXCEL_SUFFIXES and not p.name.startswith("~$")
+            )
+        elif glob.has_magic(item):
+            matched = sorted(glob.glob(item, recursive=True))
+        elif path.exists():
+            matched = [item]
+        else:
+            raise FileNotFoundError(f"文件不存在: {item}")
+        files.extend(matched)
+    
+    seen = set()
+    unique = []
+    for file in files:
+        key = Path(file).resolve()
+        if key not in seen:
+            seen.add(key)
+            unique.append(file)
+    if not unique:
+        raise ValueError(f"没有匹配的文件: {inputs}")
+    return unique
+
+
+def process_file(task: str, file_path: str, options: dict) -> pd.DataFrame | dict[str, int]:
+    """
+    处理单个文件（在工作进程中执行）
+    
+    Args:
+        task: 任务名称（clean / abnormal / summary_by_group / split）
+        file_path: 文件路径
+        options: 任务参数，见 run_batch
+    
+    Returns:
+        split 返回各拆分值的行数，其余任务返回结果 DataFrame
+    """
+    df, _ = load_excel(
+        file_path,
+        header_row=options.get("header_row"),
+        sheet_name=options.get("sheet_name", 0),
+        use_cache=options.get("use_cache", False),
+        engine=options.get("engine", DEFAULT_ENGINE),
+    )
+    # 只有串行（jobs=1）时在主进程中执行，区间才会被记录
+    with span(TRANSFORM, rows=len(df), file=Path(file_path).name):
+        if task == "clean":
+            return clean_attendance_df(df, options.get("rules"))
+        if task == "abnormal":
+            conditions = sequence_conditions(options.get("streak_days"), options.get("late_window"))
+            _, result = abnormal_report_df(df, options.get("types"), conditions)
+            return result
+        if task == "summary_by_group":
+            return summary_by_group_df(df, options["group_by"], options.get("columns"))
+    if task == "split":
+        output_dir = Path(options["output_dir"]) / Path(file_path).stem
+        return split_df(df, options["column"], str(output_dir), file_format=options.get("format", "xlsx"))
+    raise ValueError(f"未知的任务 '{task}'。可用任务: {TASKS}")
+
+
+def _process_captured(task: str, file_path: str, options: dict):
+    """
+    在工作进程中处理单个文件，返回 (结果, 各步骤的进度输出)
+    
+    输出先暂存，由主进程按输入顺序打印，避免多个进程的输出交错
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        result = process_file(task, file_path, options)
+    return result, output.getvalue()
+
+
+def _ordered_results(task: str, files: list[str], options: dict, jobs: int):
+    """
+    按输入顺序逐个返回 (文件, 结果, 异常)
+    
+    并行时限制同时提交的任务数，已完成但排在后面的结果只在内存中等待前面的文件；
+    串行时各步骤的进度输出直接打印，并行时在返回该文件的结果前打印
+    """
+    if jobs <= 1:
+        for file_path in files:
+            try:
+                yield file_path, process_file(task, file_path, options), None
+            except Exception as e:
+                yield file_path, None, e
+        return
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for file_path in files:
+            if len(pending) >= jobs * 2:
+                yield _collect(*pending.popleft())
+            pending.append((file_path, executor.submit(_process_captured, task, file_path, options)))
+        while pending:
+            yield _collect(*pending.popleft())
+
+
+def _collect(file_path, future):
+    try:
+        result, output = future.result()
+    except Exception as e:
+        return file_path, None, e
+    print(output, end="")
+    return file_path, result, None
+
+
+def _align_frame(result: pd.DataFrame, dtypes: pd.Series) -> pd.DataFrame:
+    """
+    将之后文件的结果对齐到首个文件的列与类型
+    
+    缺少的列补为缺失值，类型不同的列转换为首个文件的类型，流式写出的各数据块类型一致；
+    无法转换（如整数列出现缺失值）或首个文件为分类类型时保留原类型
+    """
+    result = result.reindex(columns=dtypes.index)
+    for column, dtype in dtypes.items():
+        if result[column].dtype == dtype or isinstance(dtype, pd.CategoricalDtype):
+            continue
+        try:
+            result[column] = result[column].astype(dtype)
+        except (ValueError, TypeError):
+            pass
+    return result
+
+
+def run_batch(
+    task: str,
+    inputs: list[str],
+    output_path: str | None = None,
+    jobs: int | None = None,
+    **options,
+) -> dict:
+    """
+    批量处理多个文件
+    
+    clean / abnormal / summary_by_group 的各文件结果加上"来源文件"列后，
+    按输入顺序流式写入 output_path；split 将每个文件拆分到 output_path 下以文件名命名的子目录
+    
+    Args:
+        task: 任务名称（clean / abnormal / summary_by_group / split）
+        inputs: 文件路径、目录或通配符列表
+        output_path: 合并输出文件路径（split 为输出目录），为 None 时不保存
+        jobs: 并行处理的进程数，为 None 时使用全部 CPU 核心
+        **options: 任务参数
+            header_row / sheet_name / use_cache / engine: 读取参数
+            rules: clean 的清洗规则
+            types: abnormal 的异常类型列表
+            streak_days / late_window: abnormal 的序列条件参数（见 abnormal_report.sequence_conditions）
+            group_by / columns: summary_by_group 的分组列与汇总列
+            column / format: split 的拆分列与输出格式
+    
+    Returns:
+        字典，包含 files（各文件的结果行数，split 为各拆分值行数）、rows（合并输出行数）
+        与 errors（出错文件及错误信息）
+    """
+    if task not in TASKS:
+        raise ValueError(f"未知的任务 '{task}'。可用任务: {TASKS}")
+    if task == "summary_by_group" and not options.get("group_by"):
+        raise ValueError("summary_by_group 需要指定分组列 group_by")
+    if task == "split":
+        if not options.get("column"):
+            raise ValueError("split 需要指定拆分列 column")
+        if output_path is None:
+            raise ValueError("split 需要指定输出目录")
+        options["output_dir"] = output_path
+    
+    files = expand_inputs(inputs)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(files))
+    print(f"共 {len(files)} 个文件，{jobs} 个进程")
+    
+    summary = {}
+    errors = {}
+    rows = 0
+    dtypes = None
+    writer = FrameWriter(output_path) if output_path and task != "split" else None
+    try:
+        for file_path, result, error in _ordered_results(task, files, options, jobs):
+            if error is not None:
+                errors[file_path] = str(error)
+                print(f"错误 [{file_path}]: {error}")
+                continue
+            if task == "split":
+                summary[file_path] = result
+                print(f"[{file_path}] 拆分为 {len(result)} 个文件")
+                continue
+            
+            summary[file_path] = len(result)
+            print(f"[{file_path}] {len(result)} 行")
+            if writer is None or result.empty:
+                continue
+            # 结果中已有来源文件列（如输入本身是合并输出）时以本次的文件名覆盖
+            result = result.drop(columns=SOURCE_COLUMN, errors="ignore")
+            result.insert(0, SOURCE_COLUMN, Path(file_path).name)
+            # 合并输出的列与类型以第一个文件为准
+            if dtypes is None:
+                dtypes = result.dtypes
+            else:
+                extra = [c for c in result.columns if c not in dtypes.index]
+                if extra:
+                    print(f"警告: [{file_path}] 的列 {extra} 不在合并输出中")
+                result = _align_frame(result, dtypes)
+            writer.write(result)
+            rows += len(result)
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    print(f"\n完成: {len(summary)} 个文件成功，{len(errors)} 个文件出错")
+    if writer is not None and rows:
+        print(f"已保存到: {output_path}（{rows} 行）")
+    
+    return {"files": summary, "rows": rows, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量处理多个考勤文件（进程池并行）")
+    subparsers = parser.add_subparsers(dest="task", required=True)
+    
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("inputs", nargs="+", help="文件路径、目录或通配符（如 'data/*.xlsx'）")
+    common.add_argument("--header-row", type=int, help="表头所在行（不指定则自动检测）")
+    common.add_argument(
+        "-s", "--sheet",
+        nargs="+",
+        default=["0"],
+        help="工作表名称或索引（可多个，all 为全部工作表，并行读取后拼接），默认 0",
+    )
+    common.add_argument("-j", "--jobs", type=int, help="并行处理的进程数，默认使用全部 CPU 核心")
+    common.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    common.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    add_profile_arguments(common)
+    
+    clean = subparsers.add_parser("clean", parents=[common], help="批量清洗")
+    clean.add_argument("-o", "--output", help="合并输出文件路径")
+    clean.add_argument("--no-weekend", action="store_true", help="不剔除周末")
+    clean.add_argument("--no-intern", action="store_true", help="不剔除实习/外包")
+    clean.add_argument("--no-resigned", action="store_true", help="不剔除离职员工")
+    clean.add_argument("--no-abnormal", action="store_true", help="不剔除异常打卡")
+    
+    abnormal = subparsers.add_parser("abnormal", parents=[common], help="批量生成异常考勤报告")
+    abnormal.add_argument("-o", "--output", help="合并输出文件路径")
+    abnormal.add_argument(
+        "-t", "--types",
+        nargs="+",
+        choices=list(ABNORMAL_CONDITIONS.keys()),
+        help="要筛选的异常类型",
+    )
+    add_sequence_arguments(abnormal)
+    
+    group = subparsers.add_parser("summary_by_group", parents=[common], help="批量分组汇总")
+    group.add_argument("-o", "--output", help="合并输出文件路径")
+    group.add_argument("-g", "--group-by", nargs="+", required=True, help="分组列名")
+    group.add_argument("-c", "--columns", nargs="+", help="要汇总的列名（不指定则使用默认配置）")
+    
+    split = subparsers.add_parser("split", parents=[common], help="批量按列拆分")
+    split.add_argument("-o", "--output", required=True, help="输出目录（每个文件一个子目录）")
+    split.add_argument("-c", "--column", required=True, help="用于拆分的列名")
+    split.add_argument(
+        "--format",
+        default="xlsx",
+        choices=["xlsx", "csv", "parquet"],
+        help="输出文件格式，默认 xlsx",
+    )
+    
+    args = parser.parse_args()
+    sheet = parse_sheet_arg(args.sheet)
+    
+    options = {
+        "header_row": args.header_row,
+        "sheet_name": sheet,
+        "use_cache": not args.no_cache,
+        "engine": args.engine,
+    }
+    if args.task == "clean":
+        options["rules"] = select_rules(
+            weekend=not args.no_weekend,
+            intern=not args.no_intern,
+            resigned=not args.no_resigned,
+            abnormal=not args.no_abnormal,
+        )
+    elif args.task == "abnormal":
+        options["types"] = args.types
+        options["streak_days"] = args.streak_days
+        options["late_window"] = args.late_window
+    elif args.task == "summary_by_group":
+        options["group_by"] = args.group_by
+        options["columns"] = args.columns
+    else:
+        options["column"] = args.column
+        options["format"] = args.format
+    
+    try:
+        with profile_run(args.profile_output, f"batch {args.task}", args.profile_format):
+            result = run_batch(args.task, args.inputs, output_path=args.output, jobs=args.jobs, **options)
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    if result["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
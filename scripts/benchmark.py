@@ -0,0 +1,288 @@
+"""
+性能基准测试
+在不同规模的合成考勤数据上测量各脚本公开函数的耗时与内存峰值，
+结果保存为 JSON，可与其他提交的结果对比
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+from abnormal_report import generate_abnormal_report
+from analyze_excel_columns import analyze_excel_columns
+from clean_attendance import clean_attendance, clean_attendance_chunked
+from detect_header import detect_header_row
+from excel_loader import load_excel
+from filter_excel import filter_excel
+from frame_cache import DEFAULT_CACHE_DIR
+from generate_attendance import generate_attendance
+from join_excel import join_excel, star_join_excel
+from lazy_imports import pd
+from pipeline import run_pipeline
+from read_excel_head import read_excel_head
+from split_excel import split_excel
+from summary_by_employee import summary_by_employee
+from summary_by_group import summary_by_group
+from validate_columns import validate_columns
+
+# 默认数据规模（行数）
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# 合成数据默认保存目录，同一规模的数据只生成一次
+DEFAULT_DATA_DIR = DEFAULT_CACHE_DIR / "benchmark"
+
+
+def prepare_data(rows: int, data_dir: str | None = None, seed: int = 0) -> dict[str, str]:
+    """
+    生成（或复用已生成的）指定规模的考勤表与花名册
+    
+    Args:
+        rows: 行数
+        data_dir: 数据目录，为 None 时使用默认目录
+        seed: 随机种子
+    
+    Returns:
+        字典，包含 attendance 与 roster 文件路径
+    """
+    path = Path(data_dir or DEFAULT_DATA_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    attendance = path / f"attendance_{rows}_s{seed}.xlsx"
+    roster = path / f"roster_{rows}_s{seed}.xlsx"
+    if not attendance.exists() or not roster.exists():
+        generate_attendance(str(attendance), rows=rows, seed=seed, roster_path=str(roster))
+    return {"attendance": str(attendance), "roster": str(roster)}
+
+
+def benchmark_cases(data: dict[str, str], output_dir: str) -> dict:
+    """
+    返回要测量的函数，key 为名称，value 为无参调用
+    
+    所有调用均不使用解析缓存，输出文件写入 output_dir
+    """
+    file_path = data["attendance"]
+    out = Path(output_dir)
+    return {
+        "detect_header_row": lambda: detect_header_row(file_path),
+        "read_excel_head": lambda: read_excel_head(file_path, rows=5),
+        "load_excel": lambda: load_excel(file_path),
+        "load_excel_compact": lambda: load_excel(file_path, compact=True),
+        "load_excel_xml": lambda: load_excel(file_path, engine="xml"),
+        "validate_columns": lambda: validate_columns(file_path, header_row=1),
+        "analyze_excel_columns": lambda: analyze_excel_columns(file_path, header_row=1),
+        "filter_excel": lambda: filter_excel(
+            file_path, "星期", ["星期六", "星期日"], header_row=1, output_path=str(out / "filtered.xlsx")
+        ),
+        "clean_attendance": lambda: clean_attendance(file_path, output_path=str(out / "cleaned.xlsx")),
+        "clean_attendance_chunked": lambda: clean_attendance_chunked(
+            file_path, output_path=str(out / "cleaned_chunked.xlsx")
+        ),
+        "generate_abnormal_report": lambda: generate_abnormal_report(
+            file_path, output_path=str(out / "abnormal.xlsx")
+        ),
+        "summary_by_employee": lambda: summary_by_employee(file_path),
+        "summary_by_group": lambda: summary_by_group(file_path, ["部门"]),
+        "summary_by_group_compact": lambda: summary_by_group(file_path, ["部门"], compact=True),
+        "summary_by_group_xml": lambda: summary_by_group(file_path, ["部门"], engine="xml"),
+        "summary_by_group_chunked": lambda: summary_by_group(file_path, ["部门"], chunksize=50_000),
+        "summary_by_group_sets": lambda: summary_by_group(
+            file_path, None, grouping_sets=[["部门"], ["考勤组"], ["部门", "考勤组"], ["人员类型"]]
+        ),
+        "join_excel": lambda: join_excel(
+            file_path, data["roster"], on="工号", right_columns=["实际工作城市"]
+        ),
+        "star_join_excel": lambda: star_join_excel(
+            file_path,
+            [
+                {"right_file": data["roster"], "on": "工号", "columns": ["实际工作城市"]},
+                {"right_file": data["roster"], "on": "部门", "columns": ["人员类型"], "name": "部门"},
+            ],
+        ),
+        "split_excel": lambda: split_excel(
+            file_path, "部门", output_dir=str(out / "split"), file_format="csv"
+        ),
+        "run_pipeline": lambda: run_pipeline({
+            "input": file_path,
+            "stages": [
+                {"stage": "clean"},
+                {"stage": "join", "right_file": data["roster"], "on": "工号", "columns": ["实际工作城市"]},
+                {"stage": "abnormal"},
+                {"stage": "summary_by_employee"},
+                {"stage": "summary_by_group", "group_by": ["实际工作城市", "部门"]},
+            ],
+        }),
+    }
+
+
+def measure(func, repeat: int = 1, memory: bool = True) -> dict:
+    """
+    测量函数耗时（取多次运行的最小值）与 Python 内存分配峰值
+    
+    内存峰值通过 tracemalloc 单独运行一次测得，不影响耗时结果
+    """
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            func()
+        runs.append(round(time.perf_counter() - start, 4))
+    
+    result = {"seconds": min(runs), "runs": runs}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            with redirect_stdout(io.StringIO()):
+                func()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def _environment() -> dict:
+    """记录运行环境，便于跨提交对比"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    
+    import openpyxl
+    
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "openpyxl": openpyxl.__version__,
+    }
+
+
+def run_benchmarks(
+    sizes: list[int] | None = None,
+    only: list[str] | None = None,
+    repeat: int = 1,
+    memory: bool = True,
+    data_dir: str | None = None,
+    seed: int = 0,
+) -> dict:
+    """
+    运行基准测试
+    
+    Args:
+        sizes: 数据规模（行数）列表，为 None 时使用 10k/100k/1M
+        only: 只测量指定名称的函数，为 None 时测量全部
+        repeat: 每个函数的运行次数
+        memory: 是否测量内存峰值
+        data_dir: 合成数据目录
+        seed: 随机种子
+    
+    Returns:
+        包含 environment 与 results 的字典
+    """
+    if sizes is None:
+        sizes = DEFAULT_SIZES
+    
+    results = []
+    for rows in sizes:
+        print(f"\n=== {rows} 行 ===")
+        data = prepare_data(rows, data_dir=data_dir, seed=seed)
+        with tempfile.TemporaryDirectory() as output_dir:
+            cases = benchmark_cases(data, output_dir)
+            unknown = [name for name in only or [] if name not in cases]
+            if unknown:
+                raise ValueError(f"未知的函数: {unknown}。可用函数: {list(cases)}")
+            
+            for name, func in cases.items():
+                if only and name not in only:
+                    continue
+                entry = {"name": name, "rows": rows}
+                try:
+                    entry.update(measure(func, repeat=repeat, memory=memory))
+                except Exception as e:
+                    entry["error"] = str(e)
+                    print(f"{name}: 错误 {e}")
+                else:
+                    peak = entry.get("peak_bytes")
+                    memory_text = f", 峰值 {peak / 1024 / 1024:.1f} MB" if peak is not None else ""
+                    print(f"{name}: {entry['seconds']:.3f} s{memory_text}")
+                results.append(entry)
+    
+    return {"environment": _environment(), "results": results}
+
+
+def compare_results(baseline: dict, current: dict) -> pd.DataFrame:
+    """
+    对比两次基准测试结果
+    
+    Returns:
+        每个（函数, 行数）的基线耗时、当前耗时与加速比
+    """
+    def frame(data):
+        df = pd.DataFrame(data["results"])
+        if "seconds" not in df.columns:
+            df["seconds"] = float("nan")
+        return df.set_index(["name", "rows"])["seconds"]
+    
+    result = pd.concat({"baseline": frame(baseline), "current": frame(current)}, axis=1).dropna()
+    result["speedup"] = (result["baseline"] / result["current"]).round(2)
+    return result.reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在合成考勤数据上测量各脚本的耗时与内存峰值")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出路径")
+    parser.add_argument("--sizes", type=int, nargs="+", help="数据规模（行数），默认 10000 100000 1000000")
+    parser.add_argument("--only", nargs="+", help="只测量指定的函数")
+    parser.add_argument("--repeat", type=int, default=1, help="每个函数的运行次数，默认 1")
+    parser.add_argument("--no-memory", action="store_true", help="不测量内存峰值")
+    parser.add_argument("--data-dir", help=f"合成数据目录（默认 {DEFAULT_DATA_DIR}）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，默认 0")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    
+    args = parser.parse_args()
+    
+    try:
+        result = run_benchmarks(
+            sizes=args.sizes,
+            only=args.only,
+            repeat=args.repeat,
+            memory=not args.no_memory,
+            data_dir=args.data_dir,
+            seed=args.seed,
+        )
+        if args.output:
+            Path(args.output).write_text(
+                json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+            print(f"\n已保存到: {args.output}")
+        if args.compare:
+            baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+            print(f"\n与 {args.compare} 对比:")
+            print(compare_results(baseline, result).to_string(index=False))
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,24 @@
 整合剔除周末、非正式员工、离职员工等默认规则
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
-
-from detect_header import detect_header_row
+from column_ops import isin_as_str
+from excel_loader import (
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_ENGINE,
+    ENGINES,
+    load_excel,
+    parse_sheet_arg,
+    read_excel_chunks,
+)
+from lazy_imports import np, pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from writers import FrameWriter, write_frame
 
 # 默认清洗规则
 # 无需打卡类型：休息、出差、自由班制、请假、补卡通过
@@ -35,13 +46,112 @@ DEFAULT_RULES = {
 }
 
 
+def select_rules(
+    weekend: bool = True,
+    intern: bool = True,
+    resigned: bool = True,
+    abnormal: bool = True,
+) -> dict[str, list[str]]:
+    """
+    从默认规则中选取要应用的规则
+    
+    Args:
+        weekend: 是否剔除周末
+        intern: 是否剔除实习/外包
+        resigned: 是否剔除离职员工
+        abnormal: 是否剔除异常打卡
+    
+    Returns:
+        清洗规则字典
+    """
+    rules = DEFAULT_RULES.copy()
+    if not weekend:
+        rules.pop("星期", None)
+    if not intern:
+        rules.pop("人员类型", None)
+    if not resigned:
+        rules.pop("员工状态", None)
+    if not abnormal:
+        rules.pop("上班 1 打卡结果", None)
+        rules.pop("下班 1 打卡结果", None)
+    return rules
+
+
+def build_rule_mask(
+    df: pd.DataFrame,
+    rules: dict[str, list[str]],
+) -> tuple[np.ndarray, dict[str, int]]:
+    """
+    将清洗规则编译为一个保留行的布尔掩码
+    
+    各规则的剔除行数按规则顺序计算（只统计被前面规则保留下来的行），
+    与逐条规则过滤的结果一致
+    
+    Args:
+        df: 考勤数据
+        rules: 清洗规则字典，key 为列名，value 为要剔除的值列表
+    
+    Returns:
+        (保留行掩码, 各规则剔除行数)
+    """
+    keep = np.ones(len(df), dtype=bool)
+    stats = {}
+    for column, values in rules.items():
+        if column not in df.columns:
+            print(f"警告: 列 '{column}' 不存在，跳过该规则")
+            continue
+        
+        hit = isin_as_str(df[column], values)
+        stats[column] = int(np.count_nonzero(hit & keep))
+        keep &= ~hit
+    
+    return keep, stats
+
+
+def clean_attendance_df(
+    df: pd.DataFrame,
+    rules: dict[str, list[str]] | None = None,
+) -> pd.DataFrame:
+    """
+    对已读取的考勤数据应用清洗规则
+    
+    Args:
+        df: 考勤数据
+        rules: 清洗规则字典，key 为列名，value 为要剔除的值列表
+    
+    Returns:
+        清洗后的 DataFrame
+    """
+    original_count = len(df)
+    
+    if rules is None:
+        rules = DEFAULT_RULES
+    
+    # 所有规则合并为一个掩码，只做一次行选择
+    keep, stats = build_rule_mask(df, rules)
+    for column, removed in stats.items():
+        if removed > 0:
+            print(f"剔除 [{column}] 包含 {rules[column]}: {removed} 行")
+    
+    df = df.take(np.flatnonzero(keep))
+    
+    print(f"\n清洗统计:")
+    print(f"  原始行数: {original_count}")
+    print(f"  剔除行数: {original_count - len(df)}")
+    print(f"  剩余行数: {len(df)}")
+    
+    return df
+
+
 def clean_attendance(
     file_path: str,
     header_row: int | None = None,
     rules: dict[str, list[str]] | None = None,
     output_path: str | None = None,
     auto_detect_header: bool = True,
-    sheet_name: str | int = 0,
+    sheet_name: str | int | list[str | int] = 0,
+    use_cache: bool = False,
+    engine: str = DEFAULT_ENGINE,
 ) -> pd.DataFrame:
     """
     考勤数据清洗
@@ -52,7 +162,9 @@ def clean_attendance(
         rules: 清洗规则字典，key 为列名，value 为要剔除的值列表
         output_path: 输出文件路径，为 None 时不保存
         auto_detect_header: 是否自动检测表头行
-        sheet_name: 工作表名称或索引，默认第一个 sheet
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时并行读取多个工作表并拼接
+        use_cache: 是否使用解析结果磁盘缓存
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
     
     Returns:
         清洗后的 DataFrame
@@ -61,81 +173,173 @@ def clean_attendance(
     if not path.exists():
         raise FileNotFoundError(f"文件不存在: {file_path}")
     
-    # 自动检测表头行
-    if header_row is None and auto_detect_header:
-        header_row = detect_header_row(file_path, sheet_name=sheet_name)
-        print(f"自动检测表头行: {header_row}")
-    elif header_row is None:
+    # 读取数据，未指定表头行时在同一次解析中自动检测
+    if header_row is None and not auto_detect_header:
         header_row = 0
+    df, detected_row = load_excel(
+        file_path,
+        header_row=header_row,
+        sheet_name=sheet_name,
+        use_cache=use_cache,
+        engine=engine,
+    )
+    if header_row is None:
+        print(f"自动检测表头行: {detected_row}")
     
-    df = pd.read_excel(file_path, header=header_row, sheet_name=sheet_name)
-    original_count = len(df)
+    with span(TRANSFORM, rows=len(df)):
+        df = clean_attendance_df(df, rules)
+    
+    if output_path:
+        write_frame(df, output_path)
+        print(f"\n已保存到: {output_path}")
+    
+    return df
+
+
+def clean_attendance_chunked(
+    file_path: str,
+    header_row: int | None = None,
+    rules: dict[str, list[str]] | None = None,
+    output_path: str | None = None,
+    auto_detect_header: bool = True,
+    sheet_name: str | int = 0,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    engine: str = DEFAULT_ENGINE,
+) -> dict[str, int]:
+    """
+    分块清洗考勤数据，逐块过滤并流式写出，内存占用与文件大小无关
+    
+    Args:
+        file_path: Excel 文件路径
+        header_row: 表头所在行，为 None 时自动检测
+        rules: 清洗规则字典，key 为列名，value 为要剔除的值列表
+        output_path: 输出文件路径，为 None 时只统计不保存
+        auto_detect_header: 是否自动检测表头行
+        sheet_name: 工作表名称或索引，默认第一个 sheet
+        chunksize: 每块的行数
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
+    
+    Returns:
+        字典，包含原始行数 original、剩余行数 kept 与各规则剔除行数 removed
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    
+    if header_row is None and not auto_detect_header:
+        header_row = 0
+    chunks, detected_row = read_excel_chunks(
+        file_path,
+        header_row=header_row,
+        sheet_name=sheet_name,
+        chunksize=chunksize,
+        engine=engine,
+    )
+    if header_row is None:
+        print(f"自动检测表头行: {detected_row}")
     
     if rules is None:
         rules = DEFAULT_RULES
     
-    # 应用清洗规则
-    stats = {}
-    for column, values in rules.items():
-        if column not in df.columns:
-            print(f"警告: 列 '{column}' 不存在，跳过该规则")
-            continue
-        
-        before = len(df)
-        mask = ~df[column].astype(str).isin(values)
-        df = df[mask].copy()
-        removed = before - len(df)
-        stats[column] = removed
-        
-        if removed > 0:
-            print(f"剔除 [{column}] 包含 {values}: {removed} 行")
+    original_count = 0
+    kept_count = 0
+    removed = {}
+    writer = FrameWriter(output_path) if output_path else None
+    try:
+        for chunk in chunks:
+            if original_count == 0:
+                # 缺失列的警告只在第一块输出一次
+                for column in rules:
+                    if column not in chunk.columns:
+                        print(f"警告: 列 '{column}' 不存在，跳过该规则")
+                rules = {c: v for c, v in rules.items() if c in chunk.columns}
+            
+            with span(TRANSFORM, rows=len(chunk)):
+                keep, stats = build_rule_mask(chunk, rules)
+                for column, count in stats.items():
+                    removed[column] = removed.get(column, 0) + count
+                
+                kept = chunk.take(np.flatnonzero(keep))
+            if writer is not None:
+                writer.write(kept)
+            original_count += len(chunk)
+            kept_count += len(kept)
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    for column, count in removed.items():
+        if count > 0:
+            print(f"剔除 [{column}] 包含 {rules[column]}: {count} 行")
     
     print(f"\n清洗统计:")
     print(f"  原始行数: {original_count}")
-    print(f"  剔除行数: {original_count - len(df)}")
-    print(f"  剩余行数: {len(df)}")
-    
+    print(f"  剔除行数: {original_count - kept_count}")
+    print(f"  剩余行数: {kept_count}")
     if output_path:
-        df.to_excel(output_path, index=False)
         print(f"\n已保存到: {output_path}")
     
-    return df
+    return {"original": original_count, "kept": kept_count, "removed": removed}
 
 
 def main():
     parser = argparse.ArgumentParser(description="考勤数据清洗一站式脚本")
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("--header-row", type=int, help="表头所在行（不指定则自动检测）")
-    parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    parser.add_argument(
+        "-s", "--sheet",
+        nargs="+",
+        default=["0"],
+        help="工作表名称或索引（可多个，all 为全部工作表，并行读取后拼接），默认 0",
+    )
     parser.add_argument("-o", "--output", help="输出文件路径")
     parser.add_argument("--no-weekend", action="store_true", help="不剔除周末")
     parser.add_argument("--no-intern", action="store_true", help="不剔除实习/外包")
     parser.add_argument("--no-resigned", action="store_true", help="不剔除离职员工")
     parser.add_argument("--no-abnormal", action="store_true", help="不剔除异常打卡")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument("--chunksize", type=int, help="分块读取的行数（用于超大文件，内存占用固定）")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
-    sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
+    sheet = parse_sheet_arg(args.sheet)
     
     # 根据参数调整规则
-    rules = DEFAULT_RULES.copy()
-    if args.no_weekend:
-        rules.pop("星期", None)
-    if args.no_intern:
-        rules.pop("人员类型", None)
-    if args.no_resigned:
-        rules.pop("员工状态", None)
-    if args.no_abnormal:
-        rules.pop("上班 1 打卡结果", None)
-        rules.pop("下班 1 打卡结果", None)
+    rules = select_rules(
+        weekend=not args.no_weekend,
+        intern=not args.no_intern,
+        resigned=not args.no_resigned,
+        abnormal=not args.no_abnormal,
+    )
     
     try:
-        clean_attendance(
-            args.file,
-            header_row=args.header_row,
-            rules=rules,
-            output_path=args.output,
-            sheet_name=sheet,
-        )
+        with profile_run(args.profile_output, "clean_attendance", args.profile_format):
+            if args.chunksize:
+                clean_attendance_chunked(
+                    args.file,
+                    header_row=args.header_row,
+                    rules=rules,
+                    output_path=args.output,
+                    sheet_name=sheet,
+                    chunksize=args.chunksize,
+                    engine=args.engine,
+                )
+                return
+            clean_attendance(
+                args.file,
+                header_row=args.header_row,
+                rules=rules,
+                output_path=args.output,
+                sheet_name=sheet,
+                use_cache=not args.no_cache,
+                engine=args.engine,
+            )
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
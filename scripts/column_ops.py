@@ -0,0 +1,186 @@
+"""
+列运算辅助函数
+在唯一值（分类编码）上做匹配，避免对整列逐行转换字符串；
+按考勤表模板将列转换为紧凑类型（分类、可空整数），筛选与分组直接在整数编码上进行
+"""
+
+from __future__ import annotations
+
+from lazy_imports import np, pd
+from validate_columns import ATTENDANCE_COLUMNS
+
+# astype(str) 对缺失值产生的文本
+_MISSING_TEXTS = {"nan", "None", "NaT", "<NA>"}
+
+# 取值有限的枚举文本列，转换为分类
+# 打卡时间、修改原因、打卡地点等自由文本几乎每行不同，转换为分类反而占用更多内存，保持原类型
+CATEGORY_COLUMNS = [
+    "部门", "人员类型", "员工状态", "星期", "班次", "考勤组",
+    "上班 1 打卡结果", "下班 1 打卡结果",
+]
+
+# 可空整数类型，按取值范围从小到大选择
+_INT_DTYPES = ["Int8", "Int16", "Int32", "Int64"]
+
+
+def _column_kind(column: str) -> str:
+    """考勤表模板列的紧凑类型：key / count / hours / category / keep"""
+    if column == "工号":
+        return "key"
+    if column in CATEGORY_COLUMNS:
+        return "category"
+    if column.endswith("次数") or column.endswith("天数"):
+        return "count"
+    if "时长" in column:
+        return "hours"
+    return "keep"
+
+
+# 考勤表各列的紧凑类型（由模板列名推导）
+DTYPE_PLAN = {column: _column_kind(column) for column in ATTENDANCE_COLUMNS}
+
+
+def factorize_as_str(series: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    """
+    将列分解为分类编码与字符串形式的唯一值
+    
+    Args:
+        series: 待分解的列
+    
+    Returns:
+        (编码数组（缺失值为 -1）, 唯一值的字符串 Index)
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    return codes, pd.Index(uniques).astype(str)
+
+
+def isin_as_str(
+    series: pd.Series,
+    values: list[str],
+    factorized: tuple[np.ndarray, pd.Index] | None = None,
+) -> np.ndarray:
+    """
+    判断列值转为字符串后是否属于 values
+    
+    结果与 series.astype(str).isin(values) 一致，但只对唯一值做字符串转换，
+    再通过分类编码映射回每一行
+    
+    Args:
+        series: 待匹配的列
+        values: 目标字符串列表
+        factorized: 已计算好的 factorize_as_str(series) 结果，多次匹配同一列时复用
+    
+    Returns:
+        布尔数组
+    """
+    codes, labels = factorized if factorized is not None else factorize_as_str(series)
+    
+    hits = labels.isin(values)
+    mask = np.zeros(len(codes), dtype=bool)
+    present = codes >= 0
+    mask[present] = hits[codes[present]]
+    
+    # 缺失值按 astype(str) 的结果（如 "nan"）参与匹配
+    if _MISSING_TEXTS.intersection(values) and not present.all():
+        missing = ~present
+        mask[missing] = series[missing].astype(str).isin(values).to_numpy()
+    return mask
+
+
+def normalize_keys(values: pd.Series, on: str) -> pd.Series:
+    """
+    统一关联列格式：转为去除首尾空白的字符串，工号补齐前导零到 6 位
+    
+    只对唯一值做字符串转换，再按编码展开，重复值多的列（如考勤表工号）无需逐行处理
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    normalized = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    if on == "工号":
+        normalized = normalized.str.zfill(6)
+    return pd.Series(normalized.to_numpy()[codes], index=values.index, name=values.name)
+
+
+def _as_category(series: pd.Series) -> pd.Series:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype("category")
+
+
+def _as_key(series: pd.Series) -> pd.Series:
+    """工号统一为 6 位字符串后转为分类，缺失值保持缺失"""
+    codes, uniques = pd.factorize(series)
+    normalized = pd.Index(pd.Series(uniques, dtype=object).astype(str).str.strip().str.zfill(6))
+    categories = normalized.unique()
+    mapped = categories.get_indexer(normalized)
+    key_codes = np.where(codes >= 0, mapped[codes], -1)
+    return pd.Series(
+        pd.Categorical.from_codes(key_codes, categories=categories),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def _as_count(series: pd.Series) -> pd.Series:
+    """次数/天数：取值均为整数时转为能容纳取值范围的最小可空整数，否则转为可空浮点"""
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series
+    values = series.dropna()
+    if not np.array_equal(values, np.round(values)):
+        return series.astype("Float64")
+    low, high = (values.min(), values.max()) if len(values) else (0, 0)
+    for dtype in _INT_DTYPES:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return series.astype(dtype)
+    return series.astype("Float64")
+
+
+def _as_hours(series: pd.Series) -> pd.Series:
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series
+    return series.astype("Float64")
+
+
+_CONVERTERS = {
+    "key": _as_key,
+    "count": _as_count,
+    "hours": _as_hours,
+    "category": _as_category,
+}
+
+
+def compact_frame(df: pd.DataFrame, plan: dict[str, str] | None = None) -> pd.DataFrame:
+    """
+    按类型计划将列转换为紧凑类型
+    
+    - 工号：统一为 6 位字符串（与 join_excel 的关联格式一致）后转为分类
+    - 部门、人员类型、打卡结果等取值有限的文本列（CATEGORY_COLUMNS）：分类；
+      日期与打卡时间、修改原因、打卡地点等自由文本保持原类型
+    - 次数/天数：最小的可空整数（Int8/Int16/...），含小数时为可空浮点
+    - 时长：可空浮点
+    
+    分类列的筛选（isin_as_str）与分组只处理整数编码；分组时需传入 observed=True，
+    否则会为未出现的分类组合生成空行。计划外的列与非数值的数值列保持不变
+    
+    Args:
+        df: 数据
+        plan: 列名到类型（key / count / hours / category / keep）的映射，默认 DTYPE_PLAN
+    
+    Returns:
+        转换后的新 DataFrame
+    """
+    if plan is None:
+        plan = DTYPE_PLAN
+    
+    converted = {}
+    for column in df.columns:
+        converter = _CONVERTERS.get(plan.get(column, "keep"))
+        if converter is not None:
+            converted[column] = converter(df[column])
+    if not converted:
+        return df
+    return df.assign(**converted)
@@ -2,11 +2,15 @@
 自动检测 Excel 多级表头，返回真实表头所在行
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
+from lazy_imports import pd
+from profiling import DETECT_HEADER, add_profile_arguments, profile_run, span
+from xlsx_reader import sniff_rows
 
 # 考勤表常见的真实表头关键字
 HEADER_KEYWORDS = [
@@ -42,15 +46,40 @@ def detect_header_row(
     if keywords is None:
         keywords = HEADER_KEYWORDS
     
-    # 读取前 N 行，不指定 header
-    df = pd.read_excel(file_path, header=None, nrows=max_rows, sheet_name=sheet_name)
+    with span(DETECT_HEADER, rows=max_rows):
+        # .xlsx 直接从工作表 XML 中只读取前 N 行
+        if path.suffix.lower() in (".xlsx", ".xlsm"):
+            return find_header_row(sniff_rows(file_path, max_rows=max_rows, sheet_name=sheet_name), keywords)
+        
+        # 其他格式读取前 N 行，不指定 header
+        df = pd.read_excel(file_path, header=None, nrows=max_rows, sheet_name=sheet_name)
+        
+        return find_header_row(df.values.tolist(), keywords)
+
+
+def find_header_row(
+    rows: list[list],
+    keywords: list[str] | None = None,
+) -> int:
+    """
+    在已读取的若干行中查找真实表头所在行
+    
+    Args:
+        rows: 原始行数据（不含表头解析），每行为单元格值列表
+        keywords: 用于识别表头的关键字列表，默认使用考勤表关键字
+    
+    Returns:
+        匹配关键字最多的行索引（从 0 开始），无匹配时返回 0
+    """
+    if keywords is None:
+        keywords = HEADER_KEYWORDS
     
+    keyword_set = set(keywords)
     best_row = 0
     best_match_count = 0
     
-    for row_idx in range(len(df)):
-        row_values = df.iloc[row_idx].astype(str).tolist()
-        match_count = sum(1 for kw in keywords if kw in row_values)
+    for row_idx, row in enumerate(rows):
+        match_count = len(keyword_set.intersection(map(str, row)))
         
         if match_count > best_match_count:
             best_match_count = match_count
@@ -64,12 +93,14 @@ def main():
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("--max-rows", type=int, default=10, help="最多检查的行数，默认 10")
     parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
     
     try:
-        header_row = detect_header_row(args.file, max_rows=args.max_rows, sheet_name=sheet)
+        with profile_run(args.profile_output, "detect_header", args.profile_format):
+            header_row = detect_header_row(args.file, max_rows=args.max_rows, sheet_name=sheet)
         print(f"检测到真实表头在第 {header_row + 1} 行（索引 {header_row}）")
         print(f"使用时请设置: --header-row {header_row}")
     except Exception as e:
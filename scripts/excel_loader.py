@@ -0,0 +1,895 @@
+"""
+共享的 Excel 加载器
+一次打开并解析工作表，表头检测与数据读取共用同一份行数据
+支持按列投影的流式读取，只为下游需要的列构建数组
+"""
+
+from __future__ import annotations
+
+import datetime
+import math
+import multiprocessing
+import os
+import sys
+import zipfile
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from pathlib import Path
+
+from column_ops import CATEGORY_COLUMNS, compact_frame
+from detect_header import detect_header_row, find_header_row
+from frame_cache import FrameCache, cache_key, file_fingerprint
+from lazy_imports import np, pd
+from profiling import DETECT_HEADER, OPEN, PARSE, TRANSFORM, span
+from xlsx_reader import iter_sheet_values, workbook_sheets
+
+# 分块读取时每块的默认行数
+DEFAULT_CHUNKSIZE = 50_000
+
+# 读取全部工作表时的 sheet_name
+ALL_SHEETS = "all"
+
+# 多工作表读取时标记来源工作表的列
+SHEET_COLUMN = "工作表"
+
+# .xlsx 工作表读取引擎：openpyxl 只读模式，或直接增量解析压缩包中的 XML（见 xlsx_reader.iter_sheet_values），
+# 两者的取值一致，后续的类型推断相同
+ENGINES = ["openpyxl", "xml"]
+DEFAULT_ENGINE = "openpyxl"
+
+# Excel 错误值（与 openpyxl.cell.cell.ERROR_CODES 相同），读取为缺失值
+_ERROR_CODES = frozenset(("#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"))
+
+# 整表读取时视为缺失的文本（pandas 的默认缺失值）与布尔文本，按共享字符串编码分类列时据此判断
+_NA_TEXTS = frozenset((
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+)) | _ERROR_CODES
+_BOOL_TEXTS = frozenset(("True", "TRUE", "true", "False", "FALSE", "false"))
+
+
+def _convert_value(value):
+    """与 pandas openpyxl 读取器保持一致的单元格取值转换"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+        return value
+    if isinstance(value, str) and value in _ERROR_CODES:
+        return math.nan
+    return value
+
+
+def _open_worksheet(wb, sheet_name: str | int):
+    """按名称或索引获取工作表"""
+    if isinstance(sheet_name, int):
+        ws = wb.worksheets[sheet_name]
+    elif sheet_name in wb.sheetnames:
+        ws = wb[sheet_name]
+    else:
+        raise ValueError(f"工作表 '{sheet_name}' 不存在。可用工作表: {wb.sheetnames}")
+    ws.reset_dimensions()
+    return ws
+
+
+def _open_rows(
+    file_path: str,
+    sheet_name: str | int,
+    engine: str,
+    shared_strings: list | None = None,
+) -> tuple[Iterator, Callable[[], None]]:
+    """
+    打开工作表的原始行迭代器
+    
+    xml 引擎下传入 shared_strings 列表时，共享字符串表写入其中（openpyxl 引擎保持为空）
+    
+    Returns:
+        (行迭代器, 关闭文件的函数)
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"未知的读取引擎 '{engine}'。可用引擎: {ENGINES}")
+    
+    with span(OPEN, engine=engine):
+        if engine == "xml":
+            # 取第一行时才打开压缩包、读取共享字符串与样式，在打开区间内取出，工作表不存在时在此报错
+            rows = iter_sheet_values(file_path, sheet_name, shared_strings)
+            first = next(rows, None)
+            if first is None:
+                return iter(()), rows.close
+            return chain([first], rows), rows.close
+        
+        from openpyxl import load_workbook
+        
+        wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+        try:
+            ws = _open_worksheet(wb, sheet_name)
+        except Exception:
+            wb.close()
+            raise
+        return ws.iter_rows(values_only=True), wb.close
+
+
+def _header_names(row: list) -> list:
+    """按 pandas 规则生成列名（空表头为 Unnamed: i，重复列名追加 .1/.2）"""
+    names = []
+    counts = {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value == "" else value
+        if name in counts:
+            counts[name] += 1
+            name = f"{name}.{counts[name]}"
+        else:
+            counts[name] = 0
+        names.append(name)
+    return names
+
+
+def _is_missing(value) -> bool:
+    return value is None or value == ""
+
+
+class _SharedCategories:
+    """
+    按共享字符串表构建分类列（xml 引擎的紧凑读取）
+    
+    相同文本的共享字符串合并为一个类别，编码为类别在表中的序号，不再为整列构建对象数组后分解；
+    只有列中的值全部为共享字符串或缺失值时才编码，类别按文本排序，与读取后 astype("category") 的结果一致
+    """
+    
+    def __init__(self, strings: list[str]):
+        texts = {}
+        for text in strings:
+            texts.setdefault(text, len(texts))
+        self.texts = np.array(list(texts), dtype=object)
+        self.lookup = {text: -1 if text in _NA_TEXTS else code for text, code in texts.items()}
+        self.lookup.update({None: -1, "": -1, math.nan: -1})
+    
+    def encode(self, values: list) -> pd.Categorical | None:
+        """
+        将单列值编码为分类
+        
+        Returns:
+            分类数组；列中有共享字符串以外的值、没有非缺失值，或类别中有整表读取时会按数值、
+            布尔解析的文本时返回 None（按原有方式推断类型）
+        """
+        lookup = self.lookup
+        try:
+            codes = np.fromiter((lookup[v] for v in values), dtype=np.int64, count=len(values))
+        except (KeyError, TypeError):
+            return None
+        present = codes >= 0
+        used = np.flatnonzero(np.bincount(codes[present], minlength=len(self.texts)))
+        if len(used) == 0:
+            return None
+        categories = self.texts[used]
+        if _BOOL_TEXTS.intersection(categories) or pd.notna(pd.to_numeric(categories, errors="coerce")).any():
+            return None
+        order = np.argsort(categories, kind="stable")
+        remap = np.zeros(len(self.texts), dtype=np.int64)
+        remap[used[order]] = np.arange(len(used))
+        return pd.Categorical.from_codes(np.where(present, remap[codes], -1), categories=categories[order])
+
+
+def _to_array(values: list, numeric_text: bool = True) -> np.ndarray:
+    """
+    将单列原始值直接转换为带类型的 NumPy 数组
+    
+    numeric_text 为 False 时文本保持原样，不尝试按数值解析（分块读取时该列在之前的块中为文本）
+    """
+    values = [_convert_value(v) for v in values]
+    present = [v for v in values if not _is_missing(v)]
+    if not present:
+        return np.full(len(values), np.nan)
+    
+    kinds = {type(v) for v in present}
+    if kinds <= {bool, int, float}:
+        # 与 pandas 一致：布尔列没有缺失值时为布尔类型，有缺失值或与数值混合时按 1.0 / 0.0 解析
+        if len(present) == len(values):
+            if kinds == {bool}:
+                return np.array(values, dtype=bool)
+            if kinds <= {bool, int}:
+                return np.array(values, dtype=np.int64)
+        return np.array([np.nan if _is_missing(v) else v for v in values], dtype=np.float64)
+    if kinds <= {datetime.datetime, datetime.date}:
+        return np.array([None if _is_missing(v) else v for v in values], dtype="datetime64[ns]")
+    array = np.array([np.nan if _is_missing(v) else v for v in values], dtype=object)
+    if str in kinds and numeric_text:
+        # 与 pandas 一致：纯数字文本（如 "001002"）按数值解析
+        try:
+            return np.asarray(pd.to_numeric(array))
+        except (ValueError, TypeError):
+            pass
+    return array
+
+
+def parse_sheet_arg(values: str | list[str]) -> str | int | list[str | int]:
+    """
+    解析命令行 -s/--sheet 参数：数字为索引，多个值为工作表列表，"all" 为全部工作表
+    """
+    if isinstance(values, str):
+        values = [values]
+    sheets = [int(v) if v.isdigit() else v for v in values]
+    return sheets[0] if len(sheets) == 1 else sheets
+
+
+def is_multi_sheet(sheet_name) -> bool:
+    """sheet_name 是否表示多个工作表（列表或 "all"）"""
+    return isinstance(sheet_name, (list, tuple)) or sheet_name == ALL_SHEETS
+
+
+def list_sheet_names(file_path: str) -> list[str]:
+    """
+    按顺序返回工作簿中的工作表名称
+    
+    .xlsx 只读取压缩包中的 workbook.xml，不加载共享字符串与工作表
+    """
+    if Path(file_path).suffix.lower() in (".xlsx", ".xlsm"):
+        with zipfile.ZipFile(file_path) as archive:
+            return [name for name, _ in workbook_sheets(archive)]
+    with pd.ExcelFile(file_path) as xlsx:
+        return list(xlsx.sheet_names)
+
+
+def resolve_sheets(file_path: str, sheet_name) -> list[str]:
+    """
+    将 "all"、工作表名称或索引（或其列表）解析为工作表名称列表
+    
+    工作簿中恰有名为 "all" 的工作表时按名称读取该表
+    """
+    names = list_sheet_names(file_path)
+    if sheet_name == ALL_SHEETS and ALL_SHEETS not in names:
+        return names
+    
+    resolved = []
+    for sheet in sheet_name if isinstance(sheet_name, (list, tuple)) else [sheet_name]:
+        if isinstance(sheet, int):
+            if not 0 <= sheet < len(names):
+                raise ValueError(f"工作表索引 {sheet} 超出范围（共 {len(names)} 个工作表）")
+            sheet = names[sheet]
+        elif sheet not in names:
+            raise ValueError(f"工作表 '{sheet}' 不存在。可用工作表: {names}")
+        if sheet not in resolved:
+            resolved.append(sheet)
+    if not resolved:
+        raise ValueError("未指定要读取的工作表")
+    return resolved
+
+
+def map_sheets(func, file_path: str, sheets: list[str], *args, jobs: int | None = None) -> list:
+    """
+    对每个工作表调用 func(file_path, sheet, *args)，返回与 sheets 顺序一致的结果
+    
+    各工作表在独立的进程中解析（每个进程只读取压缩包中对应的工作表 XML），
+    jobs 为 None 时进程数取工作表数与 CPU 核心数的较小值；只有一个工作表时直接在当前进程执行。
+    已在进程池的工作进程中（如 batch -j N 处理多工作表文件）时逐个读取，不再嵌套创建进程池
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if multiprocessing.parent_process() is not None:
+        jobs = 1
+    jobs = min(jobs, len(sheets))
+    if jobs <= 1:
+        return [func(file_path, sheet, *args) for sheet in sheets]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(func, file_path, sheet, *args) for sheet in sheets]
+        return [future.result() for future in futures]
+
+
+def _load_sheet(file_path, sheet, header_row, keywords, max_rows, usecols, use_cache, engine):
+    """读取单个工作表（在工作进程中执行）"""
+    return load_excel(
+        file_path,
+        header_row=header_row,
+        sheet_name=sheet,
+        keywords=keywords,
+        max_rows=max_rows,
+        usecols=usecols,
+        use_cache=use_cache,
+        engine=engine,
+    )
+
+
+def load_excel_sheets(
+    file_path: str,
+    sheet_names: str | list[str | int] = ALL_SHEETS,
+    header_row: int | None = None,
+    keywords: list[str] | None = None,
+    max_rows: int = 10,
+    usecols: list[str] | None = None,
+    use_cache: bool = False,
+    jobs: int | None = None,
+    engine: str = DEFAULT_ENGINE,
+) -> tuple[pd.DataFrame, dict[str, int]]:
+    """
+    并行读取多个工作表并纵向拼接，第一列"工作表"标记每行的来源
+    
+    适用于每个工作表一个月的年度导出；各工作表分别检测表头，空工作表跳过
+    
+    Args:
+        file_path: Excel 文件路径
+        sheet_names: 工作表名称或索引列表，"all" 为全部工作表
+        header_row: 表头所在行，为 None 时每个工作表分别自动检测
+        keywords: 用于识别表头的关键字列表
+        max_rows: 自动检测时最多检查的行数
+        usecols: 只读取的列名列表，为 None 时读取所有列
+        use_cache: 是否使用解析结果磁盘缓存（按工作表分别缓存）
+        jobs: 并行解析的进程数，为 None 时取工作表数与 CPU 核心数的较小值
+        engine: .xlsx 读取引擎，见 ENGINES
+    
+    Returns:
+        (拼接后的 DataFrame, 各工作表的表头行索引)
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    
+    sheets = resolve_sheets(file_path, sheet_names)
+    results = map_sheets(
+        _load_sheet,
+        file_path,
+        sheets,
+        header_row,
+        keywords,
+        max_rows,
+        usecols,
+        use_cache,
+        engine,
+        jobs=jobs,
+    )
+    
+    frames = []
+    header_rows = {}
+    for sheet, (df, sheet_header_row) in zip(sheets, results):
+        header_rows[sheet] = sheet_header_row
+        if not df.empty:
+            frames.append(df.assign(**{SHEET_COLUMN: sheet}))
+    if not frames:
+        return pd.DataFrame(), header_rows
+    
+    df = pd.concat(frames, ignore_index=True)
+    return df[[SHEET_COLUMN] + [c for c in df.columns if c != SHEET_COLUMN]], header_rows
+
+
+def read_sheet_rows(
+    file_path: str,
+    sheet_name: str | int = 0,
+    engine: str = DEFAULT_ENGINE,
+    shared_strings: list | None = None,
+) -> list[list]:
+    """
+    以只读流式方式读取工作表的全部原始行
+    
+    Args:
+        file_path: Excel 文件路径（.xlsx）
+        sheet_name: 工作表名称或索引，默认第一个 sheet
+        engine: 读取引擎，见 ENGINES
+        shared_strings: 接收共享字符串表的列表（只有 xml 引擎写入），为 None 时不返回
+    
+    Returns:
+        行数据列表，已去除末尾空行并补齐为相同列数
+    """
+    rows, close = _open_rows(file_path, sheet_name, engine, shared_strings)
+    try:
+        with span(PARSE, engine=engine) as parse_span:
+            data = []
+            last_row_with_data = -1
+            for row_number, row in enumerate(rows):
+                converted_row = [_convert_value(v) for v in row]
+                # 去除行尾空单元格
+                while converted_row and converted_row[-1] == "":
+                    converted_row.pop()
+                if converted_row:
+                    last_row_with_data = row_number
+                data.append(converted_row)
+            parse_span.rows = last_row_with_data + 1
+    finally:
+        close()
+    
+    # 去除末尾空行
+    data = data[: last_row_with_data + 1]
+    
+    # 补齐为相同列数
+    if data:
+        max_width = max(len(row) for row in data)
+        data = [row + [""] * (max_width - len(row)) for row in data]
+    
+    return data
+
+
+def _read_header(
+    rows,
+    header_row: int | None,
+    keywords: list[str] | None,
+    max_rows: int,
+) -> tuple[list[list], int]:
+    """从行迭代器中缓冲表头之前的若干行，未指定表头行时自动检测"""
+    buffered = []
+    needed = max_rows if header_row is None else header_row + 1
+    for row in rows:
+        buffered.append([_convert_value(v) for v in row])
+        if len(buffered) >= needed:
+            break
+    
+    if header_row is None:
+        with span(DETECT_HEADER):
+            header_row = find_header_row(buffered, keywords)
+    return buffered, header_row
+
+
+def _select_columns(names: list, usecols: list[str] | None) -> tuple[list, list[int]]:
+    """返回要读取的列名及其位置，usecols 为 None 时读取所有列"""
+    if usecols is None:
+        return list(names), list(range(len(names)))
+    positions = {}
+    for i, name in enumerate(names):
+        positions.setdefault(name, i)
+    selected = [name for name in dict.fromkeys(usecols) if name in positions]
+    return selected, [positions[name] for name in selected]
+
+
+def _read_projected(
+    file_path: str,
+    usecols: list[str],
+    header_row: int | None,
+    sheet_name: str | int,
+    keywords: list[str] | None,
+    max_rows: int,
+    engine: str,
+    categories: set[str] | None = None,
+) -> tuple[pd.DataFrame, int]:
+    """流式读取工作表，只保留 usecols 中存在的列；categories 见 _load_uncached"""
+    strings = [] if categories else None
+    rows, close = _open_rows(file_path, sheet_name, engine, strings)
+    try:
+        # 缓冲表头之前的若干行，用于检测表头
+        buffered, header_row = _read_header(rows, header_row, keywords, max_rows)
+        if header_row > len(buffered) - 1:
+            return pd.DataFrame(), header_row
+        
+        selected, selected_positions = _select_columns(_header_names(buffered[header_row]), usecols)
+        
+        with span(PARSE, engine=engine) as parse_span:
+            columns = [[] for _ in selected]
+            for row in chain(buffered[header_row + 1:], rows):
+                width = len(row)
+                for values, pos in zip(columns, selected_positions):
+                    values.append(row[pos] if pos < width else None)
+            parse_span.rows = len(columns[0]) if columns else 0
+    finally:
+        close()
+    
+    # 去除末尾空行
+    n_rows = len(columns[0]) if columns else 0
+    while n_rows > 0 and all(_is_missing(values[n_rows - 1]) for values in columns):
+        n_rows -= 1
+    
+    # 行数已计入读取单元格的区间，类型推断区间不再重复计数
+    with span(PARSE, step="infer-types"):
+        table = _SharedCategories(strings) if strings else None
+        arrays = {}
+        for name, values in zip(selected, columns):
+            encoded = table.encode(values[:n_rows]) if table and name in categories else None
+            arrays[name] = encoded if encoded is not None else _to_array(values[:n_rows])
+        df = pd.DataFrame(arrays, columns=selected)
+    return df, header_row
+
+
+def _iter_row_batches(
+    close: Callable[[], None],
+    rows,
+    selected: list,
+    positions: list[int],
+    chunksize: int,
+) -> Iterator[pd.DataFrame]:
+    """
+    将行迭代器按 chunksize 行组装为 DataFrame，读取结束后调用 close 关闭文件
+    
+    每块的读取与组装记录为一个 parse 区间（不含调用方处理该块的时间）。
+    各列的类型由该列第一个有值的块确定并用于之后所有块，见 _ColumnKinds
+    """
+    parse_span = span(PARSE, chunk=0)
+    kinds = _ColumnKinds(selected)
+    try:
+        columns = [[] for _ in selected]
+        start = 0
+        blank_rows = 0
+        for row in rows:
+            width = len(row)
+            values = [row[pos] if pos < width else None for pos in positions]
+            # 空行先挂起，后面还有数据时才补回，以去除末尾空行
+            if all(_is_missing(_convert_value(v)) for v in values):
+                blank_rows += 1
+                continue
+            for _ in range(blank_rows):
+                for column in columns:
+                    column.append(None)
+            blank_rows = 0
+            for column, value in zip(columns, values):
+                column.append(value)
+            
+            if len(columns[0]) >= chunksize:
+                batch = kinds.frame(columns, start)
+                parse_span.stop(len(batch))
+                yield batch
+                parse_span = span(PARSE, chunk=start // chunksize + 1)
+                start += len(columns[0])
+                columns = [[] for _ in selected]
+        
+        if columns and columns[0]:
+            batch = kinds.frame(columns, start)
+            parse_span.stop(len(batch))
+            yield batch
+    finally:
+        parse_span.stop()
+        close()
+
+
+class _ColumnKinds:
+    """
+    分块读取时各列的类型
+    
+    布尔值按 1.0 / 0.0 输出（与整表读取有缺失值的布尔列相同；整表读取没有缺失值的布尔列为布尔类型）。
+    每列的类型由第一个有值的块推断，之后的块沿用：该列为文本时，之后的块不再将纯数字文本
+    （如 "1001"）解析为数值，与整表读取的结果一致，关联列在各块中不会时而为数值、时而为文本。
+    先出现的块为数值或日期、之后的块出现无法转换的文本时，已输出的块无法再更改，
+    此时对该列输出一次警告（整表读取会将整列保留为文本）
+    """
+    
+    def __init__(self, selected: list):
+        self.selected = selected
+        self.kinds = [None] * len(selected)
+    
+    def frame(self, columns: list[list], start: int) -> pd.DataFrame:
+        arrays = {}
+        for i, (name, values) in enumerate(zip(self.selected, columns)):
+            kind = self.kinds[i]
+            array = _to_array(values, numeric_text=kind != "text")
+            if array.dtype == bool:
+                # 布尔列按数值输出：各块是否有缺失值不同时类型也一致
+                array = array.astype(np.float64)
+            current = _array_kind(array)
+            if kind is None:
+                self.kinds[i] = current
+            elif current is not None and current != kind:
+                if current == "text":
+                    print(
+                        f"警告: 列 '{name}' 在第 {start + 1} 行之后出现无法按{_KIND_NAMES[kind]}解析的文本，"
+                        f"之前的数据块已按{_KIND_NAMES[kind]}输出，分块结果可能与整表读取不一致",
+                        file=sys.stderr,
+                    )
+                    self.kinds[i] = "text"
+            arrays[name] = array
+        return pd.DataFrame(
+            arrays,
+            columns=self.selected,
+            index=pd.RangeIndex(start, start + len(columns[0])),
+        )
+
+
+_KIND_NAMES = {"number": "数值", "datetime": "日期", "text": "文本"}
+
+
+def _array_kind(array: np.ndarray) -> str | None:
+    """数组的类型类别：number / datetime / text，全为缺失值时为 None"""
+    if array.dtype.kind in "iuf":
+        return "number" if not np.isnan(array).all() else None
+    if array.dtype.kind == "M":
+        return "datetime"
+    return "text"
+
+
+def read_excel_chunks(
+    file_path: str,
+    header_row: int | None = None,
+    sheet_name: str | int = 0,
+    keywords: list[str] | None = None,
+    max_rows: int = 10,
+    usecols: list[str] | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    engine: str = DEFAULT_ENGINE,
+) -> tuple[Iterator[pd.DataFrame], int]:
+    """
+    分块流式读取 Excel 数据，内存占用只与 chunksize 有关
+    
+    各列类型由该列第一个有值的块推断并用于之后所有块（先为文本的列之后不再将纯数字文本解析为数值）；
+    行索引在各块之间连续，拼接后与 load_excel 的结果一致。
+    表头之后没有列名的列不读取。
+    
+    Args:
+        file_path: Excel 文件路径
+        header_row: 表头所在行，为 None 时根据前 max_rows 行自动检测
+        sheet_name: 工作表名称或索引，默认第一个 sheet
+        keywords: 用于识别表头的关键字列表，默认使用考勤表关键字
+        max_rows: 自动检测时最多检查的行数，默认 10 行
+        usecols: 只读取的列名列表（不存在的列忽略），为 None 时读取所有列
+        chunksize: 每块的行数
+        engine: .xlsx 读取引擎，见 ENGINES
+    
+    Returns:
+        (DataFrame 迭代器, 实际使用的表头行索引)。迭代器读完后关闭文件
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    if chunksize < 1:
+        raise ValueError(f"chunksize 必须大于 0: {chunksize}")
+    if is_multi_sheet(sheet_name):
+        raise ValueError("分块读取只支持单个工作表")
+    
+    # 旧版 .xls 等格式无法流式读取，整表读取后再分块
+    if path.suffix.lower() != ".xlsx":
+        df, header_row = _load_uncached(
+            file_path, header_row, sheet_name, keywords, max_rows, usecols, engine
+        )
+        chunks = (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+        return chunks, header_row
+    
+    rows, close = _open_rows(file_path, sheet_name, engine)
+    try:
+        buffered, header_row = _read_header(rows, header_row, keywords, max_rows)
+    except Exception:
+        close()
+        raise
+    
+    if header_row > len(buffered) - 1:
+        close()
+        return iter(()), header_row
+    
+    header = list(buffered[header_row])
+    while header and header[-1] == "":
+        header.pop()
+    selected, positions = _select_columns(_header_names(header), usecols)
+    if not selected:
+        close()
+        return iter(()), header_row
+    
+    rows = chain(buffered[header_row + 1:], rows)
+    return _iter_row_batches(close, rows, selected, positions, chunksize), header_row
+
+
+def read_header_names(
+    file_path: str,
+    header_row: int = 0,
+    sheet_name: str | int = 0,
+    engine: str = DEFAULT_ENGINE,
+) -> list:
+    """
+    只读取表头行，返回列名列表（读到表头行即停止）
+    
+    Args:
+        file_path: Excel 文件路径
+        header_row: 表头所在行（从 0 开始）
+        sheet_name: 工作表名称或索引，默认第一个 sheet
+        engine: .xlsx 读取引擎，见 ENGINES
+    
+    Returns:
+        列名列表
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    if is_multi_sheet(sheet_name):
+        # 多个工作表时返回第一个工作表的列名
+        sheet_name = resolve_sheets(file_path, sheet_name)[0]
+    
+    if path.suffix.lower() != ".xlsx":
+        df = pd.read_excel(file_path, header=header_row, nrows=0, sheet_name=sheet_name)
+        return df.columns.tolist()
+    
+    rows, close = _open_rows(file_path, sheet_name, engine)
+    try:
+        for row_number, row in enumerate(rows):
+            if row_number == header_row:
+                header = [_convert_value(v) for v in row]
+                while header and header[-1] == "":
+                    header.pop()
+                return _header_names(header)
+    finally:
+        close()
+    return []
+
+
+def load_excel(
+    file_path: str,
+    header_row: int | None = None,
+    sheet_name: str | int | list[str | int] = 0,
+    keywords: list[str] | None = None,
+    max_rows: int = 10,
+    usecols: list[str] | None = None,
+    use_cache: bool = False,
+    compact: bool = False,
+    engine: str = DEFAULT_ENGINE,
+) -> tuple[pd.DataFrame, int]:
+    """
+    读取 Excel 数据，未指定表头行时在同一次解析中自动检测
+    
+    Args:
+        file_path: Excel 文件路径
+        header_row: 表头所在行，为 None 时根据已读取的前 max_rows 行自动检测
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时读取多个工作表
+        keywords: 用于识别表头的关键字列表，默认使用考勤表关键字
+        max_rows: 自动检测时最多检查的行数，默认 10 行
+        usecols: 只读取的列名列表（不存在的列忽略），为 None 时读取所有列
+        use_cache: 是否使用解析结果磁盘缓存（见 frame_cache.py）
+        compact: 是否按考勤表模板将列转换为紧凑类型（见 column_ops.compact_frame），
+            缓存中保存的是未转换的数据
+        engine: .xlsx 读取引擎，"openpyxl"（默认）或 "xml"（直接解析压缩包中的 XML，
+            结果相同，大文件读取更快，见 ENGINES）
+    
+    sheet_name 为列表或 "all" 时并行读取多个工作表并拼接（见 load_excel_sheets），
+    返回的表头行为第一个工作表的表头行
+    
+    Returns:
+        (DataFrame, 实际使用的表头行索引)
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    
+    if engine not in ENGINES:
+        raise ValueError(f"未知的读取引擎 '{engine}'。可用引擎: {ENGINES}")
+    
+    # xml 引擎的紧凑读取直接按共享字符串表编码分类列，不再读取为文本后转换
+    categories = set(CATEGORY_COLUMNS) if compact and engine == "xml" else None
+    df, header_row = _load(
+        file_path, header_row, sheet_name, keywords, max_rows, usecols, use_cache, engine, categories
+    )
+    if compact:
+        with span(TRANSFORM, rows=len(df), step="compact"):
+            df = compact_frame(df)
+    return df, header_row
+
+
+def _load(
+    file_path: str,
+    header_row: int | None,
+    sheet_name: str | int | list[str | int],
+    keywords: list[str] | None,
+    max_rows: int,
+    usecols: list[str] | None,
+    use_cache: bool,
+    engine: str,
+    categories: set[str] | None = None,
+) -> tuple[pd.DataFrame, int]:
+    """读取工作表（多工作表时拼接，此时不按共享字符串编码分类列），按需经过缓存"""
+    if is_multi_sheet(sheet_name):
+        df, header_rows = load_excel_sheets(
+            file_path,
+            sheet_name,
+            header_row=header_row,
+            keywords=keywords,
+            max_rows=max_rows,
+            usecols=usecols,
+            use_cache=use_cache,
+            engine=engine,
+        )
+        return df, next(iter(header_rows.values()))
+    
+    if not use_cache:
+        return _load_uncached(
+            file_path, header_row, sheet_name, keywords, max_rows, usecols, engine, categories
+        )
+    
+    path = Path(file_path)
+    cache = FrameCache()
+    # 编码了分类列的结果与未转换的结果分别缓存
+    extra = {"categories": sorted(categories)} if categories else {}
+    key = cache_key(
+        file_fingerprint(file_path),
+        sheet_name=sheet_name,
+        header_row=header_row,
+        keywords=keywords,
+        max_rows=max_rows,
+        usecols=usecols,
+        **extra,
+    )
+    with span("cache-read") as cache_span:
+        cached = cache.get(key)
+        if cached is not None:
+            cache_span.rows = len(cached[0])
+    if cached is not None:
+        df, meta = cached
+        return df, meta["header_row"]
+    
+    # 两种引擎的结果相同，缓存键不包含引擎
+    df, header_row = _load_uncached(
+        file_path, header_row, sheet_name, keywords, max_rows, usecols, engine, categories
+    )
+    cache.put(key, df, header_row=header_row, source=str(path.resolve()), sheet_name=sheet_name)
+    return df, header_row
+
+
+def _load_uncached(
+    file_path: str,
+    header_row: int | None,
+    sheet_name: str | int,
+    keywords: list[str] | None,
+    max_rows: int,
+    usecols: list[str] | None,
+    engine: str = DEFAULT_ENGINE,
+    categories: set[str] | None = None,
+) -> tuple[pd.DataFrame, int]:
+    """
+    解析工作表（不经过缓存）
+    
+    xml 引擎下 categories 中的列值全部为共享字符串时，直接由共享字符串表构建分类列
+    （见 _SharedCategories），其余列按原有方式推断类型
+    """
+    if engine != "xml":
+        categories = None
+    path = Path(file_path)
+    
+    # 旧版 .xls 等格式无法流式读取，退回 pandas 读取
+    if path.suffix.lower() != ".xlsx":
+        if header_row is None:
+            header_row = detect_header_row(
+                file_path, keywords=keywords, max_rows=max_rows, sheet_name=sheet_name
+            )
+        with span(PARSE, engine="pandas") as parse_span:
+            df = pd.read_excel(file_path, header=header_row, sheet_name=sheet_name)
+            parse_span.rows = len(df)
+        if usecols is not None:
+            df = df[[c for c in dict.fromkeys(usecols) if c in df.columns]]
+        return df, header_row
+    
+    if usecols is not None:
+        return _read_projected(
+            file_path, usecols, header_row, sheet_name, keywords, max_rows, engine, categories
+        )
+    
+    strings = [] if categories else None
+    data = read_sheet_rows(file_path, sheet_name=sheet_name, engine=engine, shared_strings=strings)
+    
+    if header_row is None:
+        with span(DETECT_HEADER):
+            header_row = find_header_row(data[:max_rows], keywords)
+    
+    if not data:
+        return pd.DataFrame(), header_row
+    
+    if header_row > len(data) - 1:
+        raise ValueError(f"表头行 {header_row} 超出数据范围（共 {len(data)} 行）")
+    
+    # 行数已计入 read_sheet_rows 的区间，类型推断区间不再重复计数
+    with span(PARSE, step="infer-types"):
+        df = _parse_rows(data, header_row, categories, strings)
+    return df, header_row
+
+
+def _parse_rows(
+    data: list[list],
+    header_row: int,
+    categories: set[str] | None = None,
+    strings: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    与 pd.read_excel 相同的解析逻辑（类型推断、重复列名处理等）
+    
+    categories 中（表头不重复）的列能按共享字符串表 strings 编码时直接构建分类列，
+    不交给 TextParser 推断，再按原位置插回
+    """
+    from pandas.io.parsers import TextParser
+    
+    header = data[header_row]
+    encoded = {}
+    if categories and strings:
+        table = _SharedCategories(strings)
+        body = data[header_row + 1:]
+        for pos, name in enumerate(header):
+            if isinstance(name, str) and name in categories and header.count(name) == 1:
+                values = table.encode([row[pos] for row in body])
+                if values is not None:
+                    encoded[pos] = values
+    if not encoded:
+        return TextParser(data, header=header_row, skip_blank_lines=False).read()
+    
+    kept = [pos for pos in range(len(header)) if pos not in encoded]
+    if kept:
+        df = TextParser(data, header=header_row, usecols=kept, skip_blank_lines=False).read()
+    else:
+        df = pd.DataFrame(index=pd.RangeIndex(len(data) - header_row - 1))
+    for pos, values in encoded.items():
+        df.insert(pos, header[pos], values)
+    return df
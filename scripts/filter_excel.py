@@ -2,11 +2,24 @@
 根据指定的列名和值剔除 Excel 数据行
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
+from column_ops import isin_as_str
+from excel_loader import (
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_ENGINE,
+    ENGINES,
+    load_excel,
+    parse_sheet_arg,
+    read_excel_chunks,
+)
+from lazy_imports import np, pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from writers import FrameWriter, write_frame
 
 
 def filter_excel(
@@ -15,7 +28,10 @@ def filter_excel(
     values: list[str],
     header_row: int = 0,
     output_path: str | None = None,
-    sheet_name: str | int = 0,
+    sheet_name: str | int | list[str | int] = 0,
+    use_cache: bool = False,
+    compact: bool = False,
+    engine: str = DEFAULT_ENGINE,
 ) -> pd.DataFrame:
     """
     剔除 Excel 中指定列包含特定值的行
@@ -26,7 +42,10 @@ def filter_excel(
         values: 要剔除的值列表
         header_row: 表头所在行（从 0 开始），默认第 0 行
         output_path: 输出文件路径，为 None 时不保存
-        sheet_name: 工作表名称或索引，默认第一个 sheet
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时并行读取多个工作表并拼接
+        use_cache: 是否使用解析结果磁盘缓存
+        compact: 是否将列转换为紧凑类型（分类、可空整数，见 column_ops.compact_frame）
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
     
     Returns:
         过滤后的 DataFrame
@@ -35,7 +54,14 @@ def filter_excel(
     if not path.exists():
         raise FileNotFoundError(f"文件不存在: {file_path}")
     
-    df = pd.read_excel(file_path, header=header_row, sheet_name=sheet_name)
+    df, _ = load_excel(
+        file_path,
+        header_row=header_row,
+        sheet_name=sheet_name,
+        use_cache=use_cache,
+        compact=compact,
+        engine=engine,
+    )
     
     if column not in df.columns:
         raise ValueError(f"列名 '{column}' 不存在。可用列名: {list(df.columns)}")
@@ -43,8 +69,9 @@ def filter_excel(
     original_count = len(df)
     
     # 剔除包含指定值的行
-    mask = ~df[column].astype(str).isin(values)
-    df_filtered = df[mask].copy()
+    with span(TRANSFORM, rows=original_count):
+        mask = ~isin_as_str(df[column], values)
+        df_filtered = df[mask].copy()
     
     removed_count = original_count - len(df_filtered)
     print(f"原始行数: {original_count}")
@@ -52,33 +79,125 @@ def filter_excel(
     print(f"剩余行数: {len(df_filtered)}")
     
     if output_path:
-        df_filtered.to_excel(output_path, index=False)
+        write_frame(df_filtered, output_path)
         print(f"已保存到: {output_path}")
     
     return df_filtered
 
 
+def filter_excel_chunked(
+    file_path: str,
+    column: str,
+    values: list[str],
+    header_row: int = 0,
+    output_path: str | None = None,
+    sheet_name: str | int = 0,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    engine: str = DEFAULT_ENGINE,
+) -> dict[str, int]:
+    """
+    分块剔除指定列包含特定值的行，逐块流式写出，内存占用与文件大小无关
+    
+    Args:
+        file_path: Excel 文件路径
+        column: 列名
+        values: 要剔除的值列表
+        header_row: 表头所在行（从 0 开始），默认第 0 行
+        output_path: 输出文件路径，为 None 时只统计不保存
+        sheet_name: 工作表名称或索引，默认第一个 sheet
+        chunksize: 每块的行数
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
+    
+    Returns:
+        字典，包含原始行数 original 与剩余行数 kept
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    
+    chunks, _ = read_excel_chunks(
+        file_path, header_row=header_row, sheet_name=sheet_name, chunksize=chunksize, engine=engine
+    )
+    
+    original_count = 0
+    kept_count = 0
+    writer = FrameWriter(output_path) if output_path else None
+    try:
+        for chunk in chunks:
+            if column not in chunk.columns:
+                raise ValueError(f"列名 '{column}' 不存在。可用列名: {list(chunk.columns)}")
+            
+            with span(TRANSFORM, rows=len(chunk)):
+                kept = chunk.take(np.flatnonzero(~isin_as_str(chunk[column], values)))
+            if writer is not None:
+                writer.write(kept)
+            original_count += len(chunk)
+            kept_count += len(kept)
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    print(f"原始行数: {original_count}")
+    print(f"剔除行数: {original_count - kept_count}")
+    print(f"剩余行数: {kept_count}")
+    if output_path:
+        print(f"已保存到: {output_path}")
+    
+    return {"original": original_count, "kept": kept_count}
+
+
 def main():
     parser = argparse.ArgumentParser(description="剔除 Excel 中指定列包含特定值的行")
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("-c", "--column", required=True, help="列名")
     parser.add_argument("-v", "--values", nargs="+", required=True, help="要剔除的值（可多个）")
     parser.add_argument("--header-row", type=int, default=0, help="表头所在行，默认 0")
-    parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    parser.add_argument(
+        "-s", "--sheet",
+        nargs="+",
+        default=["0"],
+        help="工作表名称或索引（可多个，all 为全部工作表，并行读取后拼接），默认 0",
+    )
     parser.add_argument("-o", "--output", help="输出文件路径")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument("--compact", action="store_true", help="读取后将列转换为紧凑类型（分类、可空整数），减少内存占用")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    parser.add_argument("--chunksize", type=int, help="分块读取的行数（用于超大文件，内存占用固定）")
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
-    sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
+    sheet = parse_sheet_arg(args.sheet)
     
     try:
-        filter_excel(
-            args.file,
-            args.column,
-            args.values,
-            header_row=args.header_row,
-            output_path=args.output,
-            sheet_name=sheet,
-        )
+        with profile_run(args.profile_output, "filter_excel", args.profile_format):
+            if args.chunksize:
+                filter_excel_chunked(
+                    args.file,
+                    args.column,
+                    args.values,
+                    header_row=args.header_row,
+                    output_path=args.output,
+                    sheet_name=sheet,
+                    chunksize=args.chunksize,
+                    engine=args.engine,
+                )
+                return
+            filter_excel(
+                args.file,
+                args.column,
+                args.values,
+                header_row=args.header_row,
+                output_path=args.output,
+                sheet_name=sheet,
+                use_cache=not args.no_cache,
+                compact=args.compact,
+                engine=args.engine,
+            )
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
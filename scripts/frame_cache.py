@@ -0,0 +1,307 @@
+"""
+解析结果的列式磁盘缓存
+以工作簿指纹（路径、大小、修改时间、内容哈希）+ 工作表 + 表头行为键，
+重复分析同一份 Excel 时直接加载缓存，跳过 XLSX 解析
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from lazy_imports import np, pd
+
+# 缓存格式版本，格式变化时递增使旧缓存失效
+CACHE_VERSION = 1
+
+# 缓存目录可通过环境变量覆盖
+CACHE_DIR_ENV = "ALIY_CACHE_DIR"
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "sunrise-aliy"
+
+# 默认容量上限
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_ENTRIES = 64
+
+
+def file_fingerprint(file_path: str) -> dict:
+    """
+    计算文件指纹
+    
+    Args:
+        file_path: 文件路径
+    
+    Returns:
+        包含 path, size, mtime_ns, digest 的字典
+    """
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return {
+        "path": str(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "digest": digest.hexdigest(),
+    }
+
+
+def default_cache_dir() -> Path:
+    """缓存根目录：环境变量 ALIY_CACHE_DIR，未设置时为 ~/.cache/sunrise-aliy"""
+    return Path(os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR)
+
+
+def cache_key(fingerprint: dict, **params) -> str:
+    """根据文件指纹与读取参数生成缓存键"""
+    payload = {"version": CACHE_VERSION, "file": fingerprint, "params": params}
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# 缓存目录不可用时只警告一次
+_warned = False
+
+
+def _warn_unavailable(error: OSError) -> None:
+    """缓存读写失败时警告（每个进程只输出一次），不影响本次处理"""
+    global _warned
+    if not _warned:
+        _warned = True
+        print(f"警告: 解析缓存不可用，本次不使用缓存（{error}）", file=sys.stderr)
+
+
+def _tmp_path(path: Path) -> Path:
+    """同目录下的临时文件名，包含进程与线程号，并发写入同一条目时互不覆盖"""
+    return path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def _replace_into(path: Path, write) -> None:
+    """先由 write(临时路径) 写出临时文件再替换，读者不会看到写了一半的文件"""
+    tmp_path = _tmp_path(path)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _restore_missing(df: pd.DataFrame) -> pd.DataFrame:
+    """Parquet 读回的文本列缺失值为 None，还原为与直接解析一致的 NaN"""
+    for column in df.columns[df.dtypes == object]:
+        missing = df[column].isna()
+        if missing.any():
+            df[column] = df[column].where(~missing, np.nan)
+    return df
+
+
+class FrameCache:
+    """
+    DataFrame 磁盘缓存
+    
+    优先使用 Parquet 存储（需安装 pyarrow），无法以 Parquet 表示的数据
+    （如混合类型列）退回 pickle。按最近访问时间 LRU 淘汰，并限制总大小与条目数；
+    指定 ttl 时，写入超过 ttl 秒的条目视为未命中并删除。
+    hits / misses 记录本实例的命中与未命中次数，各条目的命中次数保存在元数据中。
+    缓存目录不可用（无法创建、无写权限、磁盘已满）时 get 视为未命中、put 不写入，
+    只输出一次警告，不会使处理失败；数据文件与元数据先写临时文件再替换，
+    多个进程同时写入同一条目时不会读到写了一半的文件
+    """
+    
+    def __init__(
+        self,
+        cache_dir: str | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float | None = None,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+    
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+    
+    def _write_meta(self, key: str, meta: dict) -> None:
+        text = json.dumps(meta, ensure_ascii=False, default=str)
+        _replace_into(self._meta_path(key), lambda path: path.write_text(text, encoding="utf-8"))
+    
+    def _entries(self) -> list[tuple[Path, dict]]:
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for meta_path in self.cache_dir.glob("*.json"):
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            entries.append((meta_path, meta))
+        return entries
+    
+    def _expired(self, meta: dict) -> bool:
+        if self.ttl is None:
+            return False
+        created = meta.get("created", meta.get("last_access", 0))
+        return time.time_ns() - created > self.ttl * 1e9
+    
+    def get(self, key: str) -> tuple[pd.DataFrame, dict] | None:
+        """
+        读取缓存
+        
+        Returns:
+            (DataFrame, 元数据)，未命中时返回 None
+        """
+        meta_path = self._meta_path(key)
+        if not meta_path.exists():
+            self.misses += 1
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if self._expired(meta):
+                raise KeyError("expired")
+            data_path = self.cache_dir / meta["data_file"]
+            if meta["format"] == "parquet":
+                df = _restore_missing(pd.read_parquet(data_path))
+            else:
+                df = pd.read_pickle(data_path)
+        except (OSError, ValueError, KeyError):
+            try:
+                self.remove(key)
+            except OSError as e:
+                _warn_unavailable(e)
+            self.misses += 1
+            return None
+        
+        # 更新访问时间（用于 LRU 淘汰）与命中次数，写入失败不影响命中
+        meta["last_access"] = time.time_ns()
+        meta["hits"] = meta.get("hits", 0) + 1
+        try:
+            self._write_meta(key, meta)
+        except OSError as e:
+            _warn_unavailable(e)
+        self.hits += 1
+        return df, meta
+    
+    def put(self, key: str, df: pd.DataFrame, **meta) -> None:
+        """写入缓存，写入后按容量上限淘汰旧条目；缓存目录不可用时只警告、不写入"""
+        try:
+            self._put(key, df, meta)
+        except OSError as e:
+            _warn_unavailable(e)
+    
+    def _put(self, key: str, df: pd.DataFrame, meta: dict) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        data_format = "pickle"
+        data_path = self.cache_dir / f"{key}.pkl"
+        if _parquet_available():
+            parquet_path = self.cache_dir / f"{key}.parquet"
+            try:
+                _replace_into(parquet_path, df.to_parquet)
+                data_format, data_path = "parquet", parquet_path
+            except (ValueError, TypeError, NotImplementedError):
+                pass
+        if data_format == "pickle":
+            _replace_into(data_path, df.to_pickle)
+        
+        meta = {
+            **meta,
+            "format": data_format,
+            "data_file": data_path.name,
+            "bytes": data_path.stat().st_size,
+            "created": time.time_ns(),
+            "last_access": time.time_ns(),
+        }
+        self._write_meta(key, meta)
+        self.evict()
+    
+    def remove(self, key: str) -> None:
+        """删除单个缓存条目"""
+        for path in self.cache_dir.glob(f"{key}.*"):
+            path.unlink(missing_ok=True)
+    
+    def evict(self) -> int:
+        """
+        删除过期条目，再按最近访问时间淘汰条目，直到满足容量与条目数上限
+        
+        Returns:
+            淘汰的条目数
+        """
+        removed = 0
+        entries = []
+        for meta_path, meta in self._entries():
+            if self._expired(meta):
+                self.remove(meta_path.stem)
+                removed += 1
+            else:
+                entries.append((meta_path, meta))
+        entries.sort(key=lambda item: item[1].get("last_access", 0))
+        total_bytes = sum(meta.get("bytes", 0) for _, meta in entries)
+        
+        while entries and (total_bytes > self.max_bytes or len(entries) > self.max_entries):
+            meta_path, meta = entries.pop(0)
+            total_bytes -= meta.get("bytes", 0)
+            self.remove(meta_path.stem)
+            removed += 1
+        return removed
+    
+    def clear(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        entries = self._entries()
+        for meta_path, _ in entries:
+            self.remove(meta_path.stem)
+        return len(entries)
+    
+    def info(self) -> dict:
+        """返回缓存目录、条目数、占用大小与各条目的累计命中次数"""
+        entries = self._entries()
+        return {
+            "cache_dir": str(self.cache_dir),
+            "entries": len(entries),
+            "bytes": sum(meta.get("bytes", 0) for _, meta in entries),
+            "hits": sum(meta.get("hits", 0) for _, meta in entries),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="管理 Excel 解析结果缓存")
+    parser.add_argument("--cache-dir", help=f"缓存目录（默认 ${CACHE_DIR_ENV} 或 {DEFAULT_CACHE_DIR}）")
+    parser.add_argument("--clear", action="store_true", help="清空缓存")
+    
+    args = parser.parse_args()
+    
+    try:
+        cache = FrameCache(args.cache_dir)
+        if args.clear:
+            removed = cache.clear()
+            print(f"已清空缓存: {removed} 个条目")
+        else:
+            info = cache.info()
+            print(f"缓存目录: {info['cache_dir']}")
+            print(f"条目数: {info['entries']}")
+            print(f"占用大小: {info['bytes'] / 1024 / 1024:.1f} MB")
+            print(f"累计命中: {info['hits']} 次")
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
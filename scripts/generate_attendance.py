@@ -0,0 +1,297 @@
+"""
+生成合成考勤数据
+按固定随机种子生成与真实导出格式一致的考勤表（含标题行的多级表头）及花名册，
+用于测试与性能基准，相同参数总是生成相同的数据
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from lazy_imports import np, pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from validate_columns import ATTENDANCE_COLUMNS
+from writers import FrameWriter
+
+# 部门名称，部门数超过列表长度时追加序号
+DEPARTMENT_NAMES = ["研发部", "产品部", "市场部", "销售部", "财务部", "人事部", "行政部", "客服部", "运营部", "法务部"]
+
+# 花名册中的工作城市
+CITIES = ["北京", "上海", "广州", "深圳", "杭州", "成都", "武汉", "西安"]
+
+WEEKDAY_NAMES = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
+
+# 工作日打卡结果及其概率
+CLOCK_IN_RESULTS = ["正常", "迟到", "严重迟到", "缺卡", "无需打卡(请假)", "无需打卡(出差)"]
+CLOCK_IN_WEIGHTS = [0.85, 0.06, 0.01, 0.03, 0.03, 0.02]
+CLOCK_OUT_RESULTS = ["正常", "早退", "缺卡", "无需打卡(补卡通过)"]
+CLOCK_OUT_WEIGHTS = [0.90, 0.04, 0.03, 0.03]
+
+# 表头之前的标题行
+TITLE_ROWS = [
+    "考勤报表 {start} 至 {end}",
+    "统计口径: 全部员工",
+    "数据来源: 考勤系统导出",
+]
+
+
+def _department_name(index: int) -> str:
+    name = DEPARTMENT_NAMES[index % len(DEPARTMENT_NAMES)]
+    return name if index < len(DEPARTMENT_NAMES) else f"{name}{index // len(DEPARTMENT_NAMES) + 1}"
+
+
+def _employees(employees: int, departments: int, seed: int) -> pd.DataFrame:
+    """生成员工属性，考勤表与花名册共用同一份"""
+    rng = np.random.default_rng(seed)
+    names = np.array([_department_name(i) for i in range(departments)])
+    return pd.DataFrame({
+        "工号": np.arange(10000, 10000 + employees),
+        "部门": names[rng.integers(0, departments, employees)],
+        "人员类型": rng.choice(["正式", "实习", "外包"], employees, p=[0.85, 0.10, 0.05]),
+        "员工状态": rng.choice(["在职", "离职"], employees, p=[0.95, 0.05]),
+        "考勤组": np.char.add("考勤组", rng.integers(0, 3, employees).astype(str)),
+        "入职天数": rng.integers(30, 2000, employees),
+        "实际工作城市": np.array(CITIES)[rng.integers(0, len(CITIES), employees)],
+    })
+
+
+def _staff_count(rows: int, employees: int | None) -> int:
+    """员工数，未指定时按每人 30 天计算"""
+    return max(1, rows // 30) if employees is None else employees
+
+
+def _clock(minutes: np.ndarray) -> np.ndarray:
+    """将一天中的分钟数转换为 HH:MM 文本，负数为空"""
+    return np.array(
+        ["" if m < 0 else f"{m // 60:02d}:{m % 60:02d}" for m in minutes.tolist()],
+        dtype=object,
+    )
+
+
+def generate_attendance_df(
+    rows: int,
+    employees: int | None = None,
+    departments: int = 10,
+    seed: int = 0,
+    start_date: str = "2024-01-01",
+) -> pd.DataFrame:
+    """
+    生成考勤明细数据，每个员工每天一行，列与 ATTENDANCE_COLUMNS 一致
+    
+    Args:
+        rows: 行数
+        employees: 员工数，为 None 时按每人 30 天计算
+        departments: 部门数
+        seed: 随机种子
+        start_date: 起始日期
+    
+    Returns:
+        考勤数据 DataFrame
+    """
+    if rows < 1:
+        raise ValueError(f"行数必须大于 0: {rows}")
+    employees = _staff_count(rows, employees)
+    
+    staff = _employees(employees, departments, seed)
+    rng = np.random.default_rng(seed + 1)
+    
+    index = np.arange(rows)
+    emp = index % employees
+    start = pd.Timestamp(start_date)
+    dates = start + pd.to_timedelta(index // employees, unit="D")
+    weekday = np.asarray(dates.weekday)
+    workday = weekday < 5
+    
+    # 打卡结果：周末休息，请假/出差当天下班与上班结果一致
+    clock_in = np.where(workday, rng.choice(CLOCK_IN_RESULTS, rows, p=CLOCK_IN_WEIGHTS), "无需打卡(休息)")
+    clock_out = np.where(workday, rng.choice(CLOCK_OUT_RESULTS, rows, p=CLOCK_OUT_WEIGHTS), "无需打卡(休息)")
+    away = np.isin(clock_in, ["无需打卡(请假)", "无需打卡(出差)"])
+    clock_out = np.where(away, clock_in, clock_out)
+    
+    late = clock_in == "迟到"
+    serious = clock_in == "严重迟到"
+    early = clock_out == "早退"
+    in_missing = clock_in == "缺卡"
+    out_missing = clock_out == "缺卡"
+    patched = clock_out == "无需打卡(补卡通过)"
+    absent = in_missing & out_missing
+    attended = workday & ~away & ~absent
+    
+    # 打卡时间（一天中的分钟数）
+    in_minutes = np.select(
+        [clock_in == "正常", late, serious],
+        [rng.integers(510, 541, rows), rng.integers(541, 571, rows), rng.integers(571, 660, rows)],
+        -1,
+    )
+    out_minutes = np.select(
+        [clock_out == "正常", early],
+        [rng.integers(1080, 1260, rows), rng.integers(960, 1080, rows)],
+        -1,
+    )
+    late_hours = np.where(late | serious, (in_minutes - 540) / 60, 0).round(2)
+    early_hours = np.where(early, (1080 - out_minutes) / 60, 0).round(2)
+    overtime = np.where(out_minutes > 1080, (out_minutes - 1080) // 30 * 0.5, 0.0)
+    overtime_paid = np.where(staff["考勤组"].to_numpy()[emp] == "考勤组0", overtime, 0.0)
+    work_hours = np.where(attended, (9 + rng.normal(0, 0.5, rows)).round(1), 0.0)
+    
+    city = staff["实际工作城市"].to_numpy()[emp]
+    location = np.where(city == "北京", "总部大楼", np.char.add(city, "分公司"))
+    hire = start - pd.to_timedelta(staff["入职天数"].to_numpy(), unit="D")
+    resigned = staff["员工状态"].to_numpy() == "离职"
+    leave = pd.Series(pd.NaT, index=staff.index, dtype="datetime64[ns]")
+    leave[resigned] = dates.max() + pd.Timedelta(days=1)
+    
+    data = {
+        "工号": staff["工号"].to_numpy()[emp],
+        "部门": staff["部门"].to_numpy()[emp],
+        "人员类型": staff["人员类型"].to_numpy()[emp],
+        "员工状态": staff["员工状态"].to_numpy()[emp],
+        "入职日期": np.asarray(hire)[emp],
+        "离职日期": leave.to_numpy()[emp],
+        "日期": np.asarray(dates),
+        "星期": np.array(WEEKDAY_NAMES)[weekday],
+        "班次": np.where(workday, "早班 09:00-18:00", "休息"),
+        "考勤组": staff["考勤组"].to_numpy()[emp],
+        "上班 1 打卡时间": _clock(in_minutes),
+        "上班 1 打卡结果": clock_in,
+        "上班 1 修改原因": np.full(rows, "", dtype=object),
+        "上班 1 打卡地点": np.where(in_minutes >= 0, location, ""),
+        "下班 1 打卡时间": _clock(out_minutes),
+        "下班 1 打卡结果": clock_out,
+        "下班 1 修改原因": np.where(patched, "忘记打卡", ""),
+        "下班 1 打卡地点": np.where(out_minutes >= 0, location, ""),
+        "应出勤天数": workday.astype(np.int64),
+        "应出勤时长(小时)": workday * 8,
+        "休息或未排班天数": (~workday).astype(np.int64),
+        "实际出勤天数": np.where(attended, np.where(in_missing | out_missing, 0.5, 1.0), 0.0),
+        "实际出勤时长(小时)": work_hours,
+        "班内工作时长(小时)": np.minimum(work_hours, 8.0),
+        "出差天数": (clock_in == "无需打卡(出差)").astype(np.int64),
+        "外出时长": rng.choice([0.0, 1.0, 2.0], rows, p=[0.96, 0.03, 0.01]),
+        "补卡次数": patched.astype(np.int64),
+        "迟到次数": late.astype(np.int64),
+        "迟到时长(小时)": np.where(late, late_hours, 0.0),
+        "严重迟到次数": serious.astype(np.int64),
+        "严重迟到时长(小时)": np.where(serious, late_hours, 0.0),
+        "早退次数": early.astype(np.int64),
+        "早退时长(小时)": early_hours,
+        "缺勤时长(小时)": absent * 8.0,
+        "上班缺卡次数": in_missing.astype(np.int64),
+        "下班缺卡次数": out_missing.astype(np.int64),
+        "旷工天数": absent.astype(np.int64),
+        "加班总时长(小时)": overtime,
+        "加班总时长 - 计加班费(小时)": overtime_paid,
+        "加班总时长 - 计调休(小时)": overtime - overtime_paid,
+    }
+    # 文本列中的空字符串写出为空单元格
+    for column, values in data.items():
+        if values.dtype.kind in "OU":
+            values = values.astype(object)
+            values[values == ""] = None
+            data[column] = values
+    return pd.DataFrame(data, columns=ATTENDANCE_COLUMNS)
+
+
+def generate_roster_df(
+    employees: int,
+    departments: int = 10,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    生成与考勤数据对应的花名册（工号、部门、人员类型、实际工作城市）
+    
+    Args:
+        employees: 员工数
+        departments: 部门数
+        seed: 随机种子（与生成考勤数据时一致）
+    
+    Returns:
+        花名册 DataFrame
+    """
+    staff = _employees(employees, departments, seed)
+    return staff[["工号", "部门", "人员类型", "实际工作城市"]]
+
+
+def generate_attendance(
+    output_path: str,
+    rows: int = 10_000,
+    employees: int | None = None,
+    departments: int = 10,
+    title_rows: int = 1,
+    seed: int = 0,
+    roster_path: str | None = None,
+) -> dict:
+    """
+    生成合成考勤表文件
+    
+    Args:
+        output_path: 输出文件路径（.xlsx / .csv）
+        rows: 行数
+        employees: 员工数，为 None 时按每人 30 天计算
+        departments: 部门数
+        title_rows: 表头之前的标题行数（0-3），即生成文件的表头行索引
+        seed: 随机种子
+        roster_path: 花名册输出路径，为 None 时不生成
+    
+    Returns:
+        字典，包含 rows, employees, header_row
+    """
+    if not 0 <= title_rows <= len(TITLE_ROWS):
+        raise ValueError(f"标题行数必须在 0 到 {len(TITLE_ROWS)} 之间: {title_rows}")
+    
+    with span(TRANSFORM, rows=rows, step="generate"):
+        df = generate_attendance_df(rows, employees=employees, departments=departments, seed=seed)
+    # 员工数多于行数时只有前 rows 名员工出现在考勤表中
+    staff_count = _staff_count(rows, employees)
+    employees = int(df["工号"].nunique())
+    
+    dates = df["日期"]
+    period = {"start": f"{dates.min():%Y-%m-%d}", "end": f"{dates.max():%Y-%m-%d}"}
+    preamble = [[title.format(**period)] for title in TITLE_ROWS[:title_rows]]
+    with FrameWriter(output_path, preamble=preamble) as writer:
+        writer.write(df)
+    print(f"已生成考勤表: {output_path}（{rows} 行, {employees} 人, 表头行 {title_rows}）")
+    
+    if roster_path:
+        # 按生成考勤数据时的员工数生成，员工属性与考勤表一致，再只保留考勤表中出现的员工
+        roster = generate_roster_df(staff_count, departments=departments, seed=seed)
+        roster = roster[roster["工号"].isin(df["工号"])]
+        with FrameWriter(roster_path, sheet_name="基本信息") as writer:
+            writer.write(roster)
+        print(f"已生成花名册: {roster_path}")
+    
+    return {"rows": rows, "employees": employees, "header_row": title_rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成考勤数据（用于测试与性能基准）")
+    parser.add_argument("output", help="输出文件路径（.xlsx / .csv）")
+    parser.add_argument("-n", "--rows", type=int, default=10_000, help="行数，默认 10000")
+    parser.add_argument("--employees", type=int, help="员工数（不指定则按每人 30 天计算）")
+    parser.add_argument("--departments", type=int, default=10, help="部门数，默认 10")
+    parser.add_argument("--title-rows", type=int, default=1, help="表头之前的标题行数，默认 1")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，默认 0")
+    parser.add_argument("--roster", help="同时生成花名册的输出路径")
+    add_profile_arguments(parser)
+    
+    args = parser.parse_args()
+    
+    try:
+        with profile_run(args.profile_output, "generate_attendance", args.profile_format):
+            generate_attendance(
+                args.output,
+                rows=args.rows,
+                employees=args.employees,
+                departments=args.departments,
+                title_rows=args.title_rows,
+                seed=args.seed,
+                roster_path=args.roster,
+            )
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,339 @@
 """
-通过指定列关联两个 Excel 文件
-典型场景：将花名册中的地区信息关联到考勤数据
+通过指定列关联两个 Excel 文件，或一次关联多个维度表（星型关联）
+典型场景：将花名册中的地区信息关联到考勤数据；
+同时关联花名册（地区）、组织架构（部门负责人）与成本中心对照表
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
+from column_ops import normalize_keys
+from excel_loader import DEFAULT_ENGINE, ENGINES, load_excel
+from frame_cache import FrameCache, cache_key, file_fingerprint
+from lazy_imports import np, pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from writers import write_frame
+
+
+# 关联索引缓存的格式版本，索引结构变化时递增
+INDEX_VERSION = 1
+
+# 未匹配统计中列出的关联值个数（按出现行数从多到少）
+UNMATCHED_EXAMPLES = 5
+
+
+class JoinIndex:
+    """
+    右表（如花名册）的关联索引
+    
+    保存按关联列去重后的右表（关联列已统一格式），以及关联值到行号的哈希索引。
+    同一份花名册关联多个考勤文件时只需构建一次，查找时左表每个唯一值只探测一次，
+    再按行号向量化取值
+    """
+    
+    def __init__(self, table: pd.DataFrame, on: str):
+        self.on = on
+        self.table = table.reset_index(drop=True)
+        self.keys = pd.Index(self.table[on])
+    
+    @classmethod
+    def build(cls, df_right: pd.DataFrame, on: str) -> "JoinIndex":
+        """由右表构建索引，关联值重复时保留第一行"""
+        if on not in df_right.columns:
+            raise ValueError(f"右表中不存在关联列 '{on}'。可用列: {list(df_right.columns)}")
+        table = df_right.copy()
+        table[on] = normalize_keys(table[on], on)
+        return cls(table.drop_duplicates(subset=[on]), on)
+    
+    def __len__(self) -> int:
+        return len(self.table)
+    
+    def columns(self, right_columns: list[str] | None = None) -> list[str]:
+        """返回要取出的右表列（不含关联列）"""
+        if right_columns:
+            missing = [c for c in right_columns if c not in self.table.columns]
+            if missing:
+                raise ValueError(f"右表中不存在列: {missing}。可用列: {list(self.table.columns)}")
+            return [c for c in right_columns if c != self.on]
+        return [c for c in self.table.columns if c != self.on]
+    
+    def lookup(self, keys: pd.Series) -> np.ndarray:
+        """
+        查找关联值对应的右表行号，未匹配为 -1
+        
+        Args:
+            keys: 已统一格式的关联值
+        """
+        codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+        return self.keys.get_indexer(uniques)[codes]
+
+
+class Dimension:
+    """
+    星型关联中的一个维度表
+    
+    name 用于未匹配统计，以及列名与左表或其他维度重复时的后缀（列名_name）
+    """
+    
+    def __init__(self, index: JoinIndex, columns: list[str] | None = None, name: str | None = None):
+        self.index = index
+        self.columns = index.columns(columns)
+        self.name = name or index.on
 
-from detect_header import detect_header_row
+
+def _index_cache_key(file_path: str, on: str, sheet_name, header_row) -> str:
+    return cache_key(
+        file_fingerprint(file_path),
+        kind="join_index",
+        index_version=INDEX_VERSION,
+        on=on,
+        sheet_name=sheet_name,
+        header_row=header_row,
+    )
+
+
+def load_join_index(
+    file_path: str,
+    on: str,
+    header_row: int | None = None,
+    sheet_name: str | int = 0,
+    use_cache: bool = False,
+    engine: str = DEFAULT_ENGINE,
+) -> JoinIndex:
+    """
+    读取右表文件并构建关联索引
+    
+    使用缓存时，索引（去重并统一格式后的右表）以文件指纹为键保存在解析缓存目录中，
+    右表文件变化后自动失效；命中时不再解析 Excel，也不再逐行统一关联列格式
+    
+    Args:
+        file_path: 右表文件路径
+        on: 关联列名
+        header_row: 表头行，为 None 时自动检测
+        sheet_name: 工作表
+        use_cache: 是否使用磁盘缓存
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
+    
+    Returns:
+        JoinIndex
+    """
+    if not Path(file_path).exists():
+        raise FileNotFoundError(f"右表文件不存在: {file_path}")
+    
+    cache = key = None
+    if use_cache:
+        cache = FrameCache()
+        key = _index_cache_key(file_path, on, sheet_name, header_row)
+        cached = cache.get(key)
+        if cached is not None:
+            table, _ = cached
+            print(f"使用已缓存的右表索引: {file_path}")
+            return JoinIndex(table, on)
+    
+    df_right, detected_row = load_excel(
+        file_path, header_row=header_row, sheet_name=sheet_name, engine=engine
+    )
+    if header_row is None:
+        print(f"右表自动检测表头行: {detected_row}")
+    with span(TRANSFORM, rows=len(df_right), step="build-index"):
+        index = JoinIndex.build(df_right, on)
+    
+    if cache is not None:
+        cache.put(key, index.table, header_row=detected_row, source=str(Path(file_path).resolve()), on=on)
+    return index
+
+
+def load_dimensions(
+    specs: list[dict],
+    use_cache: bool = False,
+    engine: str = DEFAULT_ENGINE,
+) -> list[Dimension]:
+    """
+    按配置读取各维度表并构建关联索引（每个维度表只构建一次）
+    
+    配置与流水线 join 阶段一致：
+        {"right_file": "花名册.xlsx", "on": "工号", "columns": ["地区"],
+         "right_sheet": 0, "right_header_row": None, "name": "花名册"}
+    name 默认为右表文件名（不含扩展名）
+    """
+    dimensions = []
+    for spec in specs:
+        for key in ("right_file", "on"):
+            if key not in spec:
+                raise ValueError(f"维度表配置缺少 '{key}': {spec}")
+        index = load_join_index(
+            spec["right_file"],
+            spec["on"],
+            header_row=spec.get("right_header_row"),
+            sheet_name=spec.get("right_sheet", 0),
+            use_cache=use_cache,
+            engine=engine,
+        )
+        name = spec.get("name") or Path(spec["right_file"]).stem
+        dimensions.append(Dimension(index, spec.get("columns"), name))
+    return dimensions
+
+
+def _unmatched_stats(
+    dimension: Dimension,
+    positions: np.ndarray,
+    codes: np.ndarray,
+    uniques: np.ndarray,
+    probes: np.ndarray,
+) -> dict:
+    """单个维度的匹配统计，未匹配的关联值按出现行数从多到少列出前几个"""
+    missing = np.flatnonzero(probes < 0)
+    counts = np.bincount(codes, minlength=len(uniques))[missing]
+    top = missing[np.argsort(-counts, kind="stable")[:UNMATCHED_EXAMPLES]]
+    unmatched_rows = int(counts.sum())
+    return {
+        "name": dimension.name,
+        "on": dimension.index.on,
+        "right_rows": len(dimension.index),
+        "matched_rows": len(positions) - unmatched_rows,
+        "unmatched_rows": unmatched_rows,
+        "unmatched_keys": len(missing),
+        "unmatched_examples": [str(uniques[i]) for i in top],
+    }
+
+
+def star_join_df(
+    df_left: pd.DataFrame,
+    dimensions: list[Dimension],
+    how: str = "left",
+) -> tuple[pd.DataFrame, list[dict]]:
+    """
+    将多个维度表一次关联到左表（星型关联）
+    
+    每个关联列只统一格式并编码一次（多个维度共用同一关联列时共享），
+    各维度的索引对左表每个唯一值只探测一次；所有维度列按行号取值后与左表的列一次组装为结果，
+    不产生逐个维度关联的中间结果，也不修改传入的左表
+    
+    Args:
+        df_left: 左表（事实表，如考勤数据），结果中的关联列为统一格式后的值
+        dimensions: 维度表列表
+        how: 关联方式，left（保留左表所有行）或 inner（只保留在所有维度中都匹配的行）
+    
+    Returns:
+        (关联后的 DataFrame, 各维度的匹配统计)
+    """
+    if how not in ("left", "inner"):
+        raise ValueError(f"多表关联不支持的关联方式: {how}（可用: left、inner）")
+    
+    # 左表每个关联列只统一格式并编码一次，统一格式后的列只在结果中替换原列
+    normalized = {}
+    encoded = {}
+    for dimension in dimensions:
+        on = dimension.index.on
+        if on in encoded:
+            continue
+        if on not in df_left.columns:
+            raise ValueError(f"左表中不存在关联列 '{on}'。可用列: {list(df_left.columns)}")
+        normalized[on] = normalize_keys(df_left[on], on)
+        encoded[on] = pd.factorize(normalized[on], use_na_sentinel=False)
+    
+    lookups = []
+    stats = []
+    for dimension in dimensions:
+        codes, uniques = encoded[dimension.index.on]
+        probes = dimension.index.keys.get_indexer(uniques)
+        positions = probes[codes]
+        lookups.append(positions)
+        stats.append(_unmatched_stats(dimension, positions, codes, uniques, probes))
+    
+    rows = None
+    if how == "inner" and lookups:
+        rows = np.flatnonzero(np.logical_and.reduce([positions >= 0 for positions in lookups]))
+        lookups = [positions[rows] for positions in lookups]
+    
+    # 按位置收集左表各列（关联列为统一格式后的值）与各维度选定的列，一次组装为结果
+    names = list(df_left.columns)
+    arrays = []
+    for i, column in enumerate(names):
+        values = normalized[column].array if column in normalized else df_left.iloc[:, i].array
+        arrays.append(values if rows is None else values.take(rows))
+    taken = set(names)
+    for dimension, positions in zip(dimensions, lookups):
+        for column in dimension.columns:
+            name = f"{column}_{dimension.name}" if column in taken else column
+            taken.add(name)
+            names.append(name)
+            arrays.append(dimension.index.table[column].reindex(positions).array)
+    
+    result = pd.DataFrame(dict(enumerate(arrays)), index=pd.RangeIndex(len(arrays[0]) if arrays else 0))
+    result.columns = names
+    return result, stats
+
+
+def print_join_stats(stats: list[dict]) -> None:
+    """输出各维度的匹配统计"""
+    for item in stats:
+        line = (
+            f"维度 {item['name']}（{item['on']}，{item['right_rows']} 行）: "
+            f"匹配 {item['matched_rows']} 行，未匹配 {item['unmatched_rows']} 行"
+        )
+        if item["unmatched_keys"]:
+            examples = "、".join(item["unmatched_examples"])
+            line += f"（{item['unmatched_keys']} 个关联值，如 {examples}）"
+        print(line)
+
+
+def join_df(
+    df_left: pd.DataFrame,
+    df_right: pd.DataFrame | JoinIndex,
+    on: str,
+    right_columns: list[str] | None = None,
+    how: str = "left",
+) -> pd.DataFrame:
+    """
+    通过指定列关联两个已读取的 DataFrame
+    
+    Args:
+        df_left: 左表（主表，如考勤数据）
+        df_right: 右表（关联表，如花名册），或已构建的 JoinIndex
+        on: 关联列名（两表中必须都存在）
+        right_columns: 从右表中选取的列名列表，为 None 时选取所有列
+        how: 关联方式，默认 left（保留左表所有行）
+    
+    Returns:
+        关联后的 DataFrame
+    """
+    # 检查关联列
+    if on not in df_left.columns:
+        raise ValueError(f"左表中不存在关联列 '{on}'。可用列: {list(df_left.columns)}")
+    if isinstance(df_right, JoinIndex):
+        if df_right.on != on:
+            raise ValueError(f"索引的关联列为 '{df_right.on}'，与 '{on}' 不一致")
+        index = df_right
+    else:
+        index = JoinIndex.build(df_right, on)
+    if how not in ("left", "inner", "outer"):
+        raise ValueError(f"不支持的关联方式: {how}")
+    
+    columns = index.columns(right_columns)
+    
+    print(f"左表: {len(df_left)} 行, {len(df_left.columns)} 列")
+    print(f"右表: {len(index)} 行, {len(columns) + 1} 列")
+    
+    if how == "outer":
+        # 外关联需要按关联值排序并保留右表未匹配的行，直接使用 merge；
+        # 关联列统一为字符串（工号补齐前导零到 6 位），在副本上替换，不修改传入的左表
+        df_left = df_left.assign(**{on: normalize_keys(df_left[on], on)})
+        result = pd.merge(df_left, index.table[[on] + columns], on=on, how=how, suffixes=("", "_右表"))
+    else:
+        # 按行号取右表数据，未匹配行为空值
+        result, stats = star_join_df(df_left, [Dimension(index, right_columns, "右表")], how=how)
+    
+    print(f"关联后: {len(result)} 行, {len(result.columns)} 列")
+    
+    # 统计关联情况
+    if how == "left" and columns:
+        print(f"未匹配行数: {stats[0]['unmatched_rows']}")
+    
+    return result
 
 
 def join_excel(
@@ -23,6 +347,8 @@ def join_excel(
     right_sheet: str | int = 0,
     output_path: str | None = None,
     how: str = "left",
+    use_cache: bool = False,
+    engine: str = DEFAULT_ENGINE,
 ) -> pd.DataFrame:
     """
     通过指定列关联两个 Excel 文件
@@ -38,6 +364,8 @@ def join_excel(
         right_sheet: 右表工作表
         output_path: 输出文件路径
         how: 关联方式，默认 left（保留左表所有行）
+        use_cache: 是否使用解析结果磁盘缓存
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
     
     Returns:
         关联后的 DataFrame
@@ -48,99 +376,176 @@ def join_excel(
     if not Path(right_file).exists():
         raise FileNotFoundError(f"右表文件不存在: {right_file}")
     
-    # 自动检测表头行
+    # 右表只构建一次关联索引，使用缓存时跨调用复用
+    index = load_join_index(
+        right_file,
+        on,
+        header_row=right_header_row,
+        sheet_name=right_sheet,
+        use_cache=use_cache,
+        engine=engine,
+    )
+    
+    # 读取数据，未指定表头行时在同一次解析中自动检测
+    df_left, detected_row = load_excel(
+        left_file,
+        header_row=left_header_row,
+        sheet_name=left_sheet,
+        use_cache=use_cache,
+        engine=engine,
+    )
     if left_header_row is None:
-        left_header_row = detect_header_row(left_file, sheet_name=left_sheet)
-        print(f"左表自动检测表头行: {left_header_row}")
+        print(f"左表自动检测表头行: {detected_row}")
+    
+    with span(TRANSFORM, rows=len(df_left)):
+        result = join_df(df_left, index, on, right_columns=right_columns, how=how)
+    
+    if output_path:
+        write_frame(result, output_path)
+        print(f"已保存到: {output_path}")
     
-    if right_header_row is None:
-        right_header_row = detect_header_row(right_file, sheet_name=right_sheet)
-        print(f"右表自动检测表头行: {right_header_row}")
+    return result
+
+
+def star_join_excel(
+    left_file: str,
+    dimensions: list[dict],
+    left_header_row: int | None = None,
+    left_sheet: str | int = 0,
+    output_path: str | None = None,
+    how: str = "left",
+    use_cache: bool = False,
+    engine: str = DEFAULT_ENGINE,
+) -> tuple[pd.DataFrame, list[dict]]:
+    """
+    将多个维度表一次关联到左表，左表只读取与写出一次
     
-    # 读取数据
-    df_left = pd.read_excel(left_file, header=left_header_row, sheet_name=left_sheet)
-    df_right = pd.read_excel(right_file, header=right_header_row, sheet_name=right_sheet)
+    Args:
+        left_file: 左表文件路径（事实表，如考勤数据）
+        dimensions: 维度表配置列表（见 load_dimensions），每个维度有各自的关联列与选取列
+        left_header_row: 左表表头行，为 None 时自动检测
+        left_sheet: 左表工作表
+        output_path: 输出文件路径
+        how: 关联方式，left 或 inner（只保留在所有维度中都匹配的行）
+        use_cache: 是否使用解析结果磁盘缓存
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
     
-    # 检查关联列
-    if on not in df_left.columns:
-        raise ValueError(f"左表中不存在关联列 '{on}'。可用列: {list(df_left.columns)}")
-    if on not in df_right.columns:
-        raise ValueError(f"右表中不存在关联列 '{on}'。可用列: {list(df_right.columns)}")
-    
-    # 统一关联列类型为字符串，并补齐前导零（工号场景）
-    df_left[on] = df_left[on].astype(str).str.strip()
-    df_right[on] = df_right[on].astype(str).str.strip()
-    
-    # 如果是工号，尝试统一格式（补齐前导零到6位）
-    if on == "工号":
-        df_left[on] = df_left[on].str.zfill(6)
-        df_right[on] = df_right[on].str.zfill(6)
-    
-    # 选取右表列
-    if right_columns:
-        missing = [c for c in right_columns if c not in df_right.columns]
-        if missing:
-            raise ValueError(f"右表中不存在列: {missing}。可用列: {list(df_right.columns)}")
-        # 确保包含关联列
-        select_cols = [on] + [c for c in right_columns if c != on]
-        df_right = df_right[select_cols].drop_duplicates(subset=[on])
-    else:
-        df_right = df_right.drop_duplicates(subset=[on])
+    Returns:
+        (关联后的 DataFrame, 各维度的匹配统计)
+    """
+    if not Path(left_file).exists():
+        raise FileNotFoundError(f"左表文件不存在: {left_file}")
+    if not dimensions:
+        raise ValueError("至少需要一个维度表")
+    
+    dims = load_dimensions(dimensions, use_cache=use_cache, engine=engine)
     
+    df_left, detected_row = load_excel(
+        left_file,
+        header_row=left_header_row,
+        sheet_name=left_sheet,
+        use_cache=use_cache,
+        engine=engine,
+    )
+    if left_header_row is None:
+        print(f"左表自动检测表头行: {detected_row}")
     print(f"左表: {len(df_left)} 行, {len(df_left.columns)} 列")
-    print(f"右表: {len(df_right)} 行, {len(df_right.columns)} 列")
     
-    # 关联
-    result = pd.merge(df_left, df_right, on=on, how=how, suffixes=("", "_右表"))
+    with span(TRANSFORM, rows=len(df_left)):
+        result, stats = star_join_df(df_left, dims, how=how)
     
     print(f"关联后: {len(result)} 行, {len(result.columns)} 列")
-    
-    # 统计关联情况
-    if how == "left":
-        # 检查有多少行没有匹配到
-        new_cols = [c for c in result.columns if c not in df_left.columns]
-        if new_cols:
-            null_count = result[new_cols[0]].isna().sum()
-            print(f"未匹配行数: {null_count}")
+    print_join_stats(stats)
     
     if output_path:
-        result.to_excel(output_path, index=False)
+        write_frame(result, output_path)
         print(f"已保存到: {output_path}")
     
-    return result
+    return result, stats
+
+
+def _dimension_arg(values: list[str]) -> dict:
+    """--dim 参数：文件路径、关联列与可选的选取列"""
+    if len(values) < 2:
+        raise ValueError(f"--dim 至少需要文件路径与关联列: {values}")
+    return {"right_file": values[0], "on": values[1], "columns": values[2:] or None}
 
 
 def main():
-    parser = argparse.ArgumentParser(description="通过指定列关联两个 Excel 文件")
+    parser = argparse.ArgumentParser(description="通过指定列关联两个 Excel 文件，或一次关联多个维度表")
     parser.add_argument("left_file", help="左表文件路径（主表）")
-    parser.add_argument("right_file", help="右表文件路径（关联表）")
-    parser.add_argument("--on", required=True, help="关联列名")
+    parser.add_argument("right_file", nargs="?", help="右表文件路径（关联表）")
+    parser.add_argument("--on", help="关联列名（指定 right_file 时必需）")
     parser.add_argument("-c", "--columns", nargs="+", help="从右表选取的列名（不指定则选取所有）")
+    parser.add_argument(
+        "--dim",
+        nargs="+",
+        action="append",
+        metavar="ARG",
+        help="追加一个维度表：文件路径 关联列 [选取列 ...]（可多次指定，与 right_file 一起一次关联）",
+    )
     parser.add_argument("--left-header-row", type=int, help="左表表头行")
     parser.add_argument("--right-header-row", type=int, help="右表表头行")
     parser.add_argument("--left-sheet", default="0", help="左表工作表")
     parser.add_argument("--right-sheet", default="0", help="右表工作表")
     parser.add_argument("--how", default="left", choices=["left", "inner", "outer"], help="关联方式")
     parser.add_argument("-o", "--output", help="输出文件路径")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    if args.right_file is None and not args.dim:
+        parser.error("需要指定 right_file 或 --dim")
+    if args.right_file is not None and args.on is None:
+        parser.error("指定 right_file 时需要 --on")
     
     left_sheet = int(args.left_sheet) if args.left_sheet.isdigit() else args.left_sheet
     right_sheet = int(args.right_sheet) if args.right_sheet.isdigit() else args.right_sheet
     
     try:
-        join_excel(
-            args.left_file,
-            args.right_file,
-            on=args.on,
-            right_columns=args.columns,
-            left_header_row=args.left_header_row,
-            right_header_row=args.right_header_row,
-            left_sheet=left_sheet,
-            right_sheet=right_sheet,
-            output_path=args.output,
-            how=args.how,
-        )
+        with profile_run(args.profile_output, "join_excel", args.profile_format):
+            if args.dim:
+                # 多个维度表：right_file（如有）作为第一个维度，一次关联后写出
+                dimensions = [_dimension_arg(values) for values in args.dim]
+                if args.right_file is not None:
+                    dimensions.insert(0, {
+                        "right_file": args.right_file,
+                        "on": args.on,
+                        "columns": args.columns,
+                        "right_sheet": right_sheet,
+                        "right_header_row": args.right_header_row,
+                    })
+                star_join_excel(
+                    args.left_file,
+                    dimensions,
+                    left_header_row=args.left_header_row,
+                    left_sheet=left_sheet,
+                    output_path=args.output,
+                    how=args.how,
+                    use_cache=not args.no_cache,
+                    engine=args.engine,
+                )
+            else:
+                join_excel(
+                    args.left_file,
+                    args.right_file,
+                    on=args.on,
+                    right_columns=args.columns,
+                    left_header_row=args.left_header_row,
+                    right_header_row=args.right_header_row,
+                    left_sheet=left_sheet,
+                    right_sheet=right_sheet,
+                    output_path=args.output,
+                    how=args.how,
+                    use_cache=not args.no_cache,
+                    engine=args.engine,
+                )
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,34 @@
+"""
+pandas / numpy 的延迟导入
+各脚本以 from lazy_imports import np, pd 代替模块顶部的 import，
+第一次访问 pd.xxx / np.xxx 时才真正导入，--help 与参数错误无需等待依赖导入。
+只在本仓库脚本的命名空间中绑定代理对象，不修改 sys.modules：
+其他库、isinstance、from pandas import ... 与进程池中的 pickle 看到的都是真正的模块
+"""
+
+from __future__ import annotations
+
+import importlib
+
+
+class LazyImport:
+    """
+    模块代理：第一次访问属性时导入模块
+    
+    取到的属性缓存在代理对象上，之后的访问与直接访问模块属性相同，没有额外开销
+    """
+    
+    def __init__(self, name: str):
+        self.__name = name
+    
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self.__name), attr)
+        setattr(self, attr, value)
+        return value
+    
+    def __repr__(self) -> str:
+        return f"<延迟导入的模块 '{self.__name}'>"
+
+
+pd = LazyImport("pandas")
+np = LazyImport("numpy")
@@ -0,0 +1,216 @@
+"""
+考勤数据处理流水线
+按声明式配置依次执行清洗、关联、异常报告、汇总与拆分，
+所有阶段共用内存中的同一份数据，只写出最终结果文件
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from abnormal_report import abnormal_report_df, sequence_conditions
+from clean_attendance import clean_attendance_df
+from excel_loader import DEFAULT_ENGINE, ENGINES, load_excel
+from join_excel import join_df, load_dimensions, load_join_index, print_join_stats, star_join_df
+from lazy_imports import pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from split_excel import split_df
+from summary_by_employee import summary_by_employee_df
+from summary_by_group import rollup_levels, summary_by_group_df, summary_by_grouping_sets_df
+from writers import write_frame, write_sheets
+
+# 支持的阶段：clean / join 会替换当前数据，其余阶段只读取当前数据
+STAGES = ["clean", "join", "abnormal", "summary_by_employee", "summary_by_group", "split"]
+
+
+def _require(stage: dict, key: str):
+    if key not in stage:
+        raise ValueError(f"阶段 '{stage.get('stage')}' 缺少参数 '{key}'")
+    return stage[key]
+
+
+def load_spec(spec_path: str) -> dict:
+    """
+    读取 JSON 格式的流水线配置
+    
+    Args:
+        spec_path: 配置文件路径
+    
+    Returns:
+        配置字典
+    """
+    path = Path(spec_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {spec_path}")
+    
+    spec = json.loads(path.read_text(encoding="utf-8"))
+    if "input" not in spec:
+        raise ValueError("配置中缺少 'input'（输入文件路径）")
+    
+    for stage in spec.get("stages", []):
+        if stage.get("stage") not in STAGES:
+            raise ValueError(f"未知的阶段 '{stage.get('stage')}'。可用阶段: {STAGES}")
+    return spec
+
+
+def run_pipeline(
+    spec: dict,
+    use_cache: bool = False,
+) -> dict[str, object]:
+    """
+    执行流水线，输入文件只解析一次
+    
+    配置示例:
+        {
+            "input": "考勤数据.xlsx",
+            "stages": [
+                {"stage": "clean"},
+                {"stage": "join", "right_file": "花名册.xlsx", "on": "工号", "columns": ["实际工作城市"]},
+                {"stage": "join", "dimensions": [
+                    {"right_file": "组织架构.xlsx", "on": "部门", "columns": ["部门负责人"]},
+                    {"right_file": "成本中心.xlsx", "on": "部门", "columns": ["成本中心"]}
+                ]},
+                {"stage": "abnormal", "streak_days": 3, "late_window": [10, 5], "output": "abnormal.xlsx"},
+                {"stage": "summary_by_employee", "output": "summary.xlsx"},
+                {"stage": "summary_by_group", "group_by": ["部门"], "output": "summary_dept.xlsx"},
+                {"stage": "summary_by_group", "grouping_sets": [["部门"], ["地区", "部门"]], "output": "levels.xlsx"},
+                {"stage": "split", "column": "部门", "output_dir": "by_dept"}
+            ]
+        }
+    
+    Args:
+        spec: 流水线配置，包含 input、可选的 sheet / header_row / compact / engine 与 stages 列表，
+            compact 为 true 时读取后将列转换为紧凑类型（见 column_ops.compact_frame），
+            engine 为 .xlsx 读取引擎（见 excel_loader.ENGINES，join 阶段的右表使用同一引擎）
+        use_cache: 是否使用解析结果磁盘缓存
+    
+    Returns:
+        字典，key 为阶段名（同名阶段依次追加 _2、_3），value 为该阶段结果
+    """
+    input_file = spec["input"]
+    header_row = spec.get("header_row")
+    engine = spec.get("engine", DEFAULT_ENGINE)
+    
+    df, detected_row = load_excel(
+        input_file,
+        header_row=header_row,
+        sheet_name=spec.get("sheet", 0),
+        use_cache=use_cache,
+        compact=spec.get("compact", False),
+        engine=engine,
+    )
+    if header_row is None:
+        print(f"自动检测表头行: {detected_row}")
+    print(f"读取 {input_file}: {len(df)} 行, {len(df.columns)} 列")
+    
+    results = {}
+    for index, stage in enumerate(spec.get("stages", []), start=1):
+        name = stage.get("stage")
+        print(f"\n=== 阶段 {index}: {name} ===")
+        
+        # 各阶段的处理记录为 transform 区间（附带阶段名），读取右表与写出另有各自的区间
+        if name == "clean":
+            with span(TRANSFORM, rows=len(df), stage=name):
+                df = clean_attendance_df(df, stage.get("rules"))
+            result = df
+        elif name == "join" and "dimensions" in stage:
+            # 多个维度表：各自构建索引后一次关联，不产生逐个关联的中间结果
+            dimensions = load_dimensions(stage["dimensions"], use_cache=use_cache, engine=engine)
+            with span(TRANSFORM, rows=len(df), stage=name):
+                df, stats = star_join_df(df, dimensions, how=stage.get("how", "left"))
+            print_join_stats(stats)
+            result = df
+        elif name == "join":
+            index = load_join_index(
+                _require(stage, "right_file"),
+                _require(stage, "on"),
+                header_row=stage.get("right_header_row"),
+                sheet_name=stage.get("right_sheet", 0),
+                use_cache=use_cache,
+                engine=engine,
+            )
+            with span(TRANSFORM, rows=len(df), stage=name):
+                df = join_df(
+                    df,
+                    index,
+                    index.on,
+                    right_columns=stage.get("columns"),
+                    how=stage.get("how", "left"),
+                )
+            result = df
+        elif name == "abnormal":
+            with span(TRANSFORM, rows=len(df), stage=name):
+                conditions = sequence_conditions(stage.get("streak_days"), stage.get("late_window"))
+                _, result = abnormal_report_df(df, stage.get("types"), conditions)
+        elif name == "summary_by_employee":
+            with span(TRANSFORM, rows=len(df), stage=name):
+                result = summary_by_employee_df(df, stage.get("columns"))
+        elif name == "summary_by_group":
+            # grouping_sets（层级列表）或 rollup（按 group_by 逐级上卷）时结果为每个层级一个工作表
+            levels = stage.get("grouping_sets")
+            if stage.get("rollup"):
+                levels = rollup_levels(_require(stage, "group_by"))
+            with span(TRANSFORM, rows=len(df), stage=name):
+                if levels is not None:
+                    result = summary_by_grouping_sets_df(df, levels, stage.get("columns"))
+                else:
+                    result = summary_by_group_df(df, _require(stage, "group_by"), stage.get("columns"))
+        elif name == "split":
+            output_dir = stage.get("output_dir")
+            if output_dir is None:
+                path = Path(input_file)
+                output_dir = path.parent / f"{path.stem}_split"
+            result = split_df(
+                df,
+                _require(stage, "column"),
+                str(output_dir),
+                file_format=stage.get("format", "xlsx"),
+                jobs=stage.get("jobs", 1),
+            )
+        else:
+            raise ValueError(f"未知的阶段 '{name}'。可用阶段: {STAGES}")
+        
+        # 只写出配置了 output 的阶段结果，空的异常报告不保存
+        output = stage.get("output")
+        if output and isinstance(result, dict) and name == "summary_by_group":
+            write_sheets(result, output)
+            print(f"已保存到: {output}")
+        elif output and isinstance(result, pd.DataFrame) and not (name == "abnormal" and result.empty):
+            write_frame(result, output)
+            print(f"已保存到: {output}")
+        
+        key = name
+        suffix = 2
+        while key in results:
+            key = f"{name}_{suffix}"
+            suffix += 1
+        results[key] = result
+    
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="考勤数据处理流水线（一次读取，多阶段处理）")
+    parser.add_argument("spec", help="流水线配置文件（JSON）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument("--engine", choices=ENGINES, help="xlsx 读取引擎，覆盖配置中的 engine")
+    add_profile_arguments(parser)
+    
+    args = parser.parse_args()
+    
+    try:
+        with profile_run(args.profile_output, "pipeline", args.profile_format):
+            spec = load_spec(args.spec)
+            if args.engine:
+                spec["engine"] = args.engine
+            run_pipeline(spec, use_cache=not args.no_cache)
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
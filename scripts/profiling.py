@@ -0,0 +1,324 @@
+"""
+按阶段的性能剖析
+读取与处理过程中记录命名区间（打开文件、检测表头、解析、处理、写出），
+包含耗时、行数、吞吐量与该阶段的内存峰值（RSS），
+通过 --profile 导出为 JSON 摘要或 Chrome trace（chrome://tracing、Perfetto 可直接打开），
+无需外部剖析工具即可定位生产环境中变慢的阶段。未启用时各区间为空操作
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# 标准阶段名称
+OPEN = "open"
+DETECT_HEADER = "detect-header"
+PARSE = "parse"
+TRANSFORM = "transform"
+WRITE = "write"
+STAGES = [OPEN, DETECT_HEADER, PARSE, TRANSFORM, WRITE]
+
+# 导出格式：json 为区间列表与按阶段的汇总，chrome 为 Chrome trace 事件格式
+PROFILE_FORMATS = ["json", "chrome"]
+
+_STATUS_PATH = "/proc/self/status"
+_CLEAR_REFS_PATH = "/proc/self/clear_refs"
+_HWM_RE = re.compile(r"VmHWM:\s+(\d+) kB")
+
+
+def _read_peak_rss() -> int | None:
+    """进程自上次重置以来的 RSS 峰值（字节，仅 Linux）"""
+    try:
+        with open(_STATUS_PATH) as status:
+            match = _HWM_RE.search(status.read())
+    except OSError:
+        return None
+    return int(match.group(1)) * 1024 if match else None
+
+
+def _reset_peak_rss() -> bool:
+    """重置进程的 RSS 峰值（Linux 4.0+），不支持时返回 False"""
+    try:
+        with open(_CLEAR_REFS_PATH, "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _max_rss() -> int | None:
+    """进程启动以来的 RSS 峰值（字节），不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    """
+    一个进行中的区间，可作为上下文管理器使用，也可调用 stop() 结束
+    
+    rows 为该阶段处理的行数，可在结束前设置
+    """
+    
+    def __init__(self, profiler: Profiler, name: str, rows: int | None, args: dict):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+        self.args = args
+        self.start = 0.0
+        self.peak_rss = 0
+        self.thread = threading.get_ident()
+        self._stopped = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+    
+    def stop(self, rows: int | None = None) -> None:
+        if rows is not None:
+            self.rows = rows
+        if not self._stopped:
+            self._stopped = True
+            self.profiler._finish(self)
+
+
+class _NullSpan:
+    """未启用剖析时的区间，所有操作均为空操作"""
+    
+    rows = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return None
+    
+    def __setattr__(self, name, value):
+        pass
+    
+    def stop(self, rows: int | None = None) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """
+    记录区间的剖析器（线程安全）
+    
+    同一线程中嵌套的同名区间只记录最外层，避免重复计时（如 write_frame 内部的 FrameWriter.write）。
+    Linux 上每个区间开始时重置进程的 RSS 峰值，结束时读取，得到该区间内的峰值，
+    并计入仍在进行的外层区间；其他平台为进程启动以来的峰值
+    """
+    
+    def __init__(self):
+        self.spans = []
+        self._open = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._per_span_peak = _read_peak_rss() is not None and _reset_peak_rss()
+    
+    def span(self, name: str, rows: int | None = None, **args) -> Span | _NullSpan:
+        """开始一个区间，args 为附加信息（如工作表名、阶段名），写入导出结果"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        if stack and stack[-1].name == name:
+            return _NULL_SPAN
+        
+        span = Span(self, name, rows, args)
+        with self._lock:
+            if self._per_span_peak:
+                self._update_peak(_read_peak_rss())
+                _reset_peak_rss()
+            self._open.append(span)
+        stack.append(span)
+        span.start = time.perf_counter()
+        return span
+    
+    def _update_peak(self, peak: int | None) -> None:
+        if peak is None:
+            return
+        for span in self._open:
+            span.peak_rss = max(span.peak_rss, peak)
+    
+    def _finish(self, span: Span) -> None:
+        end = time.perf_counter()
+        stack = self._local.stack
+        if span in stack:
+            stack.remove(span)
+        with self._lock:
+            self._update_peak(_read_peak_rss() if self._per_span_peak else _max_rss())
+            self._open.remove(span)
+            self.spans.append({
+                "name": span.name,
+                "start": span.start - self._origin,
+                "seconds": end - span.start,
+                "rows": span.rows,
+                "peak_rss": span.peak_rss or None,
+                "thread": span.thread,
+                "args": span.args,
+            })
+    
+    def records(self) -> list[dict]:
+        """按开始时间排序的区间列表，包含耗时（秒）、行数、吞吐量（行/秒）与 RSS 峰值（字节）"""
+        records = []
+        for span in sorted(self.spans, key=lambda s: s["start"]):
+            record = {k: v for k, v in span.items() if k != "thread"}
+            record["rows_per_second"] = _throughput(span["rows"], span["seconds"])
+            records.append(record)
+        return records
+    
+    def summary(self) -> list[dict]:
+        """按区间名称汇总：次数、总耗时、总行数、吞吐量与最大 RSS 峰值，按首次出现的顺序排列"""
+        stages = {}
+        for span in sorted(self.spans, key=lambda s: s["start"]):
+            stage = stages.setdefault(
+                span["name"], {"name": span["name"], "count": 0, "seconds": 0.0, "rows": None, "peak_rss": None}
+            )
+            stage["count"] += 1
+            stage["seconds"] += span["seconds"]
+            if span["rows"] is not None:
+                stage["rows"] = (stage["rows"] or 0) + span["rows"]
+            if span["peak_rss"] is not None:
+                stage["peak_rss"] = max(stage["peak_rss"] or 0, span["peak_rss"])
+        for stage in stages.values():
+            stage["rows_per_second"] = _throughput(stage["rows"], stage["seconds"])
+        return list(stages.values())
+    
+    def chrome_trace(self) -> dict:
+        """Chrome trace 事件格式（完整事件 ph=X，时间单位为微秒）"""
+        pid = os.getpid()
+        events = []
+        for span in sorted(self.spans, key=lambda s: s["start"]):
+            args = dict(span["args"])
+            if span["rows"] is not None:
+                args["rows"] = span["rows"]
+                args["rows_per_second"] = _throughput(span["rows"], span["seconds"])
+            if span["peak_rss"] is not None:
+                args["peak_rss_mb"] = round(span["peak_rss"] / 1024 ** 2, 1)
+            events.append({
+                "name": span["name"],
+                "cat": "aliy",
+                "ph": "X",
+                "ts": round(span["start"] * 1e6, 1),
+                "dur": round(span["seconds"] * 1e6, 1),
+                "pid": pid,
+                "tid": span["thread"],
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+    
+    def write(self, output_path: str, fmt: str = "json") -> None:
+        """写出剖析结果"""
+        if fmt not in PROFILE_FORMATS:
+            raise ValueError(f"未知的剖析格式 '{fmt}'。可用格式: {PROFILE_FORMATS}")
+        data = self.chrome_trace() if fmt == "chrome" else {"stages": self.summary(), "spans": self.records()}
+        path = Path(output_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    
+    def print_summary(self, file=None) -> None:
+        """输出按阶段的汇总表（默认输出到 stderr，不影响标准输出中的结果）"""
+        file = file or sys.stderr
+        print("\n[profile] 阶段                次数      耗时(s)        行数       行/秒   RSS峰值(MB)", file=file)
+        for stage in self.summary():
+            rows = "-" if stage["rows"] is None else stage["rows"]
+            speed = "-" if stage["rows_per_second"] is None else f"{stage['rows_per_second']:.0f}"
+            peak = "-" if stage["peak_rss"] is None else f"{stage['peak_rss'] / 1024 ** 2:.1f}"
+            print(
+                f"[profile] {stage['name']:<18} {stage['count']:>4} {stage['seconds']:>12.3f} "
+                f"{rows:>11} {speed:>11} {peak:>13}",
+                file=file,
+            )
+
+
+def _throughput(rows: int | None, seconds: float) -> float | None:
+    if rows is None or seconds <= 0:
+        return None
+    return round(rows / seconds, 1)
+
+
+# 当前启用的剖析器（profile_run 期间有效）
+_active: Profiler | None = None
+
+
+def span(name: str, rows: int | None = None, **args) -> Span | _NullSpan:
+    """
+    在当前启用的剖析器中开始一个区间，未启用时返回空操作的区间
+    
+    用法:
+        with span(PARSE) as s:
+            df = ...
+            s.rows = len(df)
+    """
+    if _active is None:
+        return _NULL_SPAN
+    return _active.span(name, rows, **args)
+
+
+def active_profiler() -> Profiler | None:
+    return _active
+
+
+@contextmanager
+def profile_run(output_path: str | None, command: str, fmt: str = "json"):
+    """
+    启用剖析，整个命令记录为名为 command 的区间，结束时（包括出错时）写出结果并输出汇总
+    
+    Args:
+        output_path: 剖析结果输出路径，为 None 时不启用
+        command: 命令名称
+        fmt: 导出格式，见 PROFILE_FORMATS
+    """
+    global _active
+    if output_path is None:
+        yield None
+        return
+    if fmt not in PROFILE_FORMATS:
+        raise ValueError(f"未知的剖析格式 '{fmt}'。可用格式: {PROFILE_FORMATS}")
+    
+    profiler = Profiler()
+    _active = profiler
+    try:
+        with profiler.span(command):
+            yield profiler
+    finally:
+        _active = None
+        profiler.write(output_path, fmt)
+        profiler.print_summary()
+        print(f"[profile] 已保存到: {output_path}", file=sys.stderr)
+
+
+def add_profile_arguments(parser, option: str = "--profile") -> None:
+    """
+    为命令行添加 --profile / --profile-format 参数，解析结果为 args.profile_output 与 args.profile_format
+    
+    option 用于已有同名参数的命令（如 analyze_excel_columns 的 --profile 为画像模式）
+    """
+    parser.add_argument(
+        option,
+        dest="profile_output",
+        metavar="PATH",
+        help="记录各阶段的耗时、行数、吞吐量与内存峰值，写出到 PATH",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=PROFILE_FORMATS,
+        default="json",
+        help="剖析结果格式：json（区间与阶段汇总）或 chrome（chrome://tracing / Perfetto），默认 json",
+    )
@@ -2,17 +2,27 @@
 读取 Excel 文件前五行，用于判断表头结构（是否为多级表头）
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
+from excel_loader import ALL_SHEETS, is_multi_sheet, map_sheets, parse_sheet_arg, resolve_sheets
+from lazy_imports import pd
+from profiling import PARSE, add_profile_arguments, profile_run, span
+
+
+def _read_head(file_path: str, sheet: str, rows: int) -> pd.DataFrame:
+    """读取单个工作表的前 N 行（在工作进程中执行）"""
+    return pd.read_excel(file_path, sheet_name=sheet, header=None, nrows=rows)
 
 
 def read_excel_head(
     file_path: str,
     rows: int = 5,
-    sheet_name: str | int | None = None,
+    sheet_name: str | int | list[str | int] | None = None,
+    jobs: int | None = None,
 ) -> pd.DataFrame | dict[str, pd.DataFrame]:
     """
     读取 Excel 文件的前 N 行
@@ -20,7 +30,9 @@ def read_excel_head(
     Args:
         file_path: Excel 文件路径
         rows: 读取的行数，默认 5 行
-        sheet_name: 工作表名称或索引，为 None 时读取所有非空 sheet
+        sheet_name: 工作表名称或索引，为 None 时读取所有非空 sheet，
+            列表或 "all" 时读取指定的多个 sheet
+        jobs: 读取多个 sheet 时并行的进程数，为 None 时取 sheet 数与 CPU 核心数的较小值
     
     Returns:
         单个 sheet 返回 DataFrame，多个 sheet 返回字典
@@ -32,18 +44,17 @@ def read_excel_head(
     if path.suffix.lower() not in ['.xlsx', '.xls']:
         raise ValueError(f"不支持的文件格式: {path.suffix}")
     
-    if sheet_name is not None:
+    if sheet_name is not None and not is_multi_sheet(sheet_name):
         # 读取指定 sheet
-        df = pd.read_excel(file_path, sheet_name=sheet_name, header=None, nrows=rows)
+        with span(PARSE, rows=rows):
+            df = pd.read_excel(file_path, sheet_name=sheet_name, header=None, nrows=rows)
         return df
     
-    # 读取所有 sheet
-    xlsx = pd.ExcelFile(file_path)
-    results = {}
-    for name in xlsx.sheet_names:
-        df = pd.read_excel(xlsx, sheet_name=name, header=None, nrows=rows)
-        if not df.empty:
-            results[name] = df
+    # 并行读取多个 sheet，只保留非空 sheet
+    sheets = resolve_sheets(file_path, ALL_SHEETS if sheet_name is None else sheet_name)
+    with span(PARSE, rows=rows * len(sheets), sheets=len(sheets)):
+        heads = map_sheets(_read_head, file_path, sheets, rows, jobs=jobs)
+    results = {name: df for name, df in zip(sheets, heads) if not df.empty}
     
     if len(results) == 1:
         return list(results.values())[0]
@@ -54,29 +65,32 @@ def main():
     parser = argparse.ArgumentParser(description="读取 Excel 文件前五行")
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("-n", "--rows", type=int, default=5, help="读取行数，默认 5")
-    parser.add_argument("-s", "--sheet", help="工作表名称（不指定则读取所有非空 sheet）")
+    parser.add_argument("-s", "--sheet", nargs="+", help="工作表名称（可多个，不指定则读取所有非空 sheet）")
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    sheet = parse_sheet_arg(args.sheet) if args.sheet else None
     
     try:
-        result = read_excel_head(args.file, args.rows, args.sheet)
-        print(f"文件: {args.file}")
-        
-        if isinstance(result, dict):
-            print(f"共 {len(result)} 个非空工作表")
-            for name, df in result.items():
-                print(f"\n【{name}】前 {args.rows} 行:")
-                print("-" * 50)
-                print(df.to_string())
-        else:
-            print(f"前 {args.rows} 行数据:")
-            print("-" * 50)
-            if result.empty:
-                # 尝试列出所有 sheet 名称
-                xlsx = pd.ExcelFile(args.file)
-                print(f"数据为空。可用工作表: {xlsx.sheet_names}")
+        with profile_run(args.profile_output, "read_excel_head", args.profile_format):
+            result = read_excel_head(args.file, args.rows, sheet)
+            print(f"文件: {args.file}")
+            
+            if isinstance(result, dict):
+                print(f"共 {len(result)} 个非空工作表")
+                for name, df in result.items():
+                    print(f"\n【{name}】前 {args.rows} 行:")
+                    print("-" * 50)
+                    print(df.to_string())
             else:
-                print(result.to_string())
+                print(f"前 {args.rows} 行数据:")
+                print("-" * 50)
+                if result.empty:
+                    # 尝试列出所有 sheet 名称
+                    xlsx = pd.ExcelFile(args.file)
+                    print(f"数据为空。可用工作表: {xlsx.sheet_names}")
+                else:
+                    print(result.to_string())
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
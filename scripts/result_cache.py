@@ -0,0 +1,262 @@
+"""
+报表结果的内容寻址缓存
+summary_by_group、generate_abnormal_report、validate_columns 等函数的结果只取决于
+输入文件内容与参数。以各输入文件的内容哈希 + 规范化后的参数为键缓存结果，
+重复请求同一报表时跳过 XLSX 解析与计算
+"""
+
+from __future__ import annotations
+
+import argparse
+import inspect
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from frame_cache import FrameCache, cache_key, default_cache_dir, file_fingerprint
+from lazy_imports import pd
+
+# 结果缓存的格式版本，报表计算逻辑变化时递增使旧结果失效
+RESULT_VERSION = 2
+
+# 结果缓存位于解析缓存目录下的子目录，两者分别淘汰
+RESULT_SUBDIR = "results"
+
+# 默认有效期（秒）与容量上限
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+DEFAULT_MAX_ENTRIES = 256
+
+# 内存中记住内容哈希的文件数上限（按最近使用淘汰）
+MAX_DIGESTS = 256
+
+# 不影响结果的参数，不参与缓存键
+IGNORED_PARAMS = {"use_cache"}
+
+# 文件路径参数：以文件内容哈希参与缓存键（包括嵌套在列表、字典中的，如各维度表配置的 right_file）
+PATH_PARAMS = {"file", "file_path", "right_file"}
+
+
+def _normalized_params(func, file_path: str, kwargs: dict) -> dict:
+    """绑定参数并补全默认值，使位置参数、关键字参数与省略默认值的调用得到相同的键"""
+    bound = inspect.signature(func).bind(file_path, **kwargs)
+    bound.apply_defaults()
+    if bound.arguments.get("output_path"):
+        raise ValueError("缓存调用不写出文件，请对返回结果调用 write_frame")
+    params = {k: v for k, v in bound.arguments.items() if k not in IGNORED_PARAMS}
+    # 第一个参数（输入文件）统一记为 file_path，按内容哈希
+    first = next(iter(inspect.signature(func).parameters))
+    params["file_path"] = params.pop(first)
+    return params
+
+
+def _json_value(value):
+    """校验结果可以原样经 JSON 保存与读回，否则拒绝缓存"""
+    try:
+        restored = json.loads(json.dumps(value, ensure_ascii=False))
+    except (TypeError, ValueError) as e:
+        raise TypeError(f"结果无法缓存: {type(value).__name__} 不能保存为 JSON（{e}）") from e
+    if restored != value:
+        raise TypeError(f"结果无法缓存: {type(value).__name__} 经 JSON 读回后与原值不同")
+    return value
+
+
+class ResultCache:
+    """
+    报表结果缓存
+    
+    DataFrame 结果以列式格式（Parquet，不可用时 pickle）存储；
+    {名称: DataFrame} 结果每个 DataFrame 单独存储；(DataFrame, 附加信息) 结果的附加信息
+    与其他结果一样保存在元数据中，必须能原样经 JSON 读回，否则拒绝缓存（TypeError）。
+    条目超过 ttl 秒失效，并按最近访问时间限制总大小与条目数
+    
+    用法:
+        cache = ResultCache()
+        result = cache.call(summary_by_group, "考勤数据.xlsx", group_by=["部门"])
+        result, hit = cache.fetch("报表名", {"file": "考勤数据.xlsx", ...}, compute)
+    """
+    
+    def __init__(
+        self,
+        cache_dir: str | None = None,
+        ttl: float | None = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / RESULT_SUBDIR
+        self.cache = FrameCache(cache_dir, max_bytes=max_bytes, max_entries=max_entries, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        # 路径 -> ((大小, 修改时间), 内容哈希)
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _content(self, file_path) -> dict:
+        """
+        文件内容哈希，按路径、大小与修改时间记住，同一文件的重复请求不重新读取
+        
+        每个路径只保留最新的哈希，最多记住 MAX_DIGESTS 个最近使用的路径
+        """
+        path = Path(file_path).resolve()
+        stat = path.stat()
+        key, stamp = str(path), (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            memo = self._digests.get(key)
+            if memo is not None and memo[0] == stamp:
+                self._digests.move_to_end(key)
+                return memo[1]
+        
+        # 计算哈希在锁外进行，不阻塞其他文件的请求
+        fingerprint = file_fingerprint(str(path))
+        content = {"digest": fingerprint["digest"], "size": fingerprint["size"]}
+        with self._lock:
+            self._digests[key] = (stamp, content)
+            self._digests.move_to_end(key)
+            while len(self._digests) > MAX_DIGESTS:
+                self._digests.popitem(last=False)
+        return content
+    
+    def _digest_paths(self, value, name: str | None = None):
+        """将参数中的文件路径（见 PATH_PARAMS）替换为文件内容哈希"""
+        if name in PATH_PARAMS and isinstance(value, (str, os.PathLike)):
+            return self._content(value)
+        if isinstance(value, dict):
+            return {k: self._digest_paths(v, k) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._digest_paths(v, name) for v in value]
+        return value
+    
+    def _key(self, name: str, params: dict) -> str:
+        return cache_key(
+            {},
+            result_version=RESULT_VERSION,
+            function=name,
+            params=self._digest_paths(params),
+        )
+    
+    def key(self, func, file_path: str, **kwargs) -> str:
+        """缓存键：函数名、各文件参数的内容哈希与规范化后的参数"""
+        return self._key(f"{func.__module__}.{func.__qualname__}", _normalized_params(func, file_path, kwargs))
+    
+    def call(self, func, file_path: str, **kwargs):
+        """
+        调用 func(file_path, **kwargs)，相同文件内容与参数的结果直接从缓存返回
+        
+        Args:
+            func: 报表函数，第一个参数为文件路径
+            file_path: 输入文件路径
+            **kwargs: 其余参数（不支持 output_path）
+        
+        Returns:
+            func 的返回值
+        """
+        name = f"{func.__module__}.{func.__qualname__}"
+        params = _normalized_params(func, file_path, kwargs)
+        result, _ = self.fetch(name, params, lambda: func(file_path, **kwargs))
+        return result
+    
+    def fetch(self, name: str, params: dict, compute) -> tuple[object, bool]:
+        """
+        返回名称与参数对应的缓存结果，未命中时调用 compute() 计算并缓存
+        
+        Args:
+            name: 报表名称（不同报表的结果互不命中）
+            params: 决定结果的参数，其中的文件路径（见 PATH_PARAMS）按文件内容哈希参与缓存键
+            compute: 计算结果的函数
+        
+        Returns:
+            (结果, 是否命中)
+        """
+        key = self._key(name, params)
+        found, result = self._load(key)
+        if found:
+            self.hits += 1
+            return result, True
+        
+        self.misses += 1
+        result = compute()
+        self._store(key, result)
+        return result, False
+    
+    def _load(self, key: str) -> tuple[bool, object]:
+        cached = self.cache.get(key)
+        if cached is None:
+            return False, None
+        df, meta = cached
+        kind = meta.get("result_type")
+        if kind == "frame":
+            return True, df
+        if kind == "value":
+            return True, meta["value"]
+        if kind == "pair":
+            return True, (df, meta["value"])
+        if kind == "frames":
+            frames = {}
+            for index, name in enumerate(meta["names"]):
+                part = self.cache.get(f"{key}-{index}")
+                if part is None:
+                    # 部分结果已被淘汰，整体视为未命中
+                    self.cache.remove(key)
+                    return False, None
+                frames[name] = part[0]
+            return True, frames
+        return False, None
+    
+    def _store(self, key: str, result) -> None:
+        if isinstance(result, pd.DataFrame):
+            self.cache.put(key, result, result_type="frame")
+        elif isinstance(result, dict) and result and all(
+            isinstance(v, pd.DataFrame) for v in result.values()
+        ):
+            # 先写入各部分，最后写入索引条目，避免读到不完整的结果
+            for index, frame in enumerate(result.values()):
+                self.cache.put(f"{key}-{index}", frame, result_type="part")
+            self.cache.put(key, pd.DataFrame(), result_type="frames", names=list(result))
+        elif isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], pd.DataFrame):
+            self.cache.put(key, result[0], result_type="pair", value=_json_value(result[1]))
+        else:
+            self.cache.put(key, pd.DataFrame(), result_type="value", value=_json_value(result))
+    
+    def stats(self) -> dict:
+        """返回本实例的命中 / 未命中次数，以及缓存条目数、占用大小与各条目的累计命中次数"""
+        info = self.cache.info()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": info["entries"],
+            "bytes": info["bytes"],
+            "total_hits": info["hits"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="管理报表结果缓存")
+    parser.add_argument("--cache-dir", help=f"缓存目录（默认为解析缓存目录下的 {RESULT_SUBDIR}/）")
+    parser.add_argument("--clear", action="store_true", help="清空结果缓存")
+    parser.add_argument("--evict", action="store_true", help="删除过期条目并按容量上限淘汰")
+    
+    args = parser.parse_args()
+    
+    try:
+        cache = ResultCache(args.cache_dir)
+        if args.clear:
+            print(f"已清空结果缓存: {cache.cache.clear()} 个条目")
+        elif args.evict:
+            print(f"已淘汰: {cache.cache.evict()} 个条目")
+        else:
+            info = cache.cache.info()
+            print(f"缓存目录: {info['cache_dir']}")
+            print(f"条目数: {info['entries']}")
+            print(f"占用大小: {info['bytes'] / 1024 / 1024:.1f} MB")
+            print(f"累计命中: {info['hits']} 次")
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
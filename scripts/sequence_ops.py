@@ -0,0 +1,105 @@
+"""
+序列运算辅助函数
+整表按（工号, 日期）排序一次后，在排好序的布尔数组上用 NumPy 向量化计算
+连续段长度（run-length）与滑动窗口计数，不按员工循环。
+分组编码相同的相邻位置属于同一员工，连续段与窗口都不跨越员工
+"""
+
+from __future__ import annotations
+
+from column_ops import factorize_as_str
+from lazy_imports import np, pd
+
+
+def sequence_order(keys: pd.Series, dates: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    按（分组键, 日期）排序
+    
+    Args:
+        keys: 分组键（如工号）
+        dates: 日期列，无法解析为日期的值视为缺失
+    
+    Returns:
+        (排序后的行号, 对应的分组编码)，分组键或日期缺失的行不参与排序
+    """
+    codes, _ = factorize_as_str(keys)
+    days = pd.to_datetime(dates, errors="coerce").to_numpy(dtype="datetime64[ns]")
+    valid = np.flatnonzero((codes >= 0) & ~np.isnat(days))
+    order = valid[np.lexsort((days[valid], codes[valid]))]
+    return order, codes[order]
+
+
+def group_bounds(groups: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    每个位置所在分组的首、末位置
+    
+    Args:
+        groups: 已排序的分组编码（相同编码相邻）
+    
+    Returns:
+        (首位置数组, 末位置数组)
+    """
+    n = len(groups)
+    positions = np.arange(n)
+    if n == 0:
+        return positions, positions
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = groups[1:] != groups[:-1]
+    ends = np.ones(n, dtype=bool)
+    ends[:-1] = starts[1:]
+    first = np.maximum.accumulate(np.where(starts, positions, 0))
+    last = np.minimum.accumulate(np.where(ends, positions, n)[::-1])[::-1]
+    return first, last
+
+
+def run_lengths(flags: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """
+    每个位置所在连续段的长度（同一分组内取值相同的相邻位置为一段）
+    
+    Args:
+        flags: 已排序的布尔数组
+        groups: 对应的分组编码
+    
+    Returns:
+        与 flags 等长的整数数组
+    """
+    n = len(flags)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = (flags[1:] != flags[:-1]) | (groups[1:] != groups[:-1])
+    run_ids = np.cumsum(starts) - 1
+    return np.bincount(run_ids)[run_ids]
+
+
+def streak_mask(flags: np.ndarray, groups: np.ndarray, min_length: int) -> np.ndarray:
+    """flags 为真、且所在连续段长度不少于 min_length 的位置"""
+    return flags & (run_lengths(flags, groups) >= min_length)
+
+
+def rolling_counts(flags: np.ndarray, groups: np.ndarray, window: int) -> np.ndarray:
+    """
+    以每个位置结尾、最多 window 个位置的窗口（不跨分组）内 flags 为真的个数
+    
+    由前缀和相减得到，耗时与窗口大小无关
+    """
+    positions = np.arange(len(flags))
+    first, _ = group_bounds(groups)
+    cumulative = np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+    lower = np.maximum(positions - window + 1, first)
+    return cumulative[positions + 1] - cumulative[lower]
+
+
+def window_mask(flags: np.ndarray, groups: np.ndarray, window: int, min_count: int) -> np.ndarray:
+    """
+    flags 为真、且位于至少一个满足条件的窗口内的位置
+    
+    满足条件的窗口：同一分组内连续 window 个位置中至少 min_count 个为真。
+    位置 i 属于以 e 结尾的窗口当且仅当 e 在 [i, i + window - 1] 内且与 i 同组
+    """
+    positions = np.arange(len(flags))
+    _, last = group_bounds(groups)
+    qualifying = rolling_counts(flags, groups, window) >= min_count
+    cumulative = np.concatenate(([0], np.cumsum(qualifying, dtype=np.int64)))
+    upper = np.minimum(positions + window - 1, last)
+    return flags & (cumulative[upper + 1] - cumulative[positions] > 0)
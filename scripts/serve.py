@@ -0,0 +1,470 @@
+"""
+本地常驻服务
+启动时导入一次 pandas / openpyxl，已解析的工作簿保存在内存 LRU 中，
+内部工具通过 HTTP（仅监听本机）调用清洗、分组汇总、异常报告、关联与拆分，
+同一文件的重复请求无需重新解析；报表结果另存入结果缓存，相同文件内容与参数的请求直接返回。
+只接受 Content-Type 为 application/json、Host 为本机且没有外部 Origin 的请求，
+浏览器中的网页无法通过跨站请求或 DNS 重绑定调用；结果只能写到输出根目录之下
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from abnormal_report import abnormal_report_df, sequence_conditions
+from clean_attendance import clean_attendance_df
+from excel_loader import DEFAULT_ENGINE, ENGINES, load_excel, parse_sheet_arg
+from join_excel import Dimension, join_df, load_join_index, star_join_df
+from lazy_imports import pd
+from result_cache import ResultCache
+from split_excel import split_df
+from summary_by_group import summary_by_group_df
+from writers import write_frame
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 工作簿内存缓存的默认上限
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+# 响应中默认返回的最大行数（完整结果可通过 output 写出到文件）
+DEFAULT_LIMIT = 1000
+
+# 允许的 Host / Origin 主机名（另加服务监听的地址）
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+# 可调用的接口
+ENDPOINTS = ["clean_attendance", "summary_by_group", "abnormal_report", "join_excel", "split_excel"]
+
+# 不影响报表结果的请求参数，不参与结果缓存键
+RESULT_IGNORED_PARAMS = {"output", "limit", "engine"}
+
+
+def _frame_bytes(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    return int(value.table.memory_usage(deep=True).sum())
+
+
+class WorkbookCache:
+    """
+    按内存占用限制大小的 LRU 缓存（线程安全）
+    
+    保存已解析的 DataFrame 与 JoinIndex，键中包含文件大小与修改时间，
+    文件变化后旧条目不再命中并随 LRU 淘汰。单个条目超过上限时不缓存
+    """
+    
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: tuple, load):
+        """
+        返回键对应的值，未命中时调用 load() 加载并缓存
+        
+        Returns:
+            (值, 是否命中)
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0], True
+            self.misses += 1
+        
+        # 加载在锁外进行，不阻塞其他文件的请求
+        value = load()
+        size = _frame_bytes(value)
+        with self._lock:
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (value, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.bytes -= evicted
+        return value, False
+    
+    def clear(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self.bytes = 0
+        return count
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _file_key(file_path: str) -> tuple:
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    stat = path.stat()
+    return str(path.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def _sheet(value) -> str | int | list[str | int]:
+    """请求中的工作表参数：整数、名称、名称列表或 "all" """
+    if isinstance(value, int):
+        return value
+    return parse_sheet_arg(value if isinstance(value, list) else [str(value)])
+
+
+def _require(params: dict, key: str):
+    if key not in params:
+        raise ValueError(f"缺少参数 '{key}'")
+    return params[key]
+
+
+def _hostname(value: str) -> str:
+    """Host 头或 Origin 中的主机名（去掉端口与 IPv6 的方括号）"""
+    return (urlsplit(value if "//" in value else f"//{value}").hostname or "").lower()
+
+
+def _resolve_output(root: Path, value) -> str:
+    """
+    将请求中的输出路径解析到输出根目录之下
+    
+    只接受相对路径，不允许 ".."，解析符号链接后仍须位于根目录内
+    """
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"输出路径无效: {value!r}")
+    relative = Path(value)
+    if relative.is_absolute() or relative.drive or ".." in relative.parts:
+        raise ValueError(f"输出路径必须是输出根目录下的相对路径，且不能包含 '..': {value}")
+    path = (root / relative).resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"输出路径不在输出根目录之下: {value}")
+    return str(path)
+
+
+def _frame_payload(df: pd.DataFrame, limit: int) -> dict:
+    """DataFrame 的 JSON 表示：列名、总行数与前 limit 行数据"""
+    data = json.loads(df.head(limit).to_json(orient="values", date_format="iso", force_ascii=False))
+    return {"columns": [str(c) for c in df.columns], "rows": len(df), "data": data}
+
+
+class AttendanceService:
+    """
+    接口实现，与 HTTP 无关，便于直接调用与测试
+    
+    请求参数与 pipeline 的阶段配置一致，另外支持:
+        file: 输入文件路径（必需）
+        sheet / header_row / compact / engine: 读取参数（engine 默认使用服务启动时的引擎）
+        output: 将完整结果写出到该文件（输出根目录下的相对路径，split_excel 的 output_dir 同样）
+        limit: 响应中返回的最大行数
+    
+    use_cache 为真时，除解析结果磁盘缓存外，拆分以外的接口结果也存入结果缓存（见 result_cache），
+    键为输入文件、右表等各文件的内容哈希与请求参数
+    """
+    
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        use_cache: bool = True,
+        engine: str = DEFAULT_ENGINE,
+        output_root: str | None = None,
+    ):
+        self.cache = WorkbookCache(max_bytes)
+        self.results = ResultCache() if use_cache else None
+        self.use_cache = use_cache
+        self.engine = engine
+        self.output_root = Path(output_root or os.getcwd()).resolve()
+    
+    def load(self, params: dict) -> tuple[pd.DataFrame, bool]:
+        """读取请求的工作簿（优先使用内存缓存），返回 (DataFrame, 是否命中)"""
+        file_path = _require(params, "file")
+        sheet = _sheet(params.get("sheet", 0))
+        header_row = params.get("header_row")
+        compact = bool(params.get("compact", False))
+        engine = params.get("engine", self.engine)
+        # 两种引擎的结果相同，缓存键不包含引擎
+        key = ("frame", *_file_key(file_path), json.dumps(sheet), header_row, compact)
+        
+        def load():
+            df, _ = load_excel(
+                file_path,
+                header_row=header_row,
+                sheet_name=sheet,
+                use_cache=self.use_cache,
+                compact=compact,
+                engine=engine,
+            )
+            return df
+        
+        return self.cache.get(key, load)
+    
+    def join_index(self, params: dict):
+        """读取右表并构建关联索引（优先使用内存缓存），params 为 join 参数或一个维度表配置"""
+        right_file = _require(params, "right_file")
+        on = _require(params, "on")
+        header_row = params.get("right_header_row")
+        sheet = params.get("right_sheet", 0)
+        key = ("join", *_file_key(right_file), sheet, header_row, on)
+        index, _ = self.cache.get(
+            key,
+            lambda: load_join_index(
+                right_file,
+                on,
+                header_row=header_row,
+                sheet_name=sheet,
+                use_cache=self.use_cache,
+                engine=params.get("engine", self.engine),
+            ),
+        )
+        return index
+    
+    def report(self, endpoint: str, df: pd.DataFrame, params: dict) -> tuple[pd.DataFrame, dict]:
+        """
+        计算拆分以外接口的结果
+        
+        Returns:
+            (结果, 附加到响应中的信息)
+        """
+        extra = {}
+        if endpoint == "clean_attendance":
+            result = clean_attendance_df(df, params.get("rules"))
+        elif endpoint == "summary_by_group":
+            result = summary_by_group_df(df, _require(params, "group_by"), params.get("columns"))
+        elif endpoint == "abnormal_report":
+            conditions = sequence_conditions(params.get("streak_days"), params.get("late_window"))
+            results, result = abnormal_report_df(df, params.get("types"), conditions)
+            extra["counts"] = {name: len(frame) for name, frame in results.items()}
+        elif endpoint == "join_excel" and "dimensions" in params:
+            # 多个维度表：各维度的索引分别缓存，一次关联
+            dimensions = []
+            for spec in params["dimensions"]:
+                index = self.join_index({"engine": params.get("engine", self.engine), **spec})
+                name = spec.get("name") or Path(spec["right_file"]).stem
+                dimensions.append(Dimension(index, spec.get("columns"), name))
+            result, extra["join_stats"] = star_join_df(df, dimensions, how=params.get("how", "left"))
+        else:
+            index = self.join_index(params)
+            result = join_df(
+                df,
+                index,
+                index.on,
+                right_columns=params.get("columns"),
+                how=params.get("how", "left"),
+            )
+        return result, extra
+    
+    def handle(self, endpoint: str, params: dict) -> dict:
+        """
+        执行一个接口
+        
+        Returns:
+            响应字典，包含结果、是否命中工作簿缓存（cached）、是否命中结果缓存（result_cached）
+            与耗时（elapsed_ms）
+        """
+        if endpoint not in ENDPOINTS:
+            raise KeyError(f"未知的接口 '{endpoint}'。可用接口: {ENDPOINTS}")
+        
+        start = time.perf_counter()
+        limit = int(params.get("limit", DEFAULT_LIMIT))
+        response = {}
+        cached = False
+        
+        def compute():
+            nonlocal cached
+            df, cached = self.load(params)
+            return self.report(endpoint, df, params)
+        
+        if endpoint == "split_excel":
+            # 拆分的结果是写出的文件，不使用结果缓存
+            df, cached = self.load(params)
+            result = None
+            response["files"] = split_df(
+                df,
+                _require(params, "column"),
+                _resolve_output(self.output_root, _require(params, "output_dir")),
+                file_format=params.get("format", "xlsx"),
+                jobs=params.get("jobs", 1),
+            )
+        else:
+            if self.results is None:
+                (result, extra), hit = compute(), False
+            else:
+                key_params = {k: v for k, v in params.items() if k not in RESULT_IGNORED_PARAMS}
+                (result, extra), hit = self.results.fetch(f"serve.{endpoint}", key_params, compute)
+            response.update(extra)
+            response["result_cached"] = hit
+        
+        if result is not None:
+            output = params.get("output")
+            if output:
+                output = _resolve_output(self.output_root, output)
+                Path(output).parent.mkdir(parents=True, exist_ok=True)
+                write_frame(result, output)
+                response["output"] = output
+            response.update(_frame_payload(result, limit))
+        
+        response["cached"] = cached
+        response["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: AttendanceService = None
+    allowed_hosts: set[str] = LOCAL_HOSTS
+    
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _forbidden(self, require_json: bool) -> tuple[int, str] | None:
+        """
+        检查请求来源，不允许时返回 (状态码, 原因)
+        
+        Host 不是本机（DNS 重绑定）或带有外部 Origin（浏览器跨站请求）时拒绝；
+        POST 必须声明 application/json，浏览器无需预检的简单请求无法满足
+        """
+        if _hostname(self.headers.get("Host", "")) not in self.allowed_hosts:
+            return 403, f"不允许的 Host: {self.headers.get('Host')}"
+        origin = self.headers.get("Origin")
+        if origin is not None and _hostname(origin) not in self.allowed_hosts:
+            return 403, f"不允许的 Origin: {origin}"
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if require_json and content_type != "application/json":
+            return 415, "Content-Type 必须为 application/json"
+        return None
+    
+    def do_GET(self):
+        denied = self._forbidden(require_json=False)
+        if denied:
+            self._send(denied[0], {"error": denied[1]})
+        elif self.path == "/health":
+            results = self.service.results
+            self._send(200, {
+                "status": "ok",
+                "endpoints": ENDPOINTS,
+                "cache": self.service.cache.stats(),
+                "results": results.stats() if results is not None else None,
+            })
+        else:
+            self._send(404, {"error": f"未知的路径 {self.path}"})
+    
+    def do_POST(self):
+        endpoint = self.path.strip("/")
+        denied = self._forbidden(require_json=True)
+        if denied:
+            self._send(denied[0], {"error": denied[1]})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if endpoint == "cache/clear":
+                self._send(200, {"cleared": self.service.cache.clear()})
+                return
+            self._send(200, self.service.handle(endpoint, params))
+        except KeyError as e:
+            self._send(404, {"error": str(e.args[0]) if e.args else str(e)})
+        except (ValueError, FileNotFoundError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+
+def create_server(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    use_cache: bool = True,
+    engine: str = DEFAULT_ENGINE,
+    output_root: str | None = None,
+) -> ThreadingHTTPServer:
+    """
+    创建服务（未启动），port 为 0 时由系统分配端口
+    
+    Args:
+        host: 监听地址，默认只监听本机
+        port: 端口
+        max_bytes: 工作簿内存缓存上限（字节）
+        use_cache: 内存未命中时是否使用解析结果磁盘缓存，以及是否使用报表结果缓存
+        engine: 请求未指定 engine 时使用的 .xlsx 读取引擎
+        output_root: 请求中 output / output_dir 的根目录，默认为当前目录
+    """
+    service = AttendanceService(max_bytes, use_cache, engine, output_root)
+    # 除本机名称外，也接受以监听地址访问（如 --host 指定的其他本机地址）
+    allowed = LOCAL_HOSTS | {host.lower()}
+    handler = type("Handler", (_Handler,), {"service": service, "allowed_hosts": allowed})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动本地考勤处理服务（HTTP，常驻内存缓存已解析的工作簿）")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址，默认 {DEFAULT_HOST}（只接受本机请求）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"端口，默认 {DEFAULT_PORT}")
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        default=DEFAULT_MAX_BYTES // 1024 ** 2,
+        help=f"工作簿内存缓存上限（MB），默认 {DEFAULT_MAX_BYTES // 1024 ** 2}",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果磁盘缓存与报表结果缓存")
+    parser.add_argument(
+        "--output-root",
+        help="请求中 output / output_dir 的根目录（只接受其下的相对路径），默认为当前目录",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    
+    args = parser.parse_args()
+    
+    try:
+        server = create_server(
+            args.host,
+            args.port,
+            args.max_memory * 1024 ** 2,
+            not args.no_cache,
+            args.engine,
+            args.output_root,
+        )
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    host, port = server.server_address[:2]
+    print(f"服务已启动: http://{host}:{port}（接口: {', '.join(ENDPOINTS)}）")
+    print(f"输出根目录: {server.RequestHandlerClass.service.output_root}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,114 @@
 按指定列拆分 Excel 文件，每个唯一值生成一个单独的文件
 """
 
+from __future__ import annotations
+
 import argparse
+import json
 import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 from pathlib import Path
 
-import pandas as pd
+from excel_loader import DEFAULT_ENGINE, ENGINES, load_excel, parse_sheet_arg
+from lazy_imports import np, pd
+from profiling import TRANSFORM, WRITE, add_profile_arguments, profile_run, span
+from writers import write_frame
+
+
+# 拆分清单文件名，记录每个文件的行数
+MANIFEST_NAME = "_manifest.json"
+
+
+def partition_rows(series: pd.Series) -> list[tuple[object, np.ndarray]]:
+    """
+    一次排序完成分组：返回每个唯一值（按首次出现顺序）及其行号数组
+    
+    Args:
+        series: 用于拆分的列，缺失值不参与分组
+    
+    Returns:
+        [(值, 行号数组), ...]
+    """
+    codes, uniques = pd.factorize(series)
+    present = np.flatnonzero(codes >= 0)
+    order = present[np.argsort(codes[present], kind="stable")]
+    counts = np.bincount(codes[present], minlength=len(uniques))
+    return list(zip(uniques, np.split(order, np.cumsum(counts)[:-1])))
+
 
-from detect_header import detect_header_row
+def _write_part(subset: pd.DataFrame, output_file: str) -> int:
+    """写出单个拆分文件（在工作进程中执行）"""
+    write_frame(subset, output_file)
+    return len(subset)
+
+
+def split_df(
+    df: pd.DataFrame,
+    column: str,
+    output_dir: str,
+    file_format: str = "xlsx",
+    jobs: int = 1,
+) -> dict[str, int]:
+    """
+    按指定列拆分已读取的数据，每个唯一值导出为一个文件
+    
+    Args:
+        df: 数据
+        column: 用于拆分的列名
+        output_dir: 输出目录
+        file_format: 输出文件格式（xlsx / csv / parquet），默认 xlsx
+        jobs: 并行写出文件的进程数，默认 1（串行）
+    
+    Returns:
+        字典，key 为拆分值，value 为该文件的行数
+    """
+    if column not in df.columns:
+        raise ValueError(f"列名 '{column}' 不存在。可用列名: {list(df.columns)}")
+    
+    out_path = Path(output_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+    
+    # 一次分组得到各值的行号，按行号取出子集
+    parts = []
+    with span(TRANSFORM, rows=len(df), step="partition"):
+        for value, rows in partition_rows(df[column]):
+            # 清理文件名中的非法字符
+            safe_name = str(value).replace("/", "_").replace("\\", "_").replace(":", "_")
+            output_file = out_path / f"{safe_name}.{file_format}"
+            parts.append((value, rows, output_file))
+    
+    def report(value, output_file, rows):
+        print(f"导出 [{value}]: {rows} 行 -> {output_file}")
+    
+    if jobs <= 1:
+        for value, rows, output_file in parts:
+            report(value, output_file, _write_part(df.take(rows), str(output_file)))
+    else:
+        # 限制同时提交的任务数，避免所有子集同时序列化占用内存；
+        # 工作进程中的写出不在本进程的剖析范围内，整体记录为一个区间
+        with span(WRITE, rows=len(df), jobs=jobs), ProcessPoolExecutor(max_workers=jobs) as executor:
+            pending = {}
+            for value, rows, output_file in parts:
+                if len(pending) >= jobs * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report(*pending.pop(future), future.result())
+                future = executor.submit(_write_part, df.take(rows), str(output_file))
+                pending[future] = (value, output_file)
+            for future in as_completed(pending):
+                report(*pending[future], future.result())
+    
+    result = {str(value): len(rows) for value, rows, _ in parts}
+    manifest = [
+        {"value": str(value), "file": output_file.name, "rows": len(rows)}
+        for value, rows, output_file in parts
+    ]
+    (out_path / MANIFEST_NAME).write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    
+    print(f"\n共拆分为 {len(result)} 个文件，保存在: {out_path}")
+    return result
 
 
 def split_excel(
@@ -17,7 +118,11 @@ def split_excel(
     header_row: int | None = None,
     output_dir: str | None = None,
     auto_detect_header: bool = True,
-    sheet_name: str | int = 0,
+    sheet_name: str | int | list[str | int] = 0,
+    use_cache: bool = False,
+    file_format: str = "xlsx",
+    jobs: int = 1,
+    engine: str = DEFAULT_ENGINE,
 ) -> dict[str, int]:
     """
     按指定列拆分 Excel 文件
@@ -28,7 +133,11 @@ def split_excel(
         header_row: 表头所在行，为 None 时自动检测
         output_dir: 输出目录，为 None 时使用源文件所在目录
         auto_detect_header: 是否自动检测表头行
-        sheet_name: 工作表名称或索引，默认第一个 sheet
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时并行读取多个工作表并拼接
+        use_cache: 是否使用解析结果磁盘缓存
+        file_format: 输出文件格式（xlsx / csv / parquet），默认 xlsx
+        jobs: 并行写出文件的进程数，默认 1（串行）
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
     
     Returns:
         字典，key 为拆分值，value 为该文件的行数
@@ -37,40 +146,24 @@ def split_excel(
     if not path.exists():
         raise FileNotFoundError(f"文件不存在: {file_path}")
     
-    # 自动检测表头行
-    if header_row is None and auto_detect_header:
-        header_row = detect_header_row(file_path, sheet_name=sheet_name)
-        print(f"自动检测表头行: {header_row}")
-    elif header_row is None:
+    # 读取数据，未指定表头行时在同一次解析中自动检测
+    if header_row is None and not auto_detect_header:
         header_row = 0
-    
-    df = pd.read_excel(file_path, header=header_row, sheet_name=sheet_name)
-    
-    if column not in df.columns:
-        raise ValueError(f"列名 '{column}' 不存在。可用列名: {list(df.columns)}")
+    df, detected_row = load_excel(
+        file_path,
+        header_row=header_row,
+        sheet_name=sheet_name,
+        use_cache=use_cache,
+        engine=engine,
+    )
+    if header_row is None:
+        print(f"自动检测表头行: {detected_row}")
     
     # 确定输出目录
     if output_dir is None:
-        out_path = path.parent / f"{path.stem}_split"
-    else:
-        out_path = Path(output_dir)
-    out_path.mkdir(parents=True, exist_ok=True)
-    
-    # 按列值分组并导出
-    result = {}
-    unique_values = df[column].dropna().unique()
-    
-    for value in unique_values:
-        subset = df[df[column] == value]
-        # 清理文件名中的非法字符
-        safe_name = str(value).replace("/", "_").replace("\\", "_").replace(":", "_")
-        output_file = out_path / f"{safe_name}.xlsx"
-        subset.to_excel(output_file, index=False)
-        result[str(value)] = len(subset)
-        print(f"导出 [{value}]: {len(subset)} 行 -> {output_file}")
+        output_dir = path.parent / f"{path.stem}_split"
     
-    print(f"\n共拆分为 {len(result)} 个文件，保存在: {out_path}")
-    return result
+    return split_df(df, column, str(output_dir), file_format=file_format, jobs=jobs)
 
 
 def main():
@@ -78,20 +171,45 @@ def main():
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("-c", "--column", required=True, help="用于拆分的列名")
     parser.add_argument("--header-row", type=int, help="表头所在行（不指定则自动检测）")
-    parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    parser.add_argument(
+        "-s", "--sheet",
+        nargs="+",
+        default=["0"],
+        help="工作表名称或索引（可多个，all 为全部工作表，并行读取后拼接），默认 0",
+    )
     parser.add_argument("-o", "--output-dir", help="输出目录")
+    parser.add_argument(
+        "--format",
+        default="xlsx",
+        choices=["xlsx", "csv", "parquet"],
+        help="输出文件格式，默认 xlsx",
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="并行写出文件的进程数，默认 1")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
-    sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
+    sheet = parse_sheet_arg(args.sheet)
     
     try:
-        split_excel(
-            args.file,
-            args.column,
-            header_row=args.header_row,
-            output_dir=args.output_dir,
-            sheet_name=sheet,
-        )
+        with profile_run(args.profile_output, "split_excel", args.profile_format):
+            split_excel(
+                args.file,
+                args.column,
+                header_row=args.header_row,
+                output_dir=args.output_dir,
+                sheet_name=sheet,
+                use_cache=not args.no_cache,
+                file_format=args.format,
+                jobs=args.jobs,
+                engine=args.engine,
+            )
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
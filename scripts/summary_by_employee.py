@@ -2,13 +2,17 @@
 按工号汇总考勤统计
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
-
-from detect_header import detect_header_row
+from excel_loader import DEFAULT_ENGINE, ENGINES, load_excel, parse_sheet_arg
+from lazy_imports import np, pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from summary_store import ingest_file, open_store, save_store
+from writers import write_frame
 
 # 默认汇总字段配置
 DEFAULT_SUM_COLUMNS = [
@@ -26,47 +30,26 @@ DEFAULT_SUM_COLUMNS = [
 INFO_COLUMNS = ["部门", "人员类型", "员工状态"]
 
 
-def summary_by_employee(
-    file_path: str,
-    header_row: int | None = None,
+def summary_by_employee_df(
+    df: pd.DataFrame,
     sum_columns: list[str] | None = None,
-    output_path: str | None = None,
-    auto_detect_header: bool = True,
-    sheet_name: str | int = 0,
 ) -> pd.DataFrame:
     """
-    按工号汇总考勤统计
+    在已读取的考勤数据上按工号汇总
     
     Args:
-        file_path: Excel 文件路径
-        header_row: 表头所在行，为 None 时自动检测
+        df: 考勤数据
         sum_columns: 要汇总的列名列表，为 None 时使用默认配置
-        output_path: 输出文件路径，为 None 时不保存
-        auto_detect_header: 是否自动检测表头行
-        sheet_name: 工作表名称或索引，默认第一个 sheet
     
     Returns:
         汇总后的 DataFrame
     """
-    path = Path(file_path)
-    if not path.exists():
-        raise FileNotFoundError(f"文件不存在: {file_path}")
-    
-    # 自动检测表头行
-    if header_row is None and auto_detect_header:
-        header_row = detect_header_row(file_path, sheet_name=sheet_name)
-        print(f"自动检测表头行: {header_row}")
-    elif header_row is None:
-        header_row = 0
-    
-    df = pd.read_excel(file_path, header=header_row, sheet_name=sheet_name)
+    if sum_columns is None:
+        sum_columns = DEFAULT_SUM_COLUMNS
     
     if "工号" not in df.columns:
         raise ValueError("数据中缺少'工号'列")
     
-    if sum_columns is None:
-        sum_columns = DEFAULT_SUM_COLUMNS
-    
     # 过滤出存在的汇总列
     existing_sum_cols = [c for c in sum_columns if c in df.columns]
     missing_cols = [c for c in sum_columns if c not in df.columns]
@@ -84,7 +67,7 @@ def summary_by_employee(
         agg_dict[col] = "first"
     
     # 按工号分组汇总
-    result = df.groupby("工号", as_index=False).agg(agg_dict)
+    result = df.groupby("工号", as_index=False, observed=True).agg(agg_dict)
     
     # 调整列顺序：工号 + 信息列 + 汇总列
     col_order = ["工号"] + existing_info_cols + existing_sum_cols
@@ -93,8 +76,158 @@ def summary_by_employee(
     print(f"共汇总 {len(result)} 名员工")
     print(f"汇总字段: {existing_sum_cols}")
     
+    return result
+
+
+class EmployeeSummary:
+    """
+    分块累加的按工号汇总
+    
+    保存每个工号的部分和与基础信息（取第一条非空记录的值），
+    合并后的结果与对整表调用 summary_by_employee_df 一致。
+    状态可通过 summary_store 保存，之后每天只累加新数据
+    
+    用法:
+        summary = EmployeeSummary()
+        for chunk in chunks:
+            summary.update(chunk)
+        result = summary.result()
+    """
+    
+    def __init__(self, sum_columns: list[str] | None = None):
+        self.sum_columns = DEFAULT_SUM_COLUMNS if sum_columns is None else sum_columns
+        self.rows = 0
+        self._sum_cols = None
+        self._info_cols = None
+        self._totals = None
+        # 已累加的文件（内容哈希 -> 路径）
+        self.sources = {}
+    
+    def params(self) -> dict:
+        """汇总参数，用于校验已保存的状态是否与本次调用一致"""
+        return {"sum_columns": list(self.sum_columns)}
+    
+    def _agg(self) -> dict:
+        agg_dict = {col: "sum" for col in self._sum_cols}
+        agg_dict.update({col: "first" for col in self._info_cols})
+        return agg_dict
+    
+    def _complete(self, df: pd.DataFrame) -> pd.DataFrame:
+        """补齐数据块或已有状态中缺少的列：汇总列按 0，基础信息列按缺失值"""
+        missing = {c: 0 for c in self._sum_cols if c not in df.columns}
+        missing.update({c: np.nan for c in self._info_cols if c not in df.columns})
+        return df.assign(**missing) if missing else df
+    
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        累加一个数据块
+        
+        各数据块（如之后累加的文件）的列可以不同：汇总的列取各块中出现过的列的并集，
+        块中缺少的汇总列按 0 累加，缺少的基础信息列取其他记录的值
+        """
+        if "工号" not in df.columns:
+            raise ValueError("数据中缺少'工号'列")
+        sum_cols = [c for c in self.sum_columns if c in df.columns]
+        info_cols = [c for c in INFO_COLUMNS if c in df.columns]
+        if self._sum_cols is None:
+            missing_cols = [c for c in self.sum_columns if c not in df.columns]
+            if missing_cols:
+                print(f"警告: 以下列不存在，已跳过: {missing_cols}")
+            self._sum_cols, self._info_cols = sum_cols, info_cols
+        else:
+            self._sum_cols = [c for c in self.sum_columns if c in self._sum_cols or c in sum_cols]
+            self._info_cols = [c for c in INFO_COLUMNS if c in self._info_cols or c in info_cols]
+        
+        totals = self._complete(df).groupby("工号", observed=True).agg(self._agg())
+        if self._totals is not None:
+            # 已有的状态在前，基础信息保留最早的值
+            totals = (
+                pd.concat([self._complete(self._totals), totals])
+                .groupby(level=0, observed=True)
+                .agg(self._agg())
+            )
+        self._totals = totals
+        self.rows += len(df)
+    
+    def result(self) -> pd.DataFrame:
+        """返回累计的汇总表"""
+        if self._totals is None:
+            raise ValueError("没有可汇总的数据")
+        
+        result = self._totals.reset_index()[["工号"] + self._info_cols + self._sum_cols]
+        
+        print(f"共汇总 {len(result)} 名员工")
+        print(f"汇总字段: {self._sum_cols}")
+        
+        return result
+
+
+def summary_by_employee(
+    file_path: str,
+    header_row: int | None = None,
+    sum_columns: list[str] | None = None,
+    output_path: str | None = None,
+    auto_detect_header: bool = True,
+    sheet_name: str | int | list[str | int] = 0,
+    use_cache: bool = False,
+    compact: bool = False,
+    store_path: str | None = None,
+    engine: str = DEFAULT_ENGINE,
+) -> pd.DataFrame:
+    """
+    按工号汇总考勤统计
+    
+    Args:
+        file_path: Excel 文件路径
+        header_row: 表头所在行，为 None 时自动检测
+        sum_columns: 要汇总的列名列表，为 None 时使用默认配置
+        output_path: 输出文件路径，为 None 时不保存
+        auto_detect_header: 是否自动检测表头行
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时并行读取多个工作表并拼接
+        use_cache: 是否使用解析结果磁盘缓存
+        compact: 是否将列转换为紧凑类型（分类、可空整数，见 column_ops.compact_frame）
+        store_path: 增量汇总状态文件，指定时将本文件的数据累加到已保存的状态中
+            （同一内容的文件只累加一次），返回累计的汇总结果
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
+    
+    Returns:
+        汇总后的 DataFrame
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    
+    if sum_columns is None:
+        sum_columns = DEFAULT_SUM_COLUMNS
+    
+    # 只读取汇总所需的列，未指定表头行时在同一次解析中自动检测
+    if header_row is None and not auto_detect_header:
+        header_row = 0
+    usecols = ["工号"] + INFO_COLUMNS + sum_columns
+    df, detected_row = load_excel(
+        file_path,
+        header_row=header_row,
+        sheet_name=sheet_name,
+        usecols=usecols,
+        use_cache=use_cache,
+        compact=compact,
+        engine=engine,
+    )
+    if header_row is None:
+        print(f"自动检测表头行: {detected_row}")
+    
+    if store_path is not None:
+        summary = open_store(store_path, EmployeeSummary(sum_columns))
+        if ingest_file(summary, file_path, [df]):
+            save_store(summary, store_path)
+            print(f"已累加到: {store_path}（共 {len(summary.sources)} 个文件, {summary.rows} 行）")
+        result = summary.result()
+    else:
+        with span(TRANSFORM, rows=len(df)):
+            result = summary_by_employee_df(df, sum_columns)
+    
     if output_path:
-        result.to_excel(output_path, index=False)
+        write_frame(result, output_path)
         print(f"已保存到: {output_path}")
     
     return result
@@ -104,21 +237,41 @@ def main():
     parser = argparse.ArgumentParser(description="按工号汇总考勤统计")
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("--header-row", type=int, help="表头所在行（不指定则自动检测）")
-    parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    parser.add_argument(
+        "-s", "--sheet",
+        nargs="+",
+        default=["0"],
+        help="工作表名称或索引（可多个，all 为全部工作表，并行读取后拼接），默认 0",
+    )
     parser.add_argument("-c", "--columns", nargs="+", help="要汇总的列名（不指定则使用默认配置）")
     parser.add_argument("-o", "--output", help="输出文件路径")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument("--compact", action="store_true", help="读取后将列转换为紧凑类型（分类、可空整数），减少内存占用")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    parser.add_argument("--append", metavar="STORE", help="将本文件累加到增量汇总状态文件，输出累计结果")
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
-    sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
+    sheet = parse_sheet_arg(args.sheet)
     
     try:
-        summary_by_employee(
-            args.file,
-            header_row=args.header_row,
-            sum_columns=args.columns,
-            output_path=args.output,
-            sheet_name=sheet,
-        )
+        with profile_run(args.profile_output, "summary_by_employee", args.profile_format):
+            summary_by_employee(
+                args.file,
+                header_row=args.header_row,
+                sum_columns=args.columns,
+                output_path=args.output,
+                sheet_name=sheet,
+                use_cache=not args.no_cache,
+                compact=args.compact,
+                store_path=args.append,
+                engine=args.engine,
+            )
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
@@ -1,15 +1,27 @@
 """
 按指定维度分组汇总考勤统计
-支持：个体（工号）、部门、地区、地区-部门等多维度
+支持：个体（工号）、部门、地区、地区-部门等多维度；
+分组集 / 上卷模式一次读取计算多个层级，较粗的层级由最细层级的部分和上卷得到
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
-
-from detect_header import detect_header_row
+from excel_loader import (
+    DEFAULT_ENGINE,
+    ENGINES,
+    load_excel,
+    parse_sheet_arg,
+    read_excel_chunks,
+    read_header_names,
+)
+from lazy_imports import pd
+from profiling import TRANSFORM, add_profile_arguments, profile_run, span
+from summary_store import ingest_file, open_store, save_store
+from writers import write_frame, write_sheets
 
 # 默认汇总字段配置
 DEFAULT_SUM_COLUMNS = [
@@ -23,44 +35,79 @@ DEFAULT_SUM_COLUMNS = [
     "补卡次数",
 ]
 
+# 总计层级（不分组）的名称
+TOTAL_LEVEL = "总计"
 
-def summary_by_group(
-    file_path: str,
+
+def _existing_sum_columns(columns, sum_columns: list[str]) -> list[str]:
+    """过滤出存在的汇总列，缺失的列给出警告"""
+    existing_sum_cols = [c for c in sum_columns if c in columns]
+    missing_sum_cols = [c for c in sum_columns if c not in columns]
+    if missing_sum_cols:
+        print(f"警告: 以下汇总列不存在，已跳过: {missing_sum_cols}")
+    
+    if not existing_sum_cols:
+        raise ValueError("没有可用的汇总列")
+    return existing_sum_cols
+
+
+def _add_per_capita(result: pd.DataFrame, sum_cols: list[str]) -> pd.DataFrame:
+    """计算人均指标"""
+    if "人数" in result.columns:
+        for col in sum_cols:
+            result[f"人均{col}"] = (result[col] / result["人数"]).round(2)
+    return result
+
+
+def level_name(group_by: list[str]) -> str:
+    """层级名称（多维度以 - 连接，用作报表的工作表名），空层级为总计"""
+    return "-".join(group_by) or TOTAL_LEVEL
+
+
+def rollup_levels(group_by: list[str]) -> list[list[str]]:
+    """上卷层级：["地区", "部门"] -> ["地区", "部门"]、["地区"]、[]（总计）"""
+    return [list(group_by[:n]) for n in range(len(group_by), -1, -1)]
+
+
+def parse_grouping_sets(values: list[str]) -> list[list[str]]:
+    """
+    解析命令行的分组集参数
+    
+    每项为逗号分隔的列名（如 "地区,部门"），"总计" 表示不分组
+    """
+    levels = []
+    for value in values:
+        level = [] if value == TOTAL_LEVEL else [c.strip() for c in value.split(",") if c.strip()]
+        levels.append(level)
+    return levels
+
+
+def _finest_level(levels: list[list[str]]) -> list[str]:
+    """各层级分组列的并集（按首次出现的顺序），部分和按此粒度累加"""
+    finest = []
+    for level in levels:
+        finest.extend(c for c in level if c not in finest)
+    if not finest:
+        raise ValueError("分组集中至少需要一个分组列")
+    return finest
+
+
+def summary_by_group_df(
+    df: pd.DataFrame,
     group_by: list[str],
-    header_row: int | None = None,
     sum_columns: list[str] | None = None,
-    output_path: str | None = None,
-    auto_detect_header: bool = True,
-    sheet_name: str | int = 0,
 ) -> pd.DataFrame:
     """
-    按指定维度分组汇总考勤统计
+    在已读取的考勤数据上按指定维度分组汇总
     
     Args:
-        file_path: Excel 文件路径
+        df: 考勤数据
         group_by: 分组列名列表（如 ["部门"] 或 ["地区", "部门"]）
-        header_row: 表头所在行，为 None 时自动检测
         sum_columns: 要汇总的列名列表，为 None 时使用默认配置
-        output_path: 输出文件路径，为 None 时不保存
-        auto_detect_header: 是否自动检测表头行
-        sheet_name: 工作表名称或索引，默认第一个 sheet
     
     Returns:
         汇总后的 DataFrame
     """
-    path = Path(file_path)
-    if not path.exists():
-        raise FileNotFoundError(f"文件不存在: {file_path}")
-    
-    # 自动检测表头行
-    if header_row is None and auto_detect_header:
-        header_row = detect_header_row(file_path, sheet_name=sheet_name)
-        print(f"自动检测表头行: {header_row}")
-    elif header_row is None:
-        header_row = 0
-    
-    df = pd.read_excel(file_path, header=header_row, sheet_name=sheet_name)
-    
     # 检查分组列是否存在
     missing_cols = [c for c in group_by if c not in df.columns]
     if missing_cols:
@@ -70,13 +117,7 @@ def summary_by_group(
         sum_columns = DEFAULT_SUM_COLUMNS
     
     # 过滤出存在的汇总列
-    existing_sum_cols = [c for c in sum_columns if c in df.columns]
-    missing_sum_cols = [c for c in sum_columns if c not in df.columns]
-    if missing_sum_cols:
-        print(f"警告: 以下汇总列不存在，已跳过: {missing_sum_cols}")
-    
-    if not existing_sum_cols:
-        raise ValueError("没有可用的汇总列")
+    existing_sum_cols = _existing_sum_columns(df.columns, sum_columns)
     
     # 构建聚合规则
     agg_dict = {col: "sum" for col in existing_sum_cols}
@@ -86,23 +127,280 @@ def summary_by_group(
         agg_dict["工号"] = "nunique"
     
     # 按分组列汇总
-    result = df.groupby(group_by, as_index=False).agg(agg_dict)
+    result = df.groupby(group_by, as_index=False, observed=True).agg(agg_dict)
     
     # 重命名工号列为人数
     if "工号" in result.columns and "工号" not in group_by:
         result = result.rename(columns={"工号": "人数"})
     
     # 计算人均指标
-    if "人数" in result.columns:
-        for col in existing_sum_cols:
-            result[f"人均{col}"] = (result[col] / result["人数"]).round(2)
+    result = _add_per_capita(result, existing_sum_cols)
     
     print(f"分组维度: {group_by}")
     print(f"汇总字段: {existing_sum_cols}")
     print(f"共 {len(result)} 条记录")
     
+    return result
+
+
+def summary_by_grouping_sets_df(
+    df: pd.DataFrame,
+    grouping_sets: list[list[str]],
+    sum_columns: list[str] | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    在已读取的考勤数据上一次计算多个层级的分组汇总
+    
+    只按所有层级分组列的并集分组一次，各层级的汇总由部分和上卷得到，
+    人数由去重后的（分组, 工号）组合计算，结果与对每个层级分别调用 summary_by_group_df 一致
+    
+    Args:
+        df: 考勤数据
+        grouping_sets: 层级列表（如 [["部门"], ["地区"], ["地区", "部门"]]），空列表为总计
+        sum_columns: 要汇总的列名列表，为 None 时使用默认配置
+    
+    Returns:
+        字典，key 为层级名称（见 level_name），value 为该层级的汇总表
+    """
+    summary = GroupSummary(_finest_level(grouping_sets), sum_columns)
+    summary.update(df)
+    return summary.grouping_sets(grouping_sets)
+
+
+class GroupSummary:
+    """
+    分块累加的分组汇总
+    
+    每个数据块只保留各分组的部分和与去重后的（分组, 工号）组合，
+    合并后的结果与对整表调用 summary_by_group_df 一致，
+    内存占用只与分组数和人数有关，与总行数无关。
+    状态可通过 summary_store 保存，之后每天只累加新数据。
+    result() 可指定分组列的子集，由部分和上卷得到较粗层级的汇总，不再扫描原始数据
+    
+    用法:
+        summary = GroupSummary(["地区", "部门"])
+        for chunk in chunks:
+            summary.update(chunk)
+        result = summary.result()
+        by_region = summary.result(["地区"])
+    """
+    
+    def __init__(self, group_by: list[str], sum_columns: list[str] | None = None):
+        self.group_by = list(group_by)
+        self.sum_columns = DEFAULT_SUM_COLUMNS if sum_columns is None else sum_columns
+        self.rows = 0
+        self._sum_cols = None
+        self._count_people = False
+        self._sums = None
+        self._people = None
+        # 已累加的文件（内容哈希 -> 路径）
+        self.sources = {}
+    
+    def params(self) -> dict:
+        """汇总参数，用于校验已保存的状态是否与本次调用一致"""
+        return {"group_by": self.group_by, "sum_columns": list(self.sum_columns)}
+    
+    def _start(self, columns) -> None:
+        missing_cols = [c for c in self.group_by if c not in columns]
+        if missing_cols:
+            raise ValueError(f"分组列不存在: {missing_cols}。可用列名: {list(columns)}")
+        self._sum_cols = _existing_sum_columns(columns, self.sum_columns)
+        self._count_people = "工号" in columns and "工号" not in self.group_by
+    
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        累加一个数据块
+        
+        各数据块（如之后累加的文件）的汇总列可以不同：汇总的列取各块中出现过的列的并集，
+        块中缺少的汇总列按 0 累加
+        """
+        if self._sum_cols is None:
+            self._start(df.columns)
+        else:
+            self._sum_cols = [c for c in self.sum_columns if c in self._sum_cols or c in df.columns]
+        missing = {c: 0 for c in self._sum_cols if c not in df.columns}
+        
+        # 分组列的缺失值保留为单独的分组，上卷到不含该列的层级时仍然计入，输出时才去除
+        levels = list(range(len(self.group_by)))
+        sums = df.assign(**missing).groupby(self.group_by, observed=True, dropna=False)[self._sum_cols].sum()
+        if self._sums is not None:
+            previous = self._sums.reindex(columns=self._sum_cols, fill_value=0)
+            sums = pd.concat([previous, sums]).groupby(level=levels, observed=True, dropna=False).sum()
+        self._sums = sums
+        
+        if self._count_people:
+            people = df[self.group_by + ["工号"]].dropna(subset=["工号"]).drop_duplicates()
+            if self._people is not None:
+                people = pd.concat([self._people, people], ignore_index=True).drop_duplicates()
+            self._people = people
+        self.rows += len(df)
+    
+    def result(self, group_by: list[str] | None = None) -> pd.DataFrame:
+        """
+        合并各数据块的部分结果，返回汇总表
+        
+        Args:
+            group_by: 汇总层级，为分组列的子集，默认为全部分组列；空列表为总计（一行）
+        """
+        if self._sums is None:
+            raise ValueError("没有可汇总的数据")
+        group_by = self.group_by if group_by is None else list(group_by)
+        unknown = [c for c in group_by if c not in self.group_by]
+        if unknown:
+            raise ValueError(f"汇总层级 {unknown} 不在分组列 {self.group_by} 中")
+        
+        # 按层级重新分组时去除该层级分组列为缺失值的部分和，与 summary_by_group_df 一致
+        if group_by:
+            result = self._sums.groupby(level=group_by, observed=True).sum()
+        else:
+            result = self._sums.agg(["sum"])
+        if self._count_people:
+            # 同一工号可能出现在多个细粒度分组中，按层级重新去重计数，人数与人均指标不会重复计算
+            if group_by:
+                counts = self._people.groupby(group_by, observed=True)["工号"].nunique()
+                result = result.assign(人数=counts.reindex(result.index, fill_value=0))
+            else:
+                result = result.assign(人数=self._people["工号"].nunique())
+        result = _add_per_capita(result.reset_index(drop=not group_by), self._sum_cols)
+        
+        print(f"分组维度: {group_by or TOTAL_LEVEL}")
+        print(f"汇总字段: {self._sum_cols}")
+        print(f"共 {len(result)} 条记录")
+        
+        return result
+    
+    def grouping_sets(self, levels: list[list[str]]) -> dict[str, pd.DataFrame]:
+        """返回多个层级的汇总表，key 为层级名称（见 level_name）"""
+        return {level_name(level): self.result(level) for level in levels}
+
+
+def summary_by_group(
+    file_path: str,
+    group_by: list[str] | None,
+    header_row: int | None = None,
+    sum_columns: list[str] | None = None,
+    output_path: str | None = None,
+    auto_detect_header: bool = True,
+    sheet_name: str | int | list[str | int] = 0,
+    use_cache: bool = False,
+    compact: bool = False,
+    chunksize: int | None = None,
+    store_path: str | None = None,
+    engine: str = DEFAULT_ENGINE,
+    grouping_sets: list[list[str]] | None = None,
+    rollup: bool = False,
+) -> pd.DataFrame | dict[str, pd.DataFrame]:
+    """
+    按指定维度分组汇总考勤统计
+    
+    Args:
+        file_path: Excel 文件路径
+        group_by: 分组列名列表（如 ["部门"] 或 ["地区", "部门"]），指定 grouping_sets 时可为 None
+        header_row: 表头所在行，为 None 时自动检测
+        sum_columns: 要汇总的列名列表，为 None 时使用默认配置
+        output_path: 输出文件路径，为 None 时不保存
+        auto_detect_header: 是否自动检测表头行
+        sheet_name: 工作表名称或索引，默认第一个 sheet；列表或 "all" 时并行读取多个工作表并拼接
+        use_cache: 是否使用解析结果磁盘缓存
+        compact: 是否将列转换为紧凑类型（分类、可空整数，见 column_ops.compact_frame）
+        chunksize: 分块读取的行数，指定时逐块累加部分和（不使用缓存），
+            内存占用与文件大小无关
+        store_path: 增量汇总状态文件，指定时将本文件的数据累加到已保存的状态中
+            （同一内容的文件只累加一次），返回累计的汇总结果
+        engine: .xlsx 读取引擎（"openpyxl" 或 "xml"，见 excel_loader.ENGINES）
+        grouping_sets: 分组集（如 [["部门"], ["地区"], ["地区", "部门"], ["考勤组"]]，空列表为总计），
+            一次读取计算所有层级，各层级由最细层级的部分和上卷得到
+        rollup: 是否按 group_by 逐级上卷（如地区-部门、地区、总计），与 grouping_sets 二选一
+    
+    Returns:
+        汇总后的 DataFrame；指定 grouping_sets 或 rollup 时返回 {层级名称: DataFrame}，
+        输出为每个层级一个工作表的报表
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    
+    if sum_columns is None:
+        sum_columns = DEFAULT_SUM_COLUMNS
+    
+    levels = None
+    if rollup and grouping_sets is not None:
+        raise ValueError("rollup 与 grouping_sets 只能指定一个")
+    if rollup:
+        if not group_by:
+            raise ValueError("上卷需要指定分组列 group_by")
+        levels = rollup_levels(group_by)
+    elif grouping_sets is not None:
+        levels = [list(level) for level in grouping_sets]
+    elif not group_by:
+        raise ValueError("需要指定分组列 group_by 或分组集 grouping_sets")
+    # 多个层级时按所有分组列的并集累加部分和
+    if levels is not None:
+        group_by = _finest_level(levels)
+    
+    # 只读取分组与汇总所需的列，未指定表头行时在同一次解析中自动检测
+    if header_row is None and not auto_detect_header:
+        header_row = 0
+    usecols = group_by + sum_columns + ["工号"]
+    if chunksize is not None:
+        chunks, detected_row = read_excel_chunks(
+            file_path,
+            header_row=header_row,
+            sheet_name=sheet_name,
+            usecols=usecols,
+            chunksize=chunksize,
+            engine=engine,
+        )
+        columns = read_header_names(
+            file_path, header_row=detected_row, sheet_name=sheet_name, engine=engine
+        )
+    else:
+        df, detected_row = load_excel(
+            file_path,
+            header_row=header_row,
+            sheet_name=sheet_name,
+            usecols=usecols,
+            use_cache=use_cache,
+            compact=compact,
+            engine=engine,
+        )
+        columns = df.columns
+    if header_row is None:
+        print(f"自动检测表头行: {detected_row}")
+    
+    # 检查分组列是否存在
+    missing_cols = [c for c in group_by if c not in columns]
+    if missing_cols:
+        available = read_header_names(
+            file_path, header_row=detected_row, sheet_name=sheet_name, engine=engine
+        )
+        raise ValueError(f"分组列不存在: {missing_cols}。可用列名: {available}")
+    
+    if store_path is not None:
+        summary = open_store(store_path, GroupSummary(group_by, sum_columns))
+        if ingest_file(summary, file_path, chunks if chunksize is not None else [df]):
+            save_store(summary, store_path)
+            print(f"已累加到: {store_path}（共 {len(summary.sources)} 个文件, {summary.rows} 行）")
+        result = summary.result() if levels is None else summary.grouping_sets(levels)
+    elif chunksize is not None:
+        summary = GroupSummary(group_by, sum_columns)
+        for chunk in chunks:
+            with span(TRANSFORM, rows=len(chunk)):
+                summary.update(chunk)
+        with span(TRANSFORM, step="merge"):
+            result = summary.result() if levels is None else summary.grouping_sets(levels)
+    elif levels is not None:
+        with span(TRANSFORM, rows=len(df), levels=len(levels)):
+            result = summary_by_grouping_sets_df(df, levels, sum_columns)
+    else:
+        with span(TRANSFORM, rows=len(df)):
+            result = summary_by_group_df(df, group_by, sum_columns)
+    
     if output_path:
-        result.to_excel(output_path, index=False)
+        if isinstance(result, dict):
+            write_sheets(result, output_path)
+        else:
+            write_frame(result, output_path)
         print(f"已保存到: {output_path}")
     
     return result
@@ -114,26 +412,61 @@ def main():
     parser.add_argument(
         "-g", "--group-by",
         nargs="+",
-        required=True,
         help="分组列名（可多个，如 -g 部门 或 -g 地区 部门）",
     )
+    parser.add_argument(
+        "--sets",
+        nargs="+",
+        metavar="列[,列]",
+        help=f"分组集：一次读取计算多个层级，每项为逗号分隔的列名（如 --sets 部门 地区 地区,部门 {TOTAL_LEVEL}），"
+        "输出为每个层级一个工作表",
+    )
+    parser.add_argument("--rollup", action="store_true", help="按 -g 的分组列逐级上卷（如 地区-部门、地区、总计）")
     parser.add_argument("--header-row", type=int, help="表头所在行（不指定则自动检测）")
-    parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    parser.add_argument(
+        "-s", "--sheet",
+        nargs="+",
+        default=["0"],
+        help="工作表名称或索引（可多个，all 为全部工作表，并行读取后拼接），默认 0",
+    )
     parser.add_argument("-c", "--columns", nargs="+", help="要汇总的列名（不指定则使用默认配置）")
     parser.add_argument("-o", "--output", help="输出文件路径")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析结果缓存")
+    parser.add_argument("--compact", action="store_true", help="读取后将列转换为紧凑类型（分类、可空整数），减少内存占用")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"xlsx 读取引擎（xml 直接解析压缩包中的 XML，大文件更快），默认 {DEFAULT_ENGINE}",
+    )
+    parser.add_argument("--chunksize", type=int, help="分块读取的行数（用于超大文件，内存占用固定）")
+    parser.add_argument("--append", metavar="STORE", help="将本文件累加到增量汇总状态文件，输出累计结果")
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
-    sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
+    if args.sets and (args.group_by or args.rollup):
+        parser.error("--sets 不能与 -g/--group-by、--rollup 同时使用")
+    if not args.sets and not args.group_by:
+        parser.error("需要指定 -g/--group-by 或 --sets")
+    sheet = parse_sheet_arg(args.sheet)
     
     try:
-        summary_by_group(
-            args.file,
-            group_by=args.group_by,
-            header_row=args.header_row,
-            sum_columns=args.columns,
-            output_path=args.output,
-            sheet_name=sheet,
-        )
+        with profile_run(args.profile_output, "summary_by_group", args.profile_format):
+            summary_by_group(
+                args.file,
+                group_by=args.group_by,
+                header_row=args.header_row,
+                sum_columns=args.columns,
+                output_path=args.output,
+                sheet_name=sheet,
+                use_cache=not args.no_cache,
+                compact=args.compact,
+                chunksize=args.chunksize,
+                store_path=args.append,
+                engine=args.engine,
+                grouping_sets=parse_grouping_sets(args.sets) if args.sets else None,
+                rollup=args.rollup,
+            )
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
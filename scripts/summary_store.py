@@ -0,0 +1,81 @@
+"""
+增量汇总状态的持久化
+保存 GroupSummary / EmployeeSummary 的部分和与去重状态，
+每天只需读取当天的新数据并累加，不必重新读取历史数据
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+from frame_cache import file_fingerprint
+from lazy_imports import pd
+from profiling import TRANSFORM, span
+
+
+def open_store(store_path: str, summary):
+    """
+    读取已保存的汇总状态
+    
+    Args:
+        store_path: 状态文件路径
+        summary: 状态文件不存在时使用的新汇总对象，同时用于校验参数
+    
+    Returns:
+        汇总对象（已保存的状态或传入的新对象）
+    """
+    path = Path(store_path)
+    if not path.exists():
+        return summary
+    
+    stored = pd.read_pickle(path)
+    if type(stored) is not type(summary):
+        raise ValueError(f"状态文件 {store_path} 不是 {type(summary).__name__} 的汇总状态")
+    if stored.params() != summary.params():
+        raise ValueError(
+            f"状态文件 {store_path} 的汇总参数 {stored.params()} 与本次参数 {summary.params()} 不一致"
+        )
+    return stored
+
+
+def save_store(summary, store_path: str) -> None:
+    """
+    保存汇总状态
+    
+    先写同目录下名称唯一的临时文件再替换，中途失败不会损坏已有状态，并发保存同一状态时临时文件互不覆盖
+    """
+    path = Path(store_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False)
+    try:
+        with tmp:
+            pd.to_pickle(summary, tmp)
+        os.replace(tmp.name, path)
+    finally:
+        Path(tmp.name).unlink(missing_ok=True)
+
+
+def ingest_file(summary, file_path: str, chunks) -> bool:
+    """
+    将一个文件的数据累加到汇总状态，同一内容的文件只累加一次
+    
+    Args:
+        summary: 汇总对象（需有 update 方法与 sources 字典）
+        file_path: 数据文件路径，以内容哈希识别是否已累加
+        chunks: 该文件的数据块（DataFrame 的可迭代对象）
+    
+    Returns:
+        是否累加了新数据
+    """
+    digest = file_fingerprint(file_path)["digest"]
+    if digest in summary.sources:
+        print(f"文件已累加过，跳过: {file_path}")
+        return False
+    
+    for chunk in chunks:
+        with span(TRANSFORM, rows=len(chunk)):
+            summary.update(chunk)
+    summary.sources[digest] = str(Path(file_path).resolve())
+    return True
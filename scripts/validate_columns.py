@@ -2,11 +2,14 @@
 校验 Excel 列名是否符合预期模板
 """
 
+from __future__ import annotations
+
 import argparse
 import sys
 from pathlib import Path
 
-import pandas as pd
+from lazy_imports import pd
+from profiling import PARSE, add_profile_arguments, profile_run, span
 
 # 考勤表标准列名模板
 ATTENDANCE_COLUMNS = [
@@ -49,7 +52,8 @@ def validate_columns(
     if required_columns is None:
         required_columns = ATTENDANCE_COLUMNS
     
-    df = pd.read_excel(file_path, header=header_row, nrows=0, sheet_name=sheet_name)
+    with span(PARSE, step="header"):
+        df = pd.read_excel(file_path, header=header_row, nrows=0, sheet_name=sheet_name)
     actual_columns = [str(c).strip() for c in df.columns.tolist()]
     
     required_set = set(required_columns)
@@ -73,32 +77,34 @@ def main():
     parser.add_argument("file", help="Excel 文件路径")
     parser.add_argument("--header-row", type=int, default=0, help="表头所在行，默认 0")
     parser.add_argument("-s", "--sheet", default="0", help="工作表名称或索引，默认 0")
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
     
     try:
-        result = validate_columns(args.file, header_row=args.header_row, sheet_name=sheet)
-        
-        print(f"匹配率: {result['match_rate']:.1%}")
-        print(f"匹配列数: {len(result['matched'])}")
-        
-        if result["missing"]:
-            print(f"\n缺失列 ({len(result['missing'])} 个):")
-            for col in result["missing"]:
-                print(f"  - {col}")
-        
-        if result["extra"]:
-            print(f"\n额外列 ({len(result['extra'])} 个):")
-            for col in result["extra"]:
-                print(f"  + {col}")
-        
-        if result["valid"]:
-            print("\n✓ 校验通过")
-        else:
-            print("\n✗ 校验失败：存在缺失列")
-            sys.exit(1)
+        with profile_run(args.profile_output, "validate_columns", args.profile_format):
+            result = validate_columns(args.file, header_row=args.header_row, sheet_name=sheet)
+            
+            print(f"匹配率: {result['match_rate']:.1%}")
+            print(f"匹配列数: {len(result['matched'])}")
+            
+            if result["missing"]:
+                print(f"\n缺失列 ({len(result['missing'])} 个):")
+                for col in result["missing"]:
+                    print(f"  - {col}")
             
+            if result["extra"]:
+                print(f"\n额外列 ({len(result['extra'])} 个):")
+                for col in result["extra"]:
+                    print(f"  + {col}")
+            
+            if result["valid"]:
+                print("\n✓ 校验通过")
+            else:
+                print("\n✗ 校验失败：存在缺失列")
+                sys.exit(1)
+    
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,284 @@
+"""
+统一的结果写出层
+按输出文件扩展名选择格式：.xlsx 使用恒定内存的流式写入，
+.csv / .parquet 供程序消费时使用，写入速度更快
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from lazy_imports import np, pd
+from profiling import WRITE, span
+
+# 支持的输出格式（按扩展名）
+SUPPORTED_FORMATS = {".xlsx": "xlsx", ".csv": "csv", ".parquet": "parquet"}
+
+# xlsx 写出引擎：xlsxwriter（constant_memory 模式）或 openpyxl（write_only 模式）
+XLSX_ENGINES = ["xlsxwriter", "openpyxl"]
+
+# 工作表名称中不允许的字符与最大长度
+_INVALID_SHEET_CHARS = str.maketrans({c: "_" for c in "[]:*?/\\"})
+_MAX_SHEET_NAME = 31
+
+
+def _xlsxwriter_available() -> bool:
+    try:
+        import xlsxwriter  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def output_format(output_path: str) -> str:
+    """根据扩展名确定输出格式"""
+    suffix = Path(output_path).suffix.lower()
+    if suffix not in SUPPORTED_FORMATS:
+        raise ValueError(f"不支持的输出格式: {suffix}。支持: {list(SUPPORTED_FORMATS)}")
+    return SUPPORTED_FORMATS[suffix]
+
+
+def sheet_title(name: str) -> str:
+    """将名称转换为合法的工作表名称（替换非法字符，截断到 31 个字符）"""
+    return str(name).translate(_INVALID_SHEET_CHARS)[:_MAX_SHEET_NAME] or "Sheet1"
+
+
+def _cell_columns(df: pd.DataFrame) -> list[np.ndarray]:
+    """将每列转换为可直接写入单元格的 Python 对象数组，缺失值转为 None"""
+    columns = []
+    for _, series in df.items():
+        values = series.astype(object).to_numpy()
+        missing = pd.isna(values)
+        if missing.any():
+            values = values.copy()
+            values[missing] = None
+        columns.append(values)
+    return columns
+
+
+class FrameWriter:
+    """
+    流式结果写出器，可分多次写入数据块
+    
+    用法:
+        with FrameWriter("cleaned.xlsx") as writer:
+            writer.write(df1)
+            writer.write(df2)
+    
+    xlsx 每行写入后即落盘（xlsxwriter constant_memory / openpyxl write_only），
+    内存占用与总行数无关
+    
+    preamble 为写在表头之前的说明行（如报表标题），用于生成多行表头的报表；
+    xlsx 可调用 add_sheet() 将之后的数据块写入同一工作簿的新工作表
+    """
+    
+    def __init__(
+        self,
+        output_path: str,
+        engine: str | None = None,
+        sheet_name: str = "Sheet1",
+        preamble: list[list] | None = None,
+    ):
+        self.output_path = str(output_path)
+        self.format = output_format(self.output_path)
+        self.sheet_name = sheet_name
+        self.preamble = [list(row) for row in preamble or []]
+        if self.preamble and self.format == "parquet":
+            raise ValueError("Parquet 格式不支持表头之前的说明行")
+        self.rows = 0
+        self._columns = None
+        
+        if engine is None:
+            engine = "xlsxwriter" if _xlsxwriter_available() else "openpyxl"
+        if engine not in XLSX_ENGINES:
+            raise ValueError(f"未知的写出引擎 '{engine}'。可用引擎: {XLSX_ENGINES}")
+        self.engine = engine
+        
+        self._book = None
+        self._sheet = None
+        self._file = None
+        self._parquet = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _open(self, df: pd.DataFrame) -> None:
+        self._columns = list(df.columns)
+        header = [str(c) for c in self._columns]
+        
+        if self.format == "xlsx" and self.engine == "xlsxwriter":
+            import xlsxwriter
+            
+            if self._book is None:
+                self._book = xlsxwriter.Workbook(
+                    self.output_path,
+                    {"constant_memory": True, "default_date_format": "yyyy-mm-dd hh:mm:ss"},
+                )
+            self._sheet = self._book.add_worksheet(self.sheet_name)
+            for row_number, row in enumerate(self.preamble):
+                self._sheet.write_row(row_number, 0, row)
+            self._sheet.write_row(len(self.preamble), 0, header, self._book.add_format({"bold": True}))
+        elif self.format == "xlsx":
+            from openpyxl import Workbook
+            from openpyxl.cell import WriteOnlyCell
+            from openpyxl.styles import Font
+            
+            if self._book is None:
+                self._book = Workbook(write_only=True)
+            self._sheet = self._book.create_sheet(self.sheet_name)
+            for row in self.preamble:
+                self._sheet.append(row)
+            bold = Font(bold=True)
+            cells = []
+            for name in header:
+                cell = WriteOnlyCell(self._sheet, value=name)
+                cell.font = bold
+                cells.append(cell)
+            self._sheet.append(cells)
+        elif self.format == "csv":
+            # utf-8-sig 便于 Excel 直接打开中文 CSV
+            self._file = open(self.output_path, "w", encoding="utf-8-sig", newline="")
+            if self.preamble:
+                pd.DataFrame(self.preamble).to_csv(self._file, index=False, header=False)
+    
+    def write(self, df: pd.DataFrame) -> None:
+        """写入一个数据块，各数据块的列必须一致"""
+        first = self._columns is None
+        if not first and list(df.columns) != self._columns:
+            raise ValueError("写入的数据块列名与首个数据块不一致")
+        
+        with span(WRITE, rows=len(df), format=self.format):
+            if first:
+                self._open(df)
+            if self.format == "parquet":
+                self._write_parquet(df)
+            elif self.format == "csv":
+                df.to_csv(self._file, index=False, header=first)
+            elif self.engine == "xlsxwriter":
+                for offset, row in enumerate(zip(*_cell_columns(df))):
+                    self._sheet.write_row(len(self.preamble) + self.rows + offset + 1, 0, row)
+            else:
+                for row in zip(*_cell_columns(df)):
+                    self._sheet.append(row)
+        self.rows += len(df)
+    
+    def add_sheet(self, sheet_name: str) -> None:
+        """结束当前工作表，之后写入的数据块写到同一工作簿中的新工作表（仅 xlsx）"""
+        if self.format != "xlsx":
+            raise ValueError(f"{self.format} 格式不支持多个工作表")
+        if self._columns is None:
+            # 当前工作表未写入任何数据块时也保留空表
+            self.write(pd.DataFrame())
+        self.sheet_name = sheet_name
+        self.preamble = []
+        self.rows = 0
+        self._columns = None
+    
+    def _write_parquet(self, df: pd.DataFrame) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("写出 Parquet 需要安装 pyarrow") from None
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.output_path, table.schema)
+        self._parquet.write_table(table.cast(self._parquet.schema))
+    
+    def close(self) -> None:
+        """完成写入并关闭文件"""
+        if self._columns is None:
+            # 未写入任何数据块时也生成空文件
+            self.write(pd.DataFrame())
+        if self._book is not None:
+            # xlsx 在关闭时才写出共享字符串与压缩包，耗时单独记录
+            with span(WRITE, format=self.format, step="close"):
+                if self.engine == "xlsxwriter":
+                    self._book.close()
+                else:
+                    self._book.save(self.output_path)
+            self._book = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+
+def write_frame(
+    df: pd.DataFrame,
+    output_path: str,
+    engine: str | None = None,
+) -> None:
+    """
+    写出 DataFrame，格式由扩展名决定（.xlsx / .csv / .parquet）
+    
+    Args:
+        df: 要写出的数据
+        output_path: 输出文件路径
+        engine: xlsx 写出引擎，为 None 时优先使用 xlsxwriter
+    """
+    with span(WRITE, rows=len(df), format=output_format(output_path)):
+        if output_format(output_path) == "parquet":
+            try:
+                df.to_parquet(output_path, index=False)
+            except ImportError:
+                raise ValueError("写出 Parquet 需要安装 pyarrow") from None
+            return
+        
+        with FrameWriter(output_path, engine=engine) as writer:
+            writer.write(df)
+
+
+def write_sheets(
+    frames: dict[str, pd.DataFrame],
+    output_path: str,
+    engine: str | None = None,
+) -> list[str]:
+    """
+    写出多个 DataFrame：xlsx 每个 DataFrame 一个工作表（名称为字典的 key），
+    csv / parquet 不支持多个工作表，每个 DataFrame 写出一个文件（文件名加上 _key 后缀）
+    
+    Args:
+        frames: {工作表名称: DataFrame}
+        output_path: 输出文件路径
+        engine: xlsx 写出引擎，为 None 时优先使用 xlsxwriter
+    
+    Returns:
+        写出的文件路径列表
+    """
+    if not frames:
+        raise ValueError("没有要写出的数据")
+    
+    path = Path(output_path)
+    if output_format(output_path) != "xlsx":
+        outputs = []
+        for name, df in frames.items():
+            output_file = str(path.with_name(f"{path.stem}_{sheet_title(name)}{path.suffix}"))
+            write_frame(df, output_file, engine=engine)
+            outputs.append(output_file)
+        return outputs
+    
+    with span(WRITE, rows=sum(len(df) for df in frames.values()), format="xlsx", sheets=len(frames)):
+        titles = []
+        for name in frames:
+            title = sheet_title(name)
+            # 截断后重名的工作表加序号区分
+            suffix = 2
+            while title in titles:
+                tail = f"_{suffix}"
+                title = sheet_title(name)[:_MAX_SHEET_NAME - len(tail)] + tail
+                suffix += 1
+            titles.append(title)
+        
+        with FrameWriter(output_path, engine=engine, sheet_name=titles[0]) as writer:
+            for index, (title, df) in enumerate(zip(titles, frames.values())):
+                if index:
+                    writer.add_sheet(title)
+                writer.write(df)
+    return [output_path]
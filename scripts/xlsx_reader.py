@@ -0,0 +1,444 @@
+"""
+直接读取 .xlsx 压缩包中的 XML
+工作表 XML 以增量方式解析，只读取需要的前若干行，
+共享字符串只解析到所引用的最大序号为止；
+iter_sheet_values 提供与 openpyxl 只读模式取值一致的整表读取（excel_loader 的 xml 引擎）
+"""
+
+from __future__ import annotations
+
+import datetime
+import posixpath
+import re
+import zipfile
+from collections.abc import Iterator
+from xml.etree import ElementTree
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_SHARED_STRINGS_TYPE = "/sharedStrings"
+_STYLES_TYPE = "/styles"
+
+# 内置数字格式中的日期 / 时间格式（与 openpyxl.styles.numbers.BUILTIN_FORMATS 一致）
+_BUILTIN_DATE_FORMATS = {
+    14: "mm-dd-yy",
+    15: "d-mmm-yy",
+    16: "d-mmm",
+    17: "mmm-yy",
+    18: "h:mm AM/PM",
+    19: "h:mm:ss AM/PM",
+    20: "h:mm",
+    21: "h:mm:ss",
+    22: "m/d/yy h:mm",
+    45: "mm:ss",
+    46: "[h]:mm:ss",
+    47: "mmss.0",
+}
+
+# 判断日期格式时忽略引号内的文本与方括号内的区域 / 颜色设置（[h]、[mm]、[ss] 除外）
+_FORMAT_LITERAL_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+_DATE_TOKEN_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+_TIMEDELTA_RE = re.compile(r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.I)
+
+_WINDOWS_EPOCH = datetime.datetime(1899, 12, 30)
+_MAC_EPOCH = datetime.datetime(1904, 1, 1)
+
+
+def _resolve_target(target: str) -> str:
+    """将 workbook.xml.rels 中的目标路径转换为压缩包内的路径"""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def _relationships(archive: zipfile.ZipFile) -> dict[str, tuple[str, str]]:
+    """返回 workbook 的关系表：Id -> (Type, 压缩包内路径)"""
+    root = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    return {
+        rel.get("Id"): (rel.get("Type", ""), _resolve_target(rel.get("Target", "")))
+        for rel in root.iter(f"{_PKG_REL_NS}Relationship")
+    }
+
+
+def workbook_sheets(archive: zipfile.ZipFile) -> list[tuple[str, str]]:
+    """
+    按顺序返回工作表名称及其 XML 在压缩包内的路径
+    
+    Args:
+        archive: 已打开的 .xlsx 压缩包
+    
+    Returns:
+        [(工作表名称, XML 路径), ...]
+    """
+    root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    relationships = _relationships(archive)
+    sheets = []
+    for sheet in root.iter(f"{_MAIN_NS}sheet"):
+        _, path = relationships.get(sheet.get(f"{_REL_NS}id"), ("", ""))
+        sheets.append((sheet.get("name"), path))
+    return sheets
+
+
+def sheet_path(archive: zipfile.ZipFile, sheet_name: str | int) -> str:
+    """返回工作表（名称或索引）XML 在压缩包内的路径"""
+    sheets = workbook_sheets(archive)
+    if isinstance(sheet_name, int):
+        if not 0 <= sheet_name < len(sheets):
+            raise ValueError(f"工作表索引 {sheet_name} 超出范围（共 {len(sheets)} 个工作表）")
+        return sheets[sheet_name][1]
+    for name, path in sheets:
+        if name == sheet_name:
+            return path
+    raise ValueError(f"工作表 '{sheet_name}' 不存在。可用工作表: {[name for name, _ in sheets]}")
+
+
+def _part_path(archive: zipfile.ZipFile, part_type: str) -> str | None:
+    """workbook 关系表中指定类型部件（共享字符串、样式）的路径，不存在时返回 None"""
+    for rel_type, path in _relationships(archive).values():
+        if rel_type.endswith(part_type):
+            return path
+    return None
+
+
+def _string_item_text(item) -> str:
+    """共享字符串 <si> 的文本（富文本为各段 <r><t> 拼接，不含注音 <rPh>）"""
+    text = item.find(f"{_MAIN_NS}t")
+    if text is not None:
+        return text.text or ""
+    return "".join(t.text or "" for t in item.iterfind(f"{_MAIN_NS}r/{_MAIN_NS}t"))
+
+
+def read_shared_strings(archive: zipfile.ZipFile, count: int | None = None) -> list[str]:
+    """
+    增量解析共享字符串表
+    
+    Args:
+        archive: 已打开的 .xlsx 压缩包
+        count: 只读取前 count 个字符串，为 None 时读取全部
+    
+    Returns:
+        共享字符串列表
+    """
+    path = _part_path(archive, _SHARED_STRINGS_TYPE)
+    if path is None or count == 0:
+        return []
+    
+    strings = []
+    with archive.open(path) as stream:
+        for _, elem in ElementTree.iterparse(stream, events=("end",)):
+            if elem.tag != f"{_MAIN_NS}si":
+                continue
+            strings.append(_string_item_text(elem))
+            elem.clear()
+            if count is not None and len(strings) >= count:
+                break
+    return strings
+
+
+def _column_index(reference: str) -> int:
+    """单元格引用（如 "AB12"）的列序号，从 0 开始"""
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _cell_value(cell):
+    """
+    解析单元格原始值
+    
+    共享字符串返回 (序号,) 元组，由调用方替换为文本
+    """
+    cell_type = cell.get("t", "n")
+    if cell_type == "inlineStr":
+        item = cell.find(f"{_MAIN_NS}is")
+        return _string_item_text(item) if item is not None else None
+    
+    value = cell.findtext(f"{_MAIN_NS}v")
+    if value is None:
+        return None
+    if cell_type == "s":
+        return (int(value),)
+    if cell_type == "b":
+        return value == "1"
+    if cell_type in ("str", "e"):
+        return value
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def iter_sheet_rows(archive: zipfile.ZipFile, path: str) -> Iterator[tuple[int, list]]:
+    """
+    增量解析工作表 XML，逐行返回 (行号, 单元格值列表)
+    
+    行号从 0 开始（缺失的空行不返回），共享字符串为 (序号,) 元组，
+    空单元格为 None。迭代停止时不再解压剩余的 XML
+    """
+    with archive.open(path) as stream:
+        next_row = 0
+        for _, elem in ElementTree.iterparse(stream, events=("end",)):
+            if elem.tag != f"{_MAIN_NS}row":
+                continue
+            row_number = int(elem.get("r", next_row + 1)) - 1
+            values = []
+            for cell in elem.iterfind(f"{_MAIN_NS}c"):
+                reference = cell.get("r")
+                column = _column_index(reference) if reference else len(values)
+                if column > len(values):
+                    values.extend([None] * (column - len(values)))
+                values.append(_cell_value(cell))
+            elem.clear()
+            next_row = row_number + 1
+            yield row_number, values
+
+
+def sniff_rows(
+    file_path: str,
+    max_rows: int = 10,
+    sheet_name: str | int = 0,
+) -> list[list]:
+    """
+    只读取工作表的前 max_rows 行
+    
+    工作表 XML 读到第 max_rows 行即停止，共享字符串只解析到这些行引用的最大序号，
+    耗时与文件大小基本无关
+    
+    Args:
+        file_path: .xlsx 文件路径
+        max_rows: 读取的行数
+        sheet_name: 工作表名称或索引，默认第一个 sheet
+    
+    Returns:
+        行数据列表（空行为空列表），空单元格为 None，日期保持为 Excel 序列号
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        rows = [[] for _ in range(max_rows)]
+        for row_number, values in iter_sheet_rows(archive, sheet_path(archive, sheet_name)):
+            if row_number >= max_rows:
+                break
+            rows[row_number] = values
+        
+        needed = [v[0] for row in rows for v in row if isinstance(v, tuple)]
+        strings = read_shared_strings(archive, max(needed) + 1) if needed else []
+    
+    # 去除末尾空行
+    while rows and not rows[-1]:
+        rows.pop()
+    return [[strings[v[0]] if isinstance(v, tuple) else v for v in row] for row in rows]
+
+
+def _is_date_format(fmt: str | None) -> bool:
+    """数字格式是否为日期 / 时间格式（只看第一段，规则与 openpyxl 相同）"""
+    if fmt is None:
+        return False
+    fmt = _FORMAT_LITERAL_RE.sub("", fmt.split(";")[0])
+    return _DATE_TOKEN_RE.search(fmt) is not None
+
+
+def _is_timedelta_format(fmt: str | None) -> bool:
+    return fmt is not None and _TIMEDELTA_RE.search(fmt.split(";")[0]) is not None
+
+
+def read_date_styles(archive: zipfile.ZipFile) -> tuple[frozenset[int], frozenset[int]]:
+    """
+    解析样式表，返回使用日期格式的单元格样式序号
+    
+    Args:
+        archive: 已打开的 .xlsx 压缩包
+    
+    Returns:
+        (日期 / 时间样式序号, 其中的时长样式序号，如 [h]:mm:ss)
+    """
+    path = _part_path(archive, _STYLES_TYPE)
+    if path is None:
+        return frozenset(), frozenset()
+    
+    root = ElementTree.fromstring(archive.read(path))
+    custom = {
+        int(fmt.get("numFmtId")): fmt.get("formatCode")
+        for fmt in root.iterfind(f"{_MAIN_NS}numFmts/{_MAIN_NS}numFmt")
+    }
+    date_styles = set()
+    timedelta_styles = set()
+    for index, xf in enumerate(root.iterfind(f"{_MAIN_NS}cellXfs/{_MAIN_NS}xf")):
+        format_id = int(xf.get("numFmtId", 0))
+        fmt = custom[format_id] if format_id in custom else _BUILTIN_DATE_FORMATS.get(format_id)
+        if _is_date_format(fmt):
+            date_styles.add(index)
+        if _is_timedelta_format(fmt):
+            timedelta_styles.add(index)
+    return frozenset(date_styles), frozenset(timedelta_styles)
+
+
+def workbook_epoch(archive: zipfile.ZipFile) -> datetime.datetime:
+    """工作簿的日期基准（1900 或 1904 日期系统）"""
+    root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    properties = root.find(f"{_MAIN_NS}workbookPr")
+    if properties is not None and properties.get("date1904", "").lower() in ("1", "true"):
+        return _MAC_EPOCH
+    return _WINDOWS_EPOCH
+
+
+def _from_excel(value: float, epoch: datetime.datetime = _WINDOWS_EPOCH, timedelta: bool = False):
+    """
+    将 Excel 日期序列号转换为 datetime（与 openpyxl.utils.datetime.from_excel 一致）
+    
+    小于 1 的序列号为 time；时长格式返回 timedelta；1900 日期系统中 60 之前的序列号
+    按 Excel 的 1900 闰年错误修正
+    """
+    if timedelta:
+        delta = datetime.timedelta(days=value)
+        if delta.microseconds:
+            delta = datetime.timedelta(
+                seconds=delta.total_seconds() // 1, microseconds=round(delta.microseconds, -3)
+            )
+        return delta
+    
+    day, fraction = divmod(value, 1)
+    diff = datetime.timedelta(milliseconds=round(fraction * 86400 * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        minutes, seconds = divmod(diff.seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return datetime.time(hours, minutes, seconds, diff.microseconds)
+    if 0 < value < 60 and epoch == _WINDOWS_EPOCH:
+        day += 1
+    return epoch + datetime.timedelta(days=day) + diff
+
+
+def _cast_number(text: str) -> int | float:
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def iter_sheet_values(
+    file_path: str,
+    sheet_name: str | int = 0,
+    shared_strings: list | None = None,
+) -> Iterator[list]:
+    """
+    流式读取整个工作表，逐行返回单元格值列表
+    
+    取值与 openpyxl 只读模式（data_only=True, values_only=True）一致：日期样式的数值转换为
+    datetime / time / timedelta，布尔值为 bool，错误值为 "#N/A" 等文本，空单元格为 None，
+    缺失的行返回空列表。
+    
+    共享字符串表只解码一次，所有引用同一序号的单元格共用同一个字符串对象；
+    内联字符串与日期序列号同样按文本去重，重复值不再逐个创建对象。
+    取第一行时才打开压缩包并读取共享字符串与样式（工作表不存在时在此报错），
+    生成器读完、出错或关闭时关闭压缩包；未开始读取就关闭的生成器不会打开文件
+    
+    传入 shared_strings 列表时，返回第一行之前将共享字符串表写入其中，之后每个新出现的内联字符串
+    追加到末尾；读完后其中包含工作表的全部文本，调用方可据此将文本列直接编码为分类
+    （见 excel_loader 的紧凑读取）
+    
+    Args:
+        file_path: .xlsx 文件路径
+        sheet_name: 工作表名称或索引，默认第一个 sheet
+        shared_strings: 接收共享字符串表的列表，为 None 时不返回
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        path = sheet_path(archive, sheet_name)
+        strings = read_shared_strings(archive)
+        if shared_strings is not None:
+            shared_strings[:] = strings
+        date_styles, timedelta_styles = read_date_styles(archive)
+        epoch = workbook_epoch(archive)
+        yield from _iter_values(
+            archive, path, strings, date_styles, timedelta_styles, epoch, shared_strings
+        )
+
+
+def _iter_values(
+    archive: zipfile.ZipFile,
+    path: str,
+    strings: list[str],
+    date_styles: frozenset[int],
+    timedelta_styles: frozenset[int],
+    epoch: datetime.datetime,
+    texts: list | None = None,
+) -> Iterator[list]:
+    """逐行解析工作表 XML（见 iter_sheet_values），新出现的内联字符串追加到 texts"""
+    row_tag = f"{_MAIN_NS}row"
+    cell_tag = f"{_MAIN_NS}c"
+    value_tag = f"{_MAIN_NS}v"
+    inline_tag = f"{_MAIN_NS}is"
+    # 列字母 -> 序号、内联字符串 -> 去重后的对象、(序列号文本, 样式) -> 日期
+    column_indexes = {}
+    interned = {}
+    dates = {}
+    
+    with archive.open(path) as stream:
+        next_row = 0
+        for _, elem in ElementTree.iterparse(stream):
+            if elem.tag != row_tag:
+                continue
+            reference = elem.get("r")
+            row_number = int(reference) - 1 if reference else next_row
+            while next_row < row_number:
+                yield []
+                next_row += 1
+            
+            values = []
+            for cell in elem:
+                if cell.tag != cell_tag:
+                    continue
+                reference = cell.get("r")
+                if reference:
+                    letters = reference.rstrip("0123456789")
+                    column = column_indexes.get(letters)
+                    if column is None:
+                        column = column_indexes[letters] = _column_index(letters)
+                    if column > len(values):
+                        values.extend([None] * (column - len(values)))
+                
+                cell_type = cell.get("t")
+                if cell_type == "inlineStr":
+                    item = cell.find(inline_tag)
+                    value = None
+                    if item is not None:
+                        text = _string_item_text(item)
+                        value = interned.get(text)
+                        if value is None:
+                            value = interned[text] = text
+                            if texts is not None:
+                                texts.append(text)
+                    values.append(value)
+                    continue
+                
+                text = cell.findtext(value_tag)
+                if not text:
+                    value = None
+                elif cell_type is None or cell_type == "n":
+                    style = cell.get("s")
+                    style = int(style) if style else 0
+                    if style in date_styles:
+                        key = (text, style)
+                        value = dates.get(key)
+                        if value is None:
+                            try:
+                                value = _from_excel(
+                                    _cast_number(text), epoch, timedelta=style in timedelta_styles
+                                )
+                            except (OverflowError, ValueError):
+                                value = "#VALUE!"
+                            dates[key] = value
+                    else:
+                        value = _cast_number(text)
+                elif cell_type == "s":
+                    value = strings[int(text)]
+                elif cell_type == "b":
+                    value = bool(int(text))
+                elif cell_type == "d":
+                    value = datetime.datetime.fromisoformat(text.rstrip("Z"))
+                else:
+                    value = text
+                values.append(value)
+            
+            elem.clear()
+            next_row = row_number + 1
+            yield values
@@ -2,7 +2,11 @@
 高级脚本功能测试
 """
 
+import json
 import sys
+import threading
+import urllib.error
+import urllib.request
 from pathlib import Path
 
 import pandas as pd
@@ -10,18 +14,64 @@ import pytest
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
 
-from clean_attendance import clean_attendance
-from summary_by_employee import summary_by_employee
-from summary_by_group import summary_by_group
+import numpy as np
+
+from abnormal_report import (
+    DEFAULT_ABNORMAL_CONDITIONS,
+    abnormal_report_df,
+    classify_abnormal,
+    generate_abnormal_report,
+    sequence_conditions,
+)
+from batch import SOURCE_COLUMN, expand_inputs, run_batch
+from clean_attendance import (
+    build_rule_mask,
+    clean_attendance,
+    clean_attendance_chunked,
+    clean_attendance_df,
+)
+from detect_header import detect_header_row
+from excel_loader import load_excel
+from frame_cache import CACHE_DIR_ENV, FrameCache
+from generate_attendance import generate_attendance, generate_attendance_df, generate_roster_df
+from join_excel import Dimension, JoinIndex, join_df, join_excel, star_join_df, star_join_excel
+from pipeline import load_spec, run_pipeline
+from profiling import PARSE, STAGES, TRANSFORM, Profiler, profile_run, span
+from result_cache import ResultCache
+from sequence_ops import rolling_counts, run_lengths, streak_mask, window_mask
+from serve import WorkbookCache, create_server
+from split_excel import MANIFEST_NAME, partition_rows, split_df
+from summary_by_employee import summary_by_employee, summary_by_employee_df
+from summary_by_group import (
+    TOTAL_LEVEL,
+    GroupSummary,
+    parse_grouping_sets,
+    rollup_levels,
+    summary_by_group,
+    summary_by_group_df,
+    summary_by_grouping_sets_df,
+)
+from validate_columns import ATTENDANCE_COLUMNS, validate_columns
+from writers import XLSX_ENGINES, FrameWriter, write_frame, write_sheets
 
 TEST_FILE = Path(__file__).parent.parent / "examples" / "test01.xlsx"
 
 
-@pytest.fixture
-def test_file():
-    if not TEST_FILE.exists():
-        pytest.skip(f"测试文件不存在: {TEST_FILE}")
-    return str(TEST_FILE)
+@pytest.fixture(scope="session")
+def test_file(tmp_path_factory):
+    if TEST_FILE.exists():
+        return str(TEST_FILE)
+    path = tmp_path_factory.mktemp("data") / TEST_FILE.name
+    generate_attendance(str(path), rows=2000, employees=50)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """解析缓存默认开启，测试中写入临时目录，不污染用户的缓存目录"""
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
 
 
 class TestCleanAttendance:
@@ -44,6 +94,117 @@ class TestCleanAttendance:
         # 应该保留正式员工
         assert "正式" in df["人员类型"].values
 
+    def test_rule_mask_counts_match_sequential_filter(self):
+        """测试合并掩码的剔除统计与逐条规则过滤一致"""
+        df = pd.DataFrame({
+            "星期": ["星期一", "星期六", "星期日", "星期二", "星期六"],
+            "人员类型": ["实习", "实习", "正式", "正式", None],
+        })
+        rules = {"星期": ["星期六", "星期日"], "人员类型": ["实习", "nan"]}
+        keep, stats = build_rule_mask(df, rules)
+        assert stats == {"星期": 3, "人员类型": 1}
+        assert keep.tolist() == [False, False, False, True, False]
+
+    def test_clean_chunked(self, test_file, tmp_path):
+        """测试分块清洗与整表清洗结果一致"""
+        output = tmp_path / "cleaned.csv"
+        stats = clean_attendance_chunked(test_file, output_path=str(output), chunksize=300)
+        df = clean_attendance(test_file)
+        assert stats["kept"] == len(df)
+        assert stats["original"] - stats["kept"] == sum(stats["removed"].values())
+        assert pd.read_csv(output, encoding="utf-8-sig")["工号"].tolist() == df["工号"].tolist()
+
+
+class TestAbnormalReport:
+    """abnormal_report.py 测试"""
+
+    def test_classify_multi_label(self):
+        """测试一条记录可同时属于多个异常类型"""
+        df = pd.DataFrame({
+            "上班 1 打卡结果": ["缺卡", "正常", "正常"],
+            "下班 1 打卡结果": ["正常", "缺卡", "正常"],
+            "迟到次数": [1, "", 0],
+        })
+        matrix = classify_abnormal(df, ["缺卡", "迟到", "旷工"])
+        assert matrix.tolist() == [
+            [True, True, False],
+            [True, False, False],
+            [False, False, False],
+        ]
+
+    def test_streak_skips_rest_days(self):
+        """测试连续旷工按工号、日期排序判断，休息日不打断连续段"""
+        dates = pd.to_datetime(["2024-03-07", "2024-03-08", "2024-03-09", "2024-03-10", "2024-03-11"])
+        df = pd.DataFrame({
+            "工号": ["A"] * 5 + ["B"] * 5,
+            "日期": list(dates) * 2,
+            "班次": ["早班", "早班", "休息", "休息", "早班"] * 2,
+            "旷工天数": [1, 1, 0, 0, 1] + [0, 1, 0, 0, 1],
+        }).sample(frac=1, random_state=0)
+        matrix = classify_abnormal(df, ["连续旷工"])
+        flagged = df[matrix[:, 0]]
+        assert flagged["工号"].tolist() == ["A"] * 3
+        assert sorted(flagged["日期"].dt.day) == [7, 8, 11]
+
+        conditions = sequence_conditions(streak_days=2)
+        matrix = classify_abnormal(df, ["连续旷工"], conditions)
+        assert sorted(df[matrix[:, 0]]["工号"]) == ["A"] * 3 + ["B"] * 2
+        with pytest.raises(ValueError):
+            sequence_conditions(late_window=(5, 6))
+
+    def test_frequent_late_window(self, test_file):
+        """测试频繁迟到与逐个员工循环计算的结果一致"""
+        df, _ = load_excel(test_file)
+        conditions = sequence_conditions(late_window=(5, 2))
+        results, _ = abnormal_report_df(df, ["频繁迟到"], conditions)
+
+        expected = set()
+        rest = (df["班次"] == "休息") | (df["上班 1 打卡结果"] == "无需打卡(休息)")
+        workdays = df[~rest].sort_values(["工号", "日期"])
+        for _, days in workdays.groupby("工号"):
+            late = (pd.to_numeric(days["迟到次数"], errors="coerce") > 0) | (
+                pd.to_numeric(days["严重迟到次数"], errors="coerce") > 0
+            )
+            late = late.tolist()
+            for end in range(len(late)):
+                start = max(0, end - 4)
+                if sum(late[start:end + 1]) >= 2:
+                    expected.update(i for i, hit in zip(days.index[start:end + 1], late[start:end + 1]) if hit)
+        assert expected
+        assert set(results["频繁迟到"].index) == expected
+
+    def test_report_combines_types(self, test_file):
+        """测试合并报告行数等于各类型记录数之和"""
+        df, _ = load_excel(test_file)
+        results, all_abnormal = abnormal_report_df(df)
+        assert len(all_abnormal) == sum(len(v) for v in results.values())
+        assert set(all_abnormal["异常类型"]) == set(results)
+
+    def test_sequence_types_opt_in(self, test_file):
+        """测试序列类型不在默认报告中，指定参数或类型时才加入"""
+        df, _ = load_excel(test_file)
+        results, _ = abnormal_report_df(df)
+        assert set(results) <= set(DEFAULT_ABNORMAL_CONDITIONS)
+
+        results, _ = abnormal_report_df(df, conditions=sequence_conditions(late_window=(5, 2)))
+        assert "频繁迟到" in results
+        assert "连续旷工" not in results
+        # 只用 -t 指定类型时使用默认参数
+        _, explicit = abnormal_report_df(df, ["频繁迟到"])
+        _, configured = abnormal_report_df(df, ["频繁迟到"], sequence_conditions(late_window=(10, 5)))
+        pd.testing.assert_frame_equal(explicit, configured)
+
+    def test_sequence_reports_dropped_rows(self, capsys):
+        """测试日期无法解析的行不参与序列条件，并提示行数"""
+        df = pd.DataFrame({
+            "工号": ["A"] * 4,
+            "日期": ["2024-03-01", "无效日期", "2024-03-02", "2024-03-03"],
+            "旷工天数": [1, 1, 1, 1],
+        })
+        results, _ = abnormal_report_df(df, ["连续旷工"])
+        assert results["连续旷工"].index.tolist() == [0, 2, 3]
+        assert "1 行的工号缺失或日期无法解析" in capsys.readouterr().out
+
 
 class TestSummaryByEmployee:
     """summary_by_employee.py 测试"""
@@ -79,3 +240,828 @@ class TestSummaryByGroup:
         df = summary_by_group(test_file, group_by=["部门", "人员类型"])
         assert "部门" in df.columns
         assert "人员类型" in df.columns
+
+    def test_chunked_partials_match_full(self, test_file):
+        """测试分块累加的部分和与人数与整表汇总一致"""
+        df, _ = load_excel(test_file)
+        summary = GroupSummary(["部门", "人员类型"])
+        for start in range(0, len(df), 300):
+            summary.update(df.iloc[start:start + 300])
+        expected = summary_by_group_df(df, ["部门", "人员类型"])
+        pd.testing.assert_frame_equal(summary.result(), expected)
+        assert summary_by_group(test_file, group_by=["部门"], chunksize=300).equals(
+            summary_by_group(test_file, group_by=["部门"])
+        )
+
+    def test_grouping_sets_match_separate_runs(self, test_file):
+        """测试各层级由部分和上卷的结果与分别汇总一致（分组列含缺失值时也一致）"""
+        df, _ = load_excel(test_file)
+        df.loc[df.index[::7], "考勤组"] = None
+        levels = [["部门"], ["考勤组"], ["部门", "人员类型"], ["人员类型", "考勤组"]]
+        results = summary_by_grouping_sets_df(df, levels)
+        assert list(results) == ["部门", "考勤组", "部门-人员类型", "人员类型-考勤组"]
+        for level in levels:
+            pd.testing.assert_frame_equal(results["-".join(level)], summary_by_group_df(df, level))
+
+    def test_rollup_total(self, test_file):
+        """测试上卷的总计层级：人数按工号去重，不是各分组人数之和"""
+        df, _ = load_excel(test_file)
+        assert rollup_levels(["部门", "人员类型"]) == [["部门", "人员类型"], ["部门"], []]
+        assert parse_grouping_sets(["部门", "地区, 部门", TOTAL_LEVEL]) == [["部门"], ["地区", "部门"], []]
+
+        results = summary_by_group(test_file, ["部门", "人员类型"], rollup=True, chunksize=500)
+        assert list(results) == ["部门-人员类型", "部门", TOTAL_LEVEL]
+        pd.testing.assert_frame_equal(results["部门"], summary_by_group_df(df, ["部门"]))
+        total = results[TOTAL_LEVEL]
+        assert len(total) == 1
+        assert total["人数"].iloc[0] == df["工号"].nunique()
+        assert total["实际出勤天数"].iloc[0] == df["实际出勤天数"].sum()
+        assert total["人均实际出勤天数"].iloc[0] == round(df["实际出勤天数"].sum() / df["工号"].nunique(), 2)
+
+    def test_grouping_sets_report(self, test_file, tmp_path):
+        """测试分组集结果写出为每个层级一个工作表的报表"""
+        output = tmp_path / "levels.xlsx"
+        results = summary_by_group(
+            test_file, None, grouping_sets=[["部门"], ["人员类型"], []], output_path=str(output)
+        )
+        sheets = pd.read_excel(output, sheet_name=None)
+        assert list(sheets) == ["部门", "人员类型", TOTAL_LEVEL]
+        assert sheets["部门"]["人数"].tolist() == results["部门"]["人数"].tolist()
+        with pytest.raises(ValueError):
+            summary_by_group(test_file, None)
+
+
+class TestCompactSummary:
+    """紧凑类型（分类、可空整数）上的汇总测试"""
+
+    def test_summary_matches(self, test_file):
+        """测试紧凑类型的分组与按工号汇总结果与原类型一致，不产生空分组"""
+        full, _ = load_excel(test_file)
+        df, _ = load_excel(test_file, compact=True)
+
+        expected = summary_by_group_df(full, ["部门", "人员类型"])
+        result = summary_by_group_df(df, ["部门", "人员类型"])
+        pd.testing.assert_frame_equal(result.astype(expected.dtypes.to_dict()), expected)
+
+        expected = summary_by_employee_df(full)
+        result = summary_by_employee_df(df)
+        assert result["工号"].astype(str).tolist() == expected["工号"].astype(str).str.zfill(6).tolist()
+
+    def test_abnormal_matches(self, test_file):
+        """测试紧凑类型的异常筛选结果与原类型一致"""
+        full, _ = load_excel(test_file)
+        df, _ = load_excel(test_file, compact=True)
+        assert len(abnormal_report_df(df)[1]) == len(abnormal_report_df(full)[1])
+
+
+class TestSummaryStore:
+    """增量汇总（--append）测试"""
+
+    @pytest.fixture
+    def daily_files(self, tmp_path):
+        """按日期拆分的每日考勤文件"""
+        df = generate_attendance_df(400, employees=40, seed=3)
+        files = []
+        for day, part in df.groupby("日期", sort=True):
+            path = tmp_path / f"{day:%Y%m%d}.xlsx"
+            write_frame(part, str(path))
+            files.append(str(path))
+        full = pd.concat([load_excel(f)[0] for f in files], ignore_index=True)
+        return files, full
+
+    def test_daily_append(self, daily_files, tmp_path):
+        """测试逐日累加的结果与整月重新汇总一致，重复的文件只累加一次"""
+        files, full = daily_files
+        employee_store = str(tmp_path / "employee.state")
+        group_store = str(tmp_path / "group.state")
+        for path in files + files[:1]:
+            by_employee = summary_by_employee(path, store_path=employee_store)
+            by_group = summary_by_group(path, ["部门"], store_path=group_store)
+
+        pd.testing.assert_frame_equal(by_employee, summary_by_employee_df(full))
+        pd.testing.assert_frame_equal(by_group, summary_by_group_df(full, ["部门"]))
+        assert sorted(p.name for p in tmp_path.glob("*.state*")) == ["employee.state", "group.state"]
+
+    def test_files_with_different_columns(self, daily_files, tmp_path):
+        """测试之后累加的文件缺少汇总列或基础信息列时按 0 / 其他记录的值累加"""
+        files, _ = daily_files
+        first, _ = load_excel(files[0])
+        second, _ = load_excel(files[1])
+        second = second.drop(columns=["迟到次数", "人员类型"])
+        path = tmp_path / "partial.xlsx"
+        write_frame(second, str(path))
+
+        employee_store = str(tmp_path / "employee.state")
+        group_store = str(tmp_path / "group.state")
+        for source in (files[0], str(path)):
+            by_employee = summary_by_employee(source, store_path=employee_store)
+            by_group = summary_by_group(source, ["部门"], store_path=group_store)
+
+        full = pd.concat([first, second], ignore_index=True)
+        pd.testing.assert_frame_equal(by_employee, summary_by_employee_df(full), check_dtype=False)
+        pd.testing.assert_frame_equal(by_group, summary_by_group_df(full, ["部门"]), check_dtype=False)
+
+    def test_param_mismatch(self, daily_files, tmp_path):
+        """测试状态文件的汇总参数与本次不一致时报错"""
+        files, _ = daily_files
+        store = str(tmp_path / "group.state")
+        summary_by_group(files[0], ["部门"], store_path=store)
+        with pytest.raises(ValueError):
+            summary_by_group(files[1], ["人员类型"], store_path=store)
+        with pytest.raises(ValueError):
+            summary_by_employee(files[1], store_path=store)
+
+
+class TestServe:
+    """serve.py 测试"""
+
+    @pytest.fixture
+    def server(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+        server = create_server(port=0, output_root=str(tmp_path))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+    @staticmethod
+    def _post(url, payload, headers=None):
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        request = urllib.request.Request(
+            url, data=json.dumps(payload).encode("utf-8"), headers=headers, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def test_warm_requests(self, server, test_file):
+        """测试重复请求命中结果缓存、同一文件的其他请求命中工作簿缓存，结果与直接计算一致"""
+        payload = {"file": test_file, "group_by": ["部门"]}
+        status, first = self._post(f"{server}/summary_by_group", payload)
+        assert status == 200 and not first["cached"] and not first["result_cached"]
+        status, second = self._post(f"{server}/summary_by_group", {**payload, "limit": 100})
+        assert status == 200 and second["result_cached"]
+        assert second["data"] == first["data"]
+
+        expected = summary_by_group_df(load_excel(test_file)[0], ["部门"])
+        assert second["rows"] == len(expected)
+        assert second["columns"] == expected.columns.tolist()
+        assert [row[0] for row in second["data"]] == expected["部门"].tolist()
+
+        status, report = self._post(f"{server}/abnormal_report", {"file": test_file, "limit": 5})
+        assert status == 200 and report["cached"] and not report["result_cached"]
+        assert len(report["data"]) == 5
+        assert report["rows"] == sum(report["counts"].values())
+        status, again = self._post(f"{server}/abnormal_report", {"file": test_file, "limit": 5})
+        assert again["result_cached"] and again["counts"] == report["counts"]
+
+        with urllib.request.urlopen(f"{server}/health") as response:
+            assert json.load(response)["cache"]["entries"] == 1
+
+    def test_errors(self, server, test_file):
+        """测试未知接口、缺少参数与文件不存在的错误响应"""
+        assert self._post(f"{server}/unknown", {"file": test_file})[0] == 404
+        assert self._post(f"{server}/summary_by_group", {"file": test_file})[0] == 400
+        assert self._post(f"{server}/clean_attendance", {"file": "不存在.xlsx"})[0] == 400
+
+    def test_rejects_cross_site_requests(self, server, test_file, tmp_path):
+        """测试拒绝非 JSON 请求、外部 Origin / Host，输出路径限制在输出根目录之下"""
+        payload = {"file": test_file, "group_by": ["部门"]}
+        assert self._post(f"{server}/summary_by_group", payload, {"Content-Type": "text/plain"})[0] == 415
+        assert self._post(f"{server}/summary_by_group", payload, {"Origin": "https://evil.example"})[0] == 403
+        assert self._post(f"{server}/summary_by_group", payload, {"Host": "evil.example:8765"})[0] == 403
+        assert self._post(f"{server}/summary_by_group", payload, {"Origin": "http://localhost:3000"})[0] == 200
+
+        for output in (str(tmp_path / "abs.xlsx"), "../escape.xlsx", "a/../../escape.xlsx"):
+            status, response = self._post(f"{server}/summary_by_group", {**payload, "output": output})
+            assert status == 400, output
+        assert not (tmp_path.parent / "escape.xlsx").exists()
+
+        status, response = self._post(f"{server}/summary_by_group", {**payload, "output": "out/summary.xlsx"})
+        assert status == 200
+        assert Path(response["output"]) == tmp_path / "out" / "summary.xlsx"
+        assert (tmp_path / "out" / "summary.xlsx").exists()
+
+    def test_join_dimensions(self, server, test_file, tmp_path):
+        """测试 join_excel 接口一次关联多个维度表并返回各维度的未匹配统计"""
+        org = tmp_path / "org.xlsx"
+        write_frame(pd.DataFrame({"部门": ["不存在的部门"], "部门负责人": ["张三"]}), str(org))
+        payload = {"file": test_file, "limit": 1, "dimensions": [{"right_file": str(org), "on": "部门", "name": "组织架构"}]}
+        status, response = self._post(f"{server}/join_excel", payload)
+        assert status == 200
+        assert response["columns"][-1] == "部门负责人"
+        stats = response["join_stats"][0]
+        assert stats["name"] == "组织架构"
+        assert stats["matched_rows"] == 0 and stats["unmatched_rows"] == response["rows"]
+
+        # 结果缓存键包含维度表的内容：维度表不变时命中，变化后重新关联
+        status, again = self._post(f"{server}/join_excel", payload)
+        assert again["result_cached"] and again["join_stats"] == response["join_stats"]
+        department = load_excel(test_file)[0]["部门"].iloc[0]
+        write_frame(pd.DataFrame({"部门": [department], "部门负责人": ["张三"]}), str(org))
+        status, changed = self._post(f"{server}/join_excel", payload)
+        assert status == 200 and not changed["result_cached"]
+        assert changed["join_stats"][0]["matched_rows"] > 0
+
+    def test_lru_memory_bound(self):
+        """测试按内存占用淘汰最久未使用的条目"""
+        frame = pd.DataFrame({"工号": range(100)})
+        cache = WorkbookCache(max_bytes=int(frame.memory_usage(deep=True).sum()) * 2)
+        for key in ("a", "b", "a", "c"):
+            cache.get(key, lambda: frame)
+        assert cache.stats()["entries"] == 2
+        assert cache.get("a", lambda: frame)[1] is True
+        assert cache.get("b", lambda: frame)[1] is False
+
+
+class TestFrameCache:
+    """frame_cache.py 测试"""
+
+    def test_repeat_load_hits_cache(self, test_file, tmp_path, monkeypatch):
+        """测试重复读取命中缓存且结果一致"""
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+        df1, header1 = load_excel(test_file, use_cache=True)
+        assert FrameCache().info()["entries"] == 1
+        df2, header2 = load_excel(test_file, use_cache=True)
+        assert header1 == header2 == 1
+        pd.testing.assert_frame_equal(df1, df2)
+        assert FrameCache().info()["entries"] == 1
+
+    def test_lru_eviction(self, tmp_path):
+        """测试超过条目上限时淘汰最久未访问的条目"""
+        cache = FrameCache(str(tmp_path), max_entries=2)
+        df = pd.DataFrame({"工号": [1, 2]})
+        cache.put("a", df, header_row=0)
+        cache.put("b", df, header_row=0)
+        assert cache.get("a") is not None
+        cache.put("c", df, header_row=0)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+    def test_ttl_expiry(self, tmp_path):
+        """测试超过有效期的条目视为未命中，并统计命中次数"""
+        cache = FrameCache(str(tmp_path), ttl=60)
+        cache.put("a", pd.DataFrame({"工号": [1]}))
+        assert cache.get("a") is not None
+        assert (cache.hits, cache.misses) == (1, 0)
+        assert cache.info()["hits"] == 1
+
+        cache.ttl = 0
+        assert cache.get("a") is None
+        assert cache.misses == 1
+        assert cache.info()["entries"] == 0
+
+    def test_unavailable_dir(self, test_file, tmp_path, monkeypatch):
+        """测试缓存目录不可用时只警告，读取照常完成"""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        monkeypatch.setenv(CACHE_DIR_ENV, str(blocker / "cache"))
+        df, _ = load_excel(test_file, use_cache=True)
+        expected, _ = load_excel(test_file, use_cache=False)
+        pd.testing.assert_frame_equal(df, expected)
+
+    def test_put_leaves_no_partial_files(self, tmp_path):
+        """测试写入经由临时文件替换，完成后只留下数据与元数据文件"""
+        cache = FrameCache(str(tmp_path))
+        cache.put("a", pd.DataFrame({"工号": [1]}))
+        cache.put("a", pd.DataFrame({"工号": [2]}))
+        # 数据文件为 Parquet 或 pickle（未安装 pyarrow 时），不留下 .tmp 等临时文件
+        names = sorted(p.name for p in tmp_path.iterdir())
+        assert len(names) == 2 and names[0] == "a.json"
+        assert names[1] in ("a.parquet", "a.pkl")
+        assert cache.get("a")[0]["工号"].tolist() == [2]
+
+
+class TestResultCache:
+    """result_cache.py 测试"""
+
+    def test_repeat_calls_hit(self, test_file, tmp_path):
+        """测试相同文件内容与参数的报表直接返回缓存结果，参数写法不影响命中"""
+        cache = ResultCache(str(tmp_path))
+        first = cache.call(summary_by_group, test_file, group_by=["部门"])
+        second = cache.call(summary_by_group, test_file, group_by=["部门"], sum_columns=None)
+        pd.testing.assert_frame_equal(first, second)
+
+        reports = cache.call(generate_abnormal_report, test_file)
+        cached = cache.call(generate_abnormal_report, test_file)
+        assert list(cached) == list(reports)
+        for name, frame in reports.items():
+            pd.testing.assert_frame_equal(cached[name], frame)
+
+        validation = cache.call(validate_columns, test_file, header_row=1)
+        assert cache.call(validate_columns, test_file, header_row=1) == validation
+        assert cache.stats()["hits"] == 3
+        assert cache.stats()["misses"] == 3
+
+    def test_content_addressed(self, tmp_path):
+        """测试以文件内容为键：复制的文件命中，内容变化后重新计算"""
+        cache = ResultCache(str(tmp_path / "cache"))
+        source = tmp_path / "a.xlsx"
+        generate_attendance(str(source), rows=100, employees=10, title_rows=0)
+        copy = tmp_path / "b.xlsx"
+        copy.write_bytes(source.read_bytes())
+
+        cache.call(summary_by_group, str(source), group_by=["部门"])
+        cache.call(summary_by_group, str(copy), group_by=["部门"])
+        assert cache.hits == 1
+
+        generate_attendance(str(copy), rows=100, employees=10, title_rows=0, seed=7)
+        cache.call(summary_by_group, str(copy), group_by=["部门"])
+        assert cache.misses == 2
+
+        with pytest.raises(ValueError):
+            cache.call(summary_by_group, str(source), group_by=["部门"], output_path="out.xlsx")
+
+    def test_digest_memo_bounded(self, tmp_path, monkeypatch):
+        """测试内容哈希每个路径只保留最新的一条，记住的路径数有上限"""
+        monkeypatch.setattr("result_cache.MAX_DIGESTS", 3)
+        cache = ResultCache(str(tmp_path / "cache"))
+        path = tmp_path / "a.txt"
+        for i in range(5):
+            path.write_text("x" * (i + 1))
+            assert cache._content(path)["size"] == i + 1
+        assert len(cache._digests) == 1
+
+        for i in range(5):
+            other = tmp_path / f"{i}.txt"
+            other.write_text(str(i))
+            cache._content(other)
+        assert list(cache._digests) == [str((tmp_path / f"{i}.txt").resolve()) for i in (2, 3, 4)]
+
+    def test_all_files_in_key(self, tmp_path):
+        """测试右表等其他文件参数同样按内容参与缓存键，(DataFrame, 统计) 结果原样返回"""
+        cache = ResultCache(str(tmp_path / "cache"))
+        left = tmp_path / "attendance.xlsx"
+        roster = tmp_path / "roster.xlsx"
+        generate_attendance(str(left), rows=100, employees=10, title_rows=0)
+        write_frame(generate_roster_df(10), str(roster))
+        dimensions = [{"right_file": str(roster), "on": "工号", "columns": ["实际工作城市"]}]
+
+        first, stats = cache.call(star_join_excel, str(left), dimensions=dimensions)
+        second, cached_stats = cache.call(star_join_excel, str(left), dimensions=dimensions)
+        assert cache.hits == 1
+        pd.testing.assert_frame_equal(first, second)
+        assert cached_stats == stats
+
+        write_frame(generate_roster_df(5), str(roster))
+        changed, stats = cache.call(star_join_excel, str(left), dimensions=dimensions)
+        assert cache.misses == 2
+        assert stats[0]["unmatched_rows"] > 0
+
+    def test_rejects_non_json_values(self, test_file, tmp_path):
+        """测试不能原样经 JSON 读回的结果拒绝缓存"""
+        cache = ResultCache(str(tmp_path))
+        for value in ({"工号"}, ("工号", 1), {1: "a"}):
+            with pytest.raises(TypeError):
+                cache.call(lambda file_path: value, test_file)
+        assert cache.stats()["entries"] == 0
+
+
+class TestJoinExcel:
+    """join_excel.py 测试"""
+
+    @staticmethod
+    def _merge(df_left, df_right, on, how):
+        """原实现：两表逐行统一格式后去重并 merge"""
+        df_left, df_right = df_left.copy(), df_right.copy()
+        df_left[on] = df_left[on].astype(str).str.strip().str.zfill(6)
+        df_right[on] = df_right[on].astype(str).str.strip().str.zfill(6)
+        df_right = df_right.drop_duplicates(subset=[on])
+        return pd.merge(df_left, df_right, on=on, how=how, suffixes=("", "_右表"))
+
+    @pytest.mark.parametrize("how", ["left", "inner", "outer"])
+    def test_matches_merge(self, how):
+        """测试索引关联结果与 merge 一致（补零、去重、同名列、未匹配），且不修改传入的左表"""
+        df_left = pd.DataFrame({
+            "工号": [1001, "001002", " 1003", 1001, 9999, float("nan")],
+            "部门": ["A", "B", "C", "A", "D", "E"],
+        })
+        df_right = pd.DataFrame({
+            "工号": ["001001", 1002, 1002, "1003", 5555],
+            "部门": ["甲", "乙", "乙2", "丙", "戊"],
+            "城市": ["北京", "上海", "广州", "深圳", "杭州"],
+        })
+        original = df_left.copy()
+        expected = self._merge(df_left, df_right, "工号", how)
+        result = join_df(df_left, df_right, "工号", how=how)
+        pd.testing.assert_frame_equal(result, expected)
+        pd.testing.assert_frame_equal(df_left, original)
+
+    def test_index_cache(self, tmp_path, monkeypatch):
+        """测试右表索引跨调用复用，花名册变化后失效"""
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+        left = tmp_path / "attendance.xlsx"
+        roster = tmp_path / "roster.xlsx"
+        generate_attendance(str(left), rows=200, employees=20, title_rows=0)
+        write_frame(generate_roster_df(20), str(roster))
+
+        first = join_excel(str(left), str(roster), on="工号", right_columns=["实际工作城市"], use_cache=True)
+        assert FrameCache().info()["entries"] == 2
+        second = join_excel(str(left), str(roster), on="工号", right_columns=["实际工作城市"], use_cache=True)
+        pd.testing.assert_frame_equal(first, second)
+        assert first["实际工作城市"].notna().all()
+
+        write_frame(generate_roster_df(10), str(roster))
+        third = join_excel(str(left), str(roster), on="工号", right_columns=["实际工作城市"], use_cache=True)
+        assert third["实际工作城市"].isna().sum() == 100
+
+    def test_reuse_index(self):
+        """测试同一个索引可关联多个左表"""
+        index = JoinIndex.build(pd.DataFrame({"工号": [1, 2], "城市": ["北京", "上海"]}), "工号")
+        for keys in ([2, 1, 3], ["000001"]):
+            result = join_df(pd.DataFrame({"工号": keys}), index, "工号")
+            assert len(result) == len(keys)
+        with pytest.raises(ValueError):
+            join_df(pd.DataFrame({"编号": [1]}), index, "编号")
+
+    @pytest.mark.parametrize("how", ["left", "inner"])
+    def test_star_join_matches_chained(self, how):
+        """测试多维度一次关联与逐个 join_df 结果一致，按维度统计未匹配，且不修改传入的左表"""
+        df_left = pd.DataFrame({
+            "工号": [1001, 1002, 1003, 1001, 9999],
+            "部门": ["A", "B", "A", "A", "C"],
+        }, index=[10, 11, 12, 13, 14])
+        roster = JoinIndex.build(pd.DataFrame({"工号": [1001, 1002, 1003], "地区": ["北京", "上海", "深圳"]}), "工号")
+        org = JoinIndex.build(pd.DataFrame({"部门": ["A", "B"], "部门负责人": ["张三", "李四"]}), "部门")
+        cost = JoinIndex.build(pd.DataFrame({"部门": ["A", "C"], "成本中心": ["CC1", "CC3"], "地区": ["华北", "华南"]}), "部门")
+
+        original = df_left.copy()
+        result, stats = star_join_df(
+            df_left, [Dimension(roster, name="花名册"), Dimension(org), Dimension(cost, name="成本中心")], how=how
+        )
+
+        pd.testing.assert_frame_equal(df_left, original)
+        expected = df_left
+        for index in (roster, org, cost):
+            expected = join_df(expected, index, index.on, how=how)
+        expected = expected.rename(columns={"地区_右表": "地区_成本中心"})
+        pd.testing.assert_frame_equal(result, expected)
+
+        assert [s["name"] for s in stats] == ["花名册", "部门", "成本中心"]
+        assert [s["unmatched_rows"] for s in stats] == [1, 1, 1]
+        assert stats[0]["unmatched_examples"] == ["009999"]
+        assert stats[1]["unmatched_examples"] == ["C"]
+        assert stats[2]["unmatched_examples"] == ["B"]
+
+        with pytest.raises(ValueError):
+            star_join_df(df_left, [Dimension(org)], how="outer")
+
+    def test_star_join_excel(self, tmp_path):
+        """测试从文件一次关联多个维度表，结果与逐次关联一致"""
+        left = tmp_path / "attendance.xlsx"
+        roster = tmp_path / "roster.xlsx"
+        org = tmp_path / "org.xlsx"
+        generate_attendance(str(left), rows=200, employees=20, title_rows=0)
+        roster_df = generate_roster_df(20)
+        write_frame(roster_df[["工号", "实际工作城市"]], str(roster))
+        departments = roster_df["部门"].drop_duplicates().iloc[1:]
+        write_frame(pd.DataFrame({"部门": departments, "部门负责人": "负责人" + departments}), str(org))
+
+        output = tmp_path / "joined.xlsx"
+        result, stats = star_join_excel(
+            str(left),
+            [
+                {"right_file": str(roster), "on": "工号", "columns": ["实际工作城市"]},
+                {"right_file": str(org), "on": "部门"},
+            ],
+            output_path=str(output),
+        )
+        chained = join_excel(str(left), str(roster), on="工号", right_columns=["实际工作城市"])
+        chained = join_df(chained, JoinIndex.build(load_excel(str(org))[0], "部门"), "部门")
+        pd.testing.assert_frame_equal(result, chained)
+        assert output.exists()
+
+        assert [s["name"] for s in stats] == ["roster", "org"]
+        assert stats[0]["unmatched_rows"] == 0
+        assert stats[1]["unmatched_keys"] == 1
+        assert stats[1]["unmatched_rows"] == int(result["部门负责人"].isna().sum()) > 0
+
+
+class TestPipeline:
+    """pipeline.py 测试"""
+
+    def test_stages_share_one_frame(self, test_file, tmp_path):
+        """测试流水线结果与逐步执行一致，且只写出配置的文件"""
+        spec = {
+            "input": test_file,
+            "stages": [
+                {"stage": "clean"},
+                {"stage": "abnormal", "output": str(tmp_path / "abnormal.xlsx")},
+                {"stage": "summary_by_group", "group_by": ["部门"]},
+                {"stage": "split", "column": "部门", "output_dir": str(tmp_path / "by_dept")},
+            ],
+        }
+        results = run_pipeline(spec)
+
+        df, _ = load_excel(test_file)
+        expected = summary_by_group_df(clean_attendance_df(df), ["部门"])
+        pd.testing.assert_frame_equal(results["summary_by_group"], expected)
+        assert (tmp_path / "abnormal.xlsx").exists()
+        assert sum(results["split"].values()) == len(results["clean"])
+
+    def test_join_dimensions(self, test_file, tmp_path):
+        """测试 join 阶段一次关联多个维度表"""
+        df, _ = load_excel(test_file)
+        departments = df["部门"].dropna().unique()
+        org = tmp_path / "org.xlsx"
+        cost = tmp_path / "cost.xlsx"
+        write_frame(pd.DataFrame({"部门": departments, "部门负责人": [f"负责人{i}" for i in range(len(departments))]}), str(org))
+        write_frame(pd.DataFrame({"部门": departments[:1], "成本中心": ["CC1"]}), str(cost))
+
+        spec = {
+            "input": test_file,
+            "stages": [
+                {"stage": "join", "how": "inner", "dimensions": [
+                    {"right_file": str(org), "on": "部门"},
+                    {"right_file": str(cost), "on": "部门", "columns": ["成本中心"]},
+                ]},
+            ],
+        }
+        result = run_pipeline(spec)["join"]
+        assert len(result) == int((df["部门"] == departments[0]).sum())
+        assert (result["成本中心"] == "CC1").all()
+        assert result["部门负责人"].notna().all()
+
+    def test_unknown_stage(self, tmp_path):
+        """测试未知阶段报错"""
+        spec_file = tmp_path / "spec.json"
+        spec_file.write_text('{"input": "a.xlsx", "stages": [{"stage": "unknown"}]}', encoding="utf-8")
+        with pytest.raises(ValueError):
+            load_spec(str(spec_file))
+
+
+class TestBatch:
+    """batch.py 测试"""
+
+    @pytest.fixture
+    def batch_dir(self, tmp_path):
+        data = tmp_path / "data"
+        data.mkdir()
+        generate_attendance(str(data / "a.xlsx"), rows=300, employees=10, seed=1)
+        generate_attendance(str(data / "b.xlsx"), rows=200, employees=10, seed=2)
+        (data / "broken.xlsx").write_bytes(b"not a workbook")
+        (data / "~$a.xlsx").write_bytes(b"")
+        return data
+
+    def test_expand_inputs(self, batch_dir):
+        """测试目录与通配符展开（去重、跳过临时文件）"""
+        files = expand_inputs([str(batch_dir), str(batch_dir / "a*.xlsx")])
+        assert [Path(f).name for f in files] == ["a.xlsx", "b.xlsx", "broken.xlsx"]
+
+    def test_parallel_clean(self, batch_dir, tmp_path):
+        """测试并行清洗合并输出，出错的文件不影响其他文件"""
+        output = tmp_path / "cleaned.csv"
+        result = run_batch("clean", [str(batch_dir)], output_path=str(output), jobs=2)
+
+        assert list(result["errors"]) == [str(batch_dir / "broken.xlsx")]
+        expected = [
+            len(clean_attendance_df(load_excel(str(batch_dir / name))[0])) for name in ("a.xlsx", "b.xlsx")
+        ]
+        assert list(result["files"].values()) == expected
+        merged = pd.read_csv(output, encoding="utf-8-sig")
+        assert len(merged) == result["rows"] == sum(expected)
+        assert merged[SOURCE_COLUMN].unique().tolist() == ["a.xlsx", "b.xlsx"]
+
+    @pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+    def test_merge_aligns_columns(self, tmp_path, suffix, capsys):
+        """测试之后的文件缺少列时按首个文件的类型补齐，已有的来源文件列被覆盖，串行时输出进度"""
+        if suffix == ".parquet":
+            pytest.importorskip("pyarrow")
+        first = pd.DataFrame({
+            "工号": [1001, 1002],
+            "日期": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+            "部门": ["研发", "销售"],
+            SOURCE_COLUMN: ["旧.xlsx", "旧.xlsx"],
+        })
+        write_frame(first, str(tmp_path / "a.xlsx"))
+        write_frame(first.drop(columns=["日期", "部门"]), str(tmp_path / "b.xlsx"))
+
+        output = tmp_path / f"merged{suffix}"
+        files = [str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")]
+        result = run_batch("clean", files, output_path=str(output), jobs=1, rules={}, header_row=0)
+        assert not result["errors"]
+        assert "清洗统计" in capsys.readouterr().out
+
+        if suffix == ".parquet":
+            merged = pd.read_parquet(output)
+            assert merged["日期"].dtype.kind == "M"
+            assert merged["日期"].isna().tolist() == [False, False, True, True]
+        else:
+            merged = pd.read_csv(output, encoding="utf-8-sig")
+        assert merged[SOURCE_COLUMN].tolist() == ["a.xlsx", "a.xlsx", "b.xlsx", "b.xlsx"]
+        assert merged["工号"].tolist() == [1001, 1002, 1001, 1002]
+
+    def test_split(self, batch_dir, tmp_path):
+        """测试批量拆分到以文件名命名的子目录"""
+        result = run_batch(
+            "split",
+            [str(batch_dir / "a.xlsx"), str(batch_dir / "b.xlsx")],
+            output_path=str(tmp_path / "out"),
+            jobs=1,
+            column="部门",
+            format="csv",
+        )
+        assert not result["errors"]
+        assert sum(result["files"][str(batch_dir / "b.xlsx")].values()) == 200
+        assert (tmp_path / "out" / "a" / MANIFEST_NAME).exists()
+
+
+class TestSplitExcel:
+    """split_excel.py 测试"""
+
+    def test_partition_order(self):
+        """测试分组顺序与 unique() 一致，缺失值不参与分组"""
+        series = pd.Series(["b", "a", None, "b", "c", "a"])
+        parts = partition_rows(series)
+        assert [value for value, _ in parts] == ["b", "a", "c"]
+        assert [rows.tolist() for _, rows in parts] == [[0, 3], [1, 5], [4]]
+
+    def test_parallel_split_manifest(self, tmp_path):
+        """测试并行拆分结果与清单文件"""
+        df = pd.DataFrame({"部门": ["A", "B", "A", "C/D"], "值": [1, 2, 3, 4]})
+        result = split_df(df, "部门", str(tmp_path), file_format="csv", jobs=2)
+
+        assert result == {"A": 2, "B": 1, "C/D": 1}
+        manifest = json.loads((tmp_path / MANIFEST_NAME).read_text(encoding="utf-8"))
+        assert sum(item["rows"] for item in manifest) == len(df)
+        assert (tmp_path / "C_D.csv").exists()
+        part = pd.read_csv(tmp_path / "A.csv", encoding="utf-8-sig")
+        assert part["值"].tolist() == [1, 3]
+
+
+class TestWriters:
+    """writers.py 测试"""
+
+    @pytest.mark.parametrize("engine", XLSX_ENGINES)
+    def test_xlsx_round_trip(self, tmp_path, engine):
+        """测试流式写出的 xlsx 可被完整读回"""
+        if engine == "xlsxwriter":
+            pytest.importorskip("xlsxwriter")
+        df = pd.DataFrame({
+            "工号": [1001, 1002, 1003],
+            "部门": ["研发", float("nan"), "销售"],
+            "迟到次数": [0.0, float("nan"), 2.0],
+        })
+        output = tmp_path / "out.xlsx"
+        write_frame(df, str(output), engine=engine)
+        pd.testing.assert_frame_equal(pd.read_excel(output), df)
+
+    def test_chunked_csv(self, tmp_path):
+        """测试分块写入 CSV 只写一次表头"""
+        df = pd.DataFrame({"工号": [1, 2], "部门": ["A", "B"]})
+        output = tmp_path / "out.csv"
+        with FrameWriter(str(output)) as writer:
+            writer.write(df)
+            writer.write(df)
+        result = pd.read_csv(output, encoding="utf-8-sig")
+        assert len(result) == 4
+        assert result.columns.tolist() == ["工号", "部门"]
+
+    def test_write_sheets(self, tmp_path):
+        """测试多工作表写出：非法字符替换，csv 每个工作表一个文件"""
+        frames = {"部门": pd.DataFrame({"a": [1, 2]}), "地区/部门": pd.DataFrame({"b": ["x"]})}
+        write_sheets(frames, str(tmp_path / "out.xlsx"))
+        sheets = pd.read_excel(tmp_path / "out.xlsx", sheet_name=None)
+        assert list(sheets) == ["部门", "地区_部门"]
+        assert sheets["部门"]["a"].tolist() == [1, 2]
+        outputs = write_sheets(frames, str(tmp_path / "out.csv"))
+        assert [Path(p).name for p in outputs] == ["out_部门.csv", "out_地区_部门.csv"]
+
+    def test_unsupported_format(self, tmp_path):
+        """测试不支持的扩展名报错"""
+        with pytest.raises(ValueError):
+            write_frame(pd.DataFrame(), str(tmp_path / "out.txt"))
+
+
+class TestProfiling:
+    """profiling.py 测试"""
+
+    def test_span_records(self):
+        """测试区间记录行数与吞吐量，嵌套的同名区间只记录最外层"""
+        profiler = Profiler()
+        with profiler.span(PARSE, rows=100, engine="xml"):
+            with profiler.span(PARSE, rows=50):
+                pass
+            with profiler.span(TRANSFORM) as s:
+                s.rows = 80
+        records = profiler.records()
+        assert [r["name"] for r in records] == [PARSE, TRANSFORM]
+        assert records[0]["rows"] == 100
+        assert records[0]["args"] == {"engine": "xml"}
+        assert records[1]["rows"] == 80
+        assert records[0]["seconds"] >= records[1]["seconds"]
+
+    def test_summary_and_chrome_trace(self):
+        """测试按阶段汇总与 Chrome trace 格式"""
+        profiler = Profiler()
+        for chunk in range(3):
+            profiler.span(PARSE, chunk=chunk).stop(10)
+        summary = profiler.summary()
+        assert summary[0]["name"] == PARSE
+        assert summary[0]["count"] == 3
+        assert summary[0]["rows"] == 30
+
+        events = profiler.chrome_trace()["traceEvents"]
+        assert len(events) == 3
+        assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+        assert events[2]["args"]["chunk"] == 2
+        assert events[2]["args"]["rows"] == 10
+
+    def test_inactive_is_noop(self):
+        """测试未启用剖析时区间为空操作"""
+        with span(PARSE, rows=10) as s:
+            s.rows = 20
+        with profile_run(None, "noop") as profiler:
+            assert profiler is None
+
+    @pytest.mark.parametrize("fmt", ["json", "chrome"])
+    def test_profile_run(self, test_file, tmp_path, fmt):
+        """测试完整命令的剖析结果包含各标准阶段"""
+        output = tmp_path / "profile.json"
+        with profile_run(str(output), "summary_by_group", fmt):
+            summary_by_group(
+                test_file, group_by=["部门"], output_path=str(tmp_path / "out.xlsx"), engine="xml"
+            )
+        data = json.loads(output.read_text(encoding="utf-8"))
+        if fmt == "chrome":
+            names = {e["name"] for e in data["traceEvents"]}
+        else:
+            names = {s["name"] for s in data["stages"]}
+            stages = {s["name"]: s for s in data["stages"]}
+            assert stages[PARSE]["rows"] > 0
+            assert stages[TRANSFORM]["rows_per_second"] > 0
+        assert set(STAGES) | {"summary_by_group"} <= names
+
+
+class TestSequenceOps:
+    """sequence_ops.py 测试"""
+
+    def test_runs_and_windows_match_loops(self):
+        """测试连续段长度与滑动窗口计数与逐组循环的结果一致，且不跨越分组"""
+        rng = np.random.default_rng(1)
+        groups = np.sort(rng.integers(0, 20, 2000))
+        flags = rng.random(2000) < 0.4
+
+        lengths = run_lengths(flags, groups)
+        counts = rolling_counts(flags, groups, 7)
+        expected_lengths = np.zeros(len(flags), dtype=int)
+        expected_counts = np.zeros(len(flags), dtype=int)
+        for g in np.unique(groups):
+            idx = np.flatnonzero(groups == g)
+            start = 0
+            for i in range(1, len(idx) + 1):
+                if i == len(idx) or flags[idx[i]] != flags[idx[start]]:
+                    expected_lengths[idx[start:i]] = i - start
+                    start = i
+            for j in range(len(idx)):
+                expected_counts[idx[j]] = flags[idx[max(0, j - 6):j + 1]].sum()
+        assert lengths.tolist() == expected_lengths.tolist()
+        assert counts.tolist() == expected_counts.tolist()
+        assert (streak_mask(flags, groups, 3) == (flags & (expected_lengths >= 3))).all()
+
+    def test_window_mask(self):
+        """测试窗口标记：只标记位于满足条件窗口内的命中位置"""
+        flags = np.array([1, 0, 1, 0, 0, 0, 1, 1, 0, 1], dtype=bool)
+        groups = np.array([0] * 6 + [1] * 4)
+        assert window_mask(flags, groups, 3, 2).astype(int).tolist() == [1, 0, 1, 0, 0, 0, 1, 1, 0, 1]
+        assert window_mask(flags, groups, 2, 2).astype(int).tolist() == [0, 0, 0, 0, 0, 0, 1, 1, 0, 0]
+        assert len(window_mask(flags[:0], groups[:0], 3, 2)) == 0
+
+
+class TestGenerateAttendance:
+    """generate_attendance.py 测试"""
+
+    def test_deterministic(self):
+        """测试相同参数生成相同数据，列与模板一致"""
+        first = generate_attendance_df(300, employees=20, seed=7)
+        second = generate_attendance_df(300, employees=20, seed=7)
+        pd.testing.assert_frame_equal(first, second)
+        assert first.columns.tolist() == ATTENDANCE_COLUMNS
+        assert first["工号"].nunique() == 20
+
+    @pytest.mark.parametrize("title_rows", [0, 2])
+    def test_header_row(self, tmp_path, title_rows):
+        """测试生成文件的表头行可被自动检测"""
+        output = tmp_path / "attendance.xlsx"
+        result = generate_attendance(str(output), rows=100, title_rows=title_rows)
+        assert result["header_row"] == title_rows
+        assert detect_header_row(str(output)) == title_rows
+
+    def test_roster_matches_attendance(self, tmp_path):
+        """测试员工数多于行数时花名册的员工属性仍与考勤表一致，只包含考勤表中的员工"""
+        output = tmp_path / "attendance.xlsx"
+        roster_path = tmp_path / "roster.xlsx"
+        result = generate_attendance(str(output), rows=20, employees=50, roster_path=str(roster_path))
+        assert result["employees"] == 20
+
+        attendance, _ = load_excel(str(output))
+        roster = pd.read_excel(roster_path)
+        assert len(roster) == 20
+        merged = attendance.merge(roster, on="工号", suffixes=("", "_花名册"))
+        assert len(merged) == len(attendance)
+        assert (merged["部门"] == merged["部门_花名册"]).all()
+        assert (merged["人员类型"] == merged["人员类型_花名册"]).all()
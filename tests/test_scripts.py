@@ -3,7 +3,11 @@
 使用 examples/test01.xlsx 作为测试数据
 """
 
+import json
+import os
+import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pandas as pd
@@ -12,22 +16,46 @@ import pytest
 # 添加 scripts 目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
 
-from analyze_excel_columns import analyze_excel_columns
+from analyze_excel_columns import ColumnProfile, analyze_excel_columns, profile_excel_columns
 from detect_header import detect_header_row
-from filter_excel import filter_excel
+from excel_loader import (
+    SHEET_COLUMN,
+    list_sheet_names,
+    load_excel,
+    load_excel_sheets,
+    map_sheets,
+    read_excel_chunks,
+    read_header_names,
+    read_sheet_rows,
+)
+from filter_excel import filter_excel, filter_excel_chunked
+from frame_cache import CACHE_DIR_ENV
+from generate_attendance import generate_attendance, generate_attendance_df
 from read_excel_head import read_excel_head
 from validate_columns import validate_columns
+from writers import XLSX_ENGINES, FrameWriter
+from xlsx_reader import iter_sheet_values, sniff_rows
 
 # 测试数据路径
 TEST_FILE = Path(__file__).parent.parent / "examples" / "test01.xlsx"
 
 
-@pytest.fixture
-def test_file():
-    """确保测试文件存在"""
-    if not TEST_FILE.exists():
-        pytest.skip(f"测试文件不存在: {TEST_FILE}")
-    return str(TEST_FILE)
+@pytest.fixture(scope="session")
+def test_file(tmp_path_factory):
+    """测试文件，示例文件不存在时使用同规模的合成数据"""
+    if TEST_FILE.exists():
+        return str(TEST_FILE)
+    path = tmp_path_factory.mktemp("data") / TEST_FILE.name
+    generate_attendance(str(path), rows=2000, employees=50)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """解析缓存默认开启，测试中写入临时目录，不污染用户的缓存目录"""
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
 
 
 class TestReadExcelHead:
@@ -67,6 +95,249 @@ class TestDetectHeader:
         header_row = detect_header_row(test_file, keywords=["工号", "部门"])
         assert header_row == 1
 
+    def test_sniff_matches_read_excel(self, test_file):
+        """测试只读取前 N 行 XML 的文本单元格与 pd.read_excel 一致"""
+        rows = sniff_rows(test_file, max_rows=5)
+        expected = pd.read_excel(test_file, header=None, nrows=5)
+        assert len(rows) == len(expected)
+        for row, (_, values) in zip(rows, expected.iterrows()):
+            texts = [v for v in values.tolist() if isinstance(v, str)]
+            assert [v for v in row if isinstance(v, str)] == texts
+
+    @pytest.mark.parametrize("engine", XLSX_ENGINES)
+    def test_sniff_named_sheet(self, tmp_path, engine):
+        """测试按名称读取工作表，空行与空单元格位置保持不变"""
+        if engine == "xlsxwriter":
+            pytest.importorskip("xlsxwriter")
+        path = tmp_path / "head.xlsx"
+        df = pd.DataFrame({"工号": [1001], "部门": [None], "迟到次数": [1.5]})
+        with FrameWriter(str(path), engine=engine, sheet_name="考勤", preamble=[["标题"], []]) as writer:
+            writer.write(df)
+        assert sniff_rows(str(path), sheet_name="考勤") == [
+            ["标题"], [], ["工号", "部门", "迟到次数"], [1001, None, 1.5]
+        ]
+        assert detect_header_row(str(path), sheet_name="考勤") == 2
+
+
+class TestExcelLoader:
+    """excel_loader.py 测试"""
+
+    def test_load_with_auto_detect(self, test_file):
+        """测试一次解析中自动检测表头"""
+        df, header_row = load_excel(test_file)
+        assert header_row == 1
+        assert "工号" in df.columns
+
+    def test_matches_read_excel(self, test_file):
+        """测试读取结果与 pd.read_excel 一致"""
+        df, _ = load_excel(test_file, header_row=1)
+        expected = pd.read_excel(test_file, header=1)
+        pd.testing.assert_frame_equal(df, expected)
+
+    def test_usecols_projection(self, test_file):
+        """测试按列投影读取，不存在的列被忽略"""
+        columns = ["工号", "部门", "迟到次数", "不存在的列"]
+        df, header_row = load_excel(test_file, usecols=columns)
+        assert header_row == 1
+        assert df.columns.tolist() == ["工号", "部门", "迟到次数"]
+        full, _ = load_excel(test_file)
+        pd.testing.assert_frame_equal(df, full[df.columns.tolist()])
+
+    def test_chunks_match_full_read(self, test_file):
+        """测试分块读取拼接后与整表读取一致"""
+        chunks, header_row = read_excel_chunks(test_file, chunksize=300)
+        chunks = list(chunks)
+        assert header_row == 1
+        assert max(len(chunk) for chunk in chunks) == 300
+        full, _ = load_excel(test_file)
+        pd.testing.assert_frame_equal(pd.concat(chunks), full)
+
+    @pytest.mark.parametrize("engine", ["openpyxl", "xml"])
+    def test_chunk_dtypes_follow_first_chunk(self, tmp_path, engine, capsys):
+        """测试先为文本的列在之后的块中不把纯数字文本解析为数值，与整表读取一致"""
+        path = tmp_path / "mixed.xlsx"
+        ids = ["A7", "X1"] + ["1001", "1002"] * 3
+        pd.DataFrame({"工号": ids, "迟到次数": range(len(ids))}).to_excel(path, index=False)
+        chunks, _ = read_excel_chunks(str(path), header_row=0, chunksize=2, engine=engine)
+        full, _ = load_excel(str(path), header_row=0, engine=engine)
+        pd.testing.assert_frame_equal(pd.concat(list(chunks)), full)
+        assert full["工号"].tolist() == ids
+
+        # 先出现的块已按数值输出时无法更改，输出警告
+        pd.DataFrame({"工号": ["1001", "1002", "A7", "1003"]}).to_excel(path, index=False)
+        chunks, _ = read_excel_chunks(str(path), header_row=0, chunksize=2, engine=engine)
+        assert pd.concat(list(chunks))["工号"].tolist() == [1001, 1002, "A7", "1003"]
+        assert "警告: 列 '工号'" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("engine", ["openpyxl", "xml"])
+    def test_chunk_bools_match_full_read(self, tmp_path, engine):
+        """测试布尔列在分块读取与整表读取中同样按 1.0 / 0.0 解析"""
+        path = tmp_path / "bools.xlsx"
+        flags = [True, False, True, True, None, False]
+        pd.DataFrame({"工号": range(len(flags)), "已审批": flags}).to_excel(path, index=False)
+        chunks, _ = read_excel_chunks(str(path), header_row=0, chunksize=2, engine=engine)
+        full, _ = load_excel(str(path), header_row=0, engine=engine)
+        assert full["已审批"].dtype == "float64"
+        pd.testing.assert_frame_equal(pd.concat(list(chunks)), full)
+
+        projected, _ = load_excel(str(path), header_row=0, usecols=["已审批"], engine=engine)
+        pd.testing.assert_frame_equal(projected, full[["已审批"]])
+
+    def test_compact_dtypes(self, test_file):
+        """测试紧凑类型：枚举文本列为分类，自由文本保持原类型，次数为可空整数，工号补齐 6 位"""
+        full, _ = load_excel(test_file)
+        df, _ = load_excel(test_file, compact=True)
+        assert isinstance(df["部门"].dtype, pd.CategoricalDtype)
+        for column in ("上班 1 打卡时间", "上班 1 修改原因", "下班 1 打卡地点", "日期"):
+            assert df[column].dtype == full[column].dtype
+        assert isinstance(df["工号"].dtype, pd.CategoricalDtype)
+        assert str(df["迟到次数"].dtype).startswith("Int")
+        assert (df["工号"].astype(str).str.len() == 6).all()
+        assert df.memory_usage(deep=True).sum() < full.memory_usage(deep=True).sum()
+        assert (df["迟到次数"].astype("float64").fillna(-1) == full["迟到次数"].fillna(-1)).all()
+
+    def test_xml_engine_matches_openpyxl(self, test_file):
+        """测试 xml 引擎的整表、按列投影与分块读取结果与 openpyxl 引擎一致"""
+        expected, _ = load_excel(test_file)
+        df, header_row = load_excel(test_file, engine="xml")
+        assert header_row == 1
+        pd.testing.assert_frame_equal(df, expected)
+
+        columns = ["工号", "部门", "日期", "迟到次数"]
+        projected, _ = load_excel(test_file, usecols=columns, engine="xml")
+        pd.testing.assert_frame_equal(projected, load_excel(test_file, usecols=columns)[0])
+
+        chunks, _ = read_excel_chunks(test_file, chunksize=300, engine="xml")
+        pd.testing.assert_frame_equal(pd.concat(list(chunks)), expected)
+        assert read_header_names(test_file, header_row=1, engine="xml") == expected.columns.tolist()
+
+        # 相同文本共用同一个字符串对象
+        values = df["部门"].dropna().tolist()
+        assert len({id(v) for v in values}) == len(set(values))
+
+        with pytest.raises(ValueError):
+            load_excel(test_file, engine="xlrd")
+
+    def test_xml_engine_compact_categories(self, test_file, tmp_path):
+        """测试 xml 引擎按字符串表编码枚举列，结果与 openpyxl 引擎的紧凑读取一致"""
+        full, _ = load_excel(test_file)
+        path = tmp_path / "shared.xlsx"
+        full.to_excel(path, index=False)
+        strings = []
+        next(iter_sheet_values(str(path), shared_strings=strings))
+        assert "部门" in strings
+
+        for source, header in ((test_file, None), (str(path), 0)):
+            expected, _ = load_excel(source, header_row=header, compact=True)
+            df, _ = load_excel(source, header_row=header, compact=True, engine="xml")
+            assert isinstance(df["部门"].dtype, pd.CategoricalDtype)
+            pd.testing.assert_frame_equal(df, expected)
+
+            columns = ["工号", "部门", "上班 1 打卡结果"]
+            projected, _ = load_excel(source, header_row=header, usecols=columns, compact=True, engine="xml")
+            expected, _ = load_excel(source, header_row=header, usecols=columns, compact=True)
+            pd.testing.assert_frame_equal(projected, expected)
+
+    def test_xml_reader_closes_archive(self, test_file, tmp_path):
+        """测试 xml 引擎只在读取时打开压缩包，读完、出错或关闭时关闭"""
+        missing = str(tmp_path / "不存在.xlsx")
+        iter_sheet_values(missing).close()
+        with pytest.raises(FileNotFoundError):
+            next(iter_sheet_values(missing))
+        with pytest.raises(ValueError):
+            load_excel(test_file, sheet_name="不存在的工作表", engine="xml")
+
+        rows = iter_sheet_values(test_file)
+        next(rows)
+        archive = rows.gi_frame.f_locals["archive"]
+        rows.close()
+        assert archive.fp is None
+
+    @pytest.mark.parametrize("date1904", [False, True])
+    def test_xml_engine_cell_types(self, tmp_path, date1904):
+        """测试共享字符串、日期 / 时间 / 时长格式、布尔、错误值与空行的取值与 openpyxl 一致"""
+        import datetime
+
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        wb.epoch = datetime.datetime(1904, 1, 1) if date1904 else datetime.datetime(1899, 12, 30)
+        ws = wb.active
+        ws.append(["工号", "日期", "打卡时间", "加班时长", "在职", "备注", "金额"])
+        ws.append([1001, datetime.datetime(2024, 1, 5, 9, 30), datetime.time(9, 1), 1.5, True, "迟到", 12.5])
+        ws.append([1002, datetime.date(2024, 2, 29), datetime.time(18, 0), 0.25, False, "#N/A", 3])
+        ws.append([])
+        ws.append(["001003", None, None, None, None, "迟到", None])
+        for row in ws.iter_rows(min_row=2, min_col=4, max_col=4):
+            row[0].number_format = "[h]:mm:ss"
+        ws["A8"] = "末行"
+        path = tmp_path / "types.xlsx"
+        wb.save(path)
+
+        assert read_sheet_rows(str(path), engine="xml") == read_sheet_rows(str(path))
+        pd.testing.assert_frame_equal(load_excel(str(path), engine="xml")[0], load_excel(str(path))[0])
+
+
+def _sheet_pid(file_path, sheet):
+    return os.getpid()
+
+
+def _map_sheets_in_worker(file_path):
+    """在进程池的工作进程中读取多个工作表，返回 (工作进程 pid, 各工作表读取时的 pid)"""
+    return os.getpid(), map_sheets(_sheet_pid, file_path, ["1月", "2月", "3月"], jobs=3)
+
+
+class TestMultiSheet:
+    """多工作表并行读取测试"""
+
+    @pytest.fixture
+    def monthly_file(self, tmp_path):
+        """每个工作表一个月，第二个月表头之前有标题行"""
+        path = tmp_path / "monthly.xlsx"
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            for i, month in enumerate(["1月", "2月", "3月"]):
+                df = generate_attendance_df(60, employees=20, seed=i)
+                df.to_excel(writer, sheet_name=month, index=False, startrow=1 if month == "2月" else 0)
+            pd.DataFrame().to_excel(writer, sheet_name="空表")
+        return str(path)
+
+    def test_all_sheets(self, monthly_file):
+        """测试并行读取全部工作表，结果与逐个读取后拼接一致"""
+        assert list_sheet_names(monthly_file) == ["1月", "2月", "3月", "空表"]
+        df, header_rows = load_excel_sheets(monthly_file, "all", jobs=2)
+        assert header_rows == {"1月": 0, "2月": 1, "3月": 0, "空表": 0}
+        assert df.columns[0] == SHEET_COLUMN
+        assert df[SHEET_COLUMN].unique().tolist() == ["1月", "2月", "3月"]
+
+        expected = pd.concat(
+            [load_excel(monthly_file, sheet_name=month)[0] for month in ["1月", "2月", "3月"]],
+            ignore_index=True,
+        )
+        pd.testing.assert_frame_equal(df.drop(columns=SHEET_COLUMN), expected)
+
+    def test_sheet_list(self, monthly_file):
+        """测试按名称与索引选取多个工作表"""
+        df, header_row = load_excel(monthly_file, sheet_name=[2, "1月"], usecols=["工号", "迟到次数"])
+        assert header_row == 0
+        assert df.columns.tolist() == [SHEET_COLUMN, "工号", "迟到次数"]
+        assert df[SHEET_COLUMN].unique().tolist() == ["3月", "1月"]
+        with pytest.raises(ValueError):
+            load_excel(monthly_file, sheet_name=["1月", "13月"])
+        with pytest.raises(ValueError):
+            load_excel(monthly_file, sheet_name=[])
+
+    def test_serial_in_pool_worker(self, monthly_file):
+        """测试已在进程池工作进程中时逐个读取工作表，不再嵌套创建进程"""
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            worker, pids = executor.submit(_map_sheets_in_worker, monthly_file).result()
+        assert pids == [worker] * 3
+
+    def test_read_head(self, monthly_file):
+        """测试多个工作表的前 N 行，空工作表不返回"""
+        result = read_excel_head(monthly_file, rows=3, sheet_name="all", jobs=2)
+        assert list(result) == ["1月", "2月", "3月"]
+        assert all(len(df) == 3 for df in result.values())
+
 
 class TestValidateColumns:
     """validate_columns.py 测试"""
@@ -113,6 +384,49 @@ class TestAnalyzeExcelColumns:
         # 星期应该有 7 个唯一值
         assert len(result["星期"]) == 7
 
+    def test_profile_matches_exact(self, test_file):
+        """测试画像的缺失数、唯一值数与高频值与整表统计一致，分块结果相同"""
+        profile = profile_excel_columns(test_file, header_row=1, columns=["部门", "星期", "离职日期"])
+        records = {r["列名"]: r for r in profile.records()}
+        full, _ = load_excel(test_file, header_row=1)
+        for col, record in records.items():
+            assert record["缺失数"] == full[col].isna().sum()
+            assert record["唯一值数"] == full[col].nunique()
+            assert not record["估算"]
+        top_value, top_count = records["部门"]["高频值"][0]
+        assert top_count == full["部门"].value_counts().iloc[0]
+
+        chunked = profile_excel_columns(
+            test_file, header_row=1, columns=["部门", "星期", "离职日期"], chunksize=300
+        )
+        assert chunked.records() == profile.records()
+
+    def test_profile_estimate(self):
+        """测试唯一值超过上限后改为估算，只保留有限个值计数"""
+        values = pd.Series([f"地点{i}" for i in range(20000)] * 2)
+        profile = ColumnProfile(top_k=5, exact_limit=1000)
+        for start in range(0, len(values), 5000):
+            profile.update(pd.DataFrame({"打卡地点": values.iloc[start:start + 5000]}))
+        record = profile.records()[0]
+        assert record["估算"]
+        assert abs(record["唯一值数"] - 20000) / 20000 < 0.05
+        assert len(record["高频值"]) == 5
+        assert len(profile.result()) == 1
+
+    def test_cli_json_not_truncated(self, tmp_path):
+        """测试 --max-values 只限制终端输出，--json 输出全部唯一值"""
+        path = tmp_path / "values.xlsx"
+        pd.DataFrame({"部门": [f"部门{i:02d}" for i in range(10)]}).to_excel(path, index=False)
+        script = str(Path(__file__).parent.parent / "scripts" / "analyze_excel_columns.py")
+        args = [sys.executable, script, str(path), "--no-cache", "--max-values", "3"]
+
+        result = subprocess.run([*args, "--json"], capture_output=True, text=True, encoding="utf-8")
+        assert result.returncode == 0, result.stderr
+        assert len(json.loads(result.stdout)["部门"]) == 10
+
+        result = subprocess.run(args, capture_output=True, text=True, encoding="utf-8")
+        assert "另有 7 个" in result.stdout
+
 
 class TestFilterExcel:
     """filter_excel.py 测试"""
@@ -139,3 +453,85 @@ class TestFilterExcel:
         )
         assert "实习" not in df["人员类型"].values
         assert "外包" not in df["人员类型"].values
+
+    def test_filter_chunked(self, test_file, tmp_path):
+        """测试分块过滤与整表过滤结果一致"""
+        output = tmp_path / "filtered.csv"
+        stats = filter_excel_chunked(
+            test_file,
+            column="星期",
+            values=["星期六", "星期日"],
+            header_row=1,
+            output_path=str(output),
+            chunksize=300,
+        )
+        df = filter_excel(test_file, column="星期", values=["星期六", "星期日"], header_row=1)
+        assert stats == {"original": 2000, "kept": len(df)}
+        assert len(pd.read_csv(output, encoding="utf-8-sig")) == len(df)
+
+    def test_filter_compact(self, test_file):
+        """测试紧凑类型读取时筛选结果行数不变"""
+        expected = filter_excel(test_file, column="星期", values=["星期六", "星期日"], header_row=1)
+        df = filter_excel(test_file, column="星期", values=["星期六", "星期日"], header_row=1, compact=True)
+        assert len(df) == len(expected)
+        assert not df["星期"].isin(["星期六", "星期日"]).any()
+
+
+class TestDispatcher:
+    """aliy.py 统一入口测试"""
+
+    SCRIPT = str(Path(__file__).parent.parent / "scripts" / "aliy.py")
+
+    def _run(self, *args):
+        return subprocess.run(
+            [sys.executable, self.SCRIPT, *args], capture_output=True, text=True, encoding="utf-8"
+        )
+
+    def test_help_skips_heavy_imports(self):
+        """测试 --help 与参数错误不加载 pandas"""
+        result = self._run("--timing", "summary_by_group", "--help")
+        assert result.returncode == 0
+        assert "aliy.py summary_by_group" in result.stdout
+        assert "已加载依赖: 无" in result.stderr
+
+        result = self._run("--timing", "summary_by_group", "不存在.xlsx", "-g", "部门")
+        assert result.returncode == 1
+        assert "已加载依赖: 无" in result.stderr
+
+    def test_run_command(self, test_file):
+        """测试子命令正常运行，未知命令返回错误"""
+        result = self._run("--timing", "summary_by_group", test_file, "-g", "部门", "--no-cache")
+        assert result.returncode == 0
+        assert "条记录" in result.stdout
+        assert "已加载依赖: pandas" in result.stderr
+        assert self._run("unknown").returncode == 2
+        assert "summary_by_group" in self._run().stdout
+
+    def test_lazy_imports_keep_real_modules(self):
+        """测试导入脚本不加载 pandas，使用后 sys.modules 中是真正的模块"""
+        code = (
+            "import sys, pickle, types\n"
+            "import summary_by_group\n"
+            "assert 'pandas' not in sys.modules\n"
+            "df = summary_by_group.pd.DataFrame({'a': [1]})\n"
+            "from pandas import DataFrame\n"
+            "assert isinstance(df, DataFrame)\n"
+            "assert type(sys.modules['pandas']) is types.ModuleType\n"
+            "assert pickle.loads(pickle.dumps(df)).equals(df)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            cwd=Path(self.SCRIPT).parent,
+        )
+        assert result.returncode == 0, result.stderr
+
+    def test_installed_modules_listed(self):
+        """测试 pyproject.toml 的 py-modules 包含 scripts/ 下的全部脚本"""
+        import tomllib
+
+        root = Path(self.SCRIPT).parent.parent
+        config = tomllib.loads((root / "pyproject.toml").read_text(encoding="utf-8"))
+        modules = config["tool"]["setuptools"]["py-modules"]
+        assert sorted(modules) == sorted(p.stem for p in (root / "scripts").glob("*.py"))